@@ -0,0 +1,325 @@
+"""
+Benchmarks for vsmm's hot paths, run against a local stub mod db (see stub_server.py).
+
+    python benchmarks/run.py --scale 5000 --output results.json
+    python benchmarks/run.py --baseline benchmarks/baseline.json          # compare, exit 1 on a regression
+    python benchmarks/run.py --save-baseline benchmarks/baseline.json     # record a new baseline
+
+Every benchmark runs in a throwaway working directory, so nothing touches the real downloads, profiles or game
+folder. Setup (clearing caches, building profiles) is never part of a timing.
+"""
+import argparse
+from contextlib import redirect_stdout
+import io
+import json
+import os
+from pathlib import Path
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO / "vsmm"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import config # noqa: E402
+
+import api.client as client # noqa: E402
+from api.client import APIClient # noqa: E402
+from manager.file import FileManager # noqa: E402
+from manager.mod import ModManager # noqa: E402
+from manager.profile import Profile, ProfileManager, ProfileModEntry # noqa: E402
+from stub_server import StubConfig, StubModDB # noqa: E402
+
+BENCHMARKS: Dict[str, Callable] = {}
+
+
+def benchmark(name: str):
+    def register(fn: Callable) -> Callable:
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+class Bench:
+    """ Shared state for one run: the stub server, the workspace and the vsmm objects built on top of them. """
+
+    def __init__(self, args, stub: StubModDB, workspace: Path):
+        self.args = args
+        self.stub = stub
+        self.workspace = workspace
+        settings = json.loads((REPO / "vsmm" / "config.json").read_text())
+        settings.update({
+            "app.downloads_location": "./downloads",
+            "app.profiles_location": "./profiles",
+            "game.folder_path": "./game",
+            "app.http.requests_per_second": 0,
+            "app.http.bytes_per_second": 0,
+            "app.mod_cache.max_age": 0,
+            "app.profiles.flush_delay": 0,
+            "app.mods_folder.watch": False,
+        })
+        self.cfg = config.config_from_dict(settings)
+        self.file = FileManager(self.cfg)
+        self.api = APIClient(self.cfg)
+
+    def path(self, *parts: str) -> Path:
+        return Path(self.workspace, *parts)
+
+    def reset(self, *parts: str):
+        shutil.rmtree(self.path(*parts), ignore_errors=True)
+
+    def mod_manager(self, load_cache: bool = False) -> ModManager:
+        return ModManager(self.cfg, self.api, self.file, load_cache=load_cache)
+
+    def profile_manager(self, mod_manager: ModManager) -> ProfileManager:
+        return ProfileManager(self.cfg, self.api, mod_manager, self.file)
+
+    def time(self, fn: Callable, setup: Callable = None) -> Dict:
+        runs = []
+        for _ in range(self.args.repeat):
+            state = setup() if setup else None
+            started = time.perf_counter()
+            fn(state)
+            runs.append(time.perf_counter() - started)
+        return summarize(runs, "s")
+
+
+def summarize(runs: List[float], unit: str, higher_is_better: bool = False) -> Dict:
+    return {
+        "median": statistics.median(runs),
+        "min": min(runs),
+        "max": max(runs),
+        "runs": runs,
+        "unit": unit,
+        "higher_is_better": higher_is_better,
+    }
+
+
+@benchmark("update_cache_cold")
+def bench_update_cache_cold(bench: Bench) -> Dict:
+    def setup():
+        bench.reset("downloads")
+        return bench.mod_manager()
+    return bench.time(lambda mod_manager: mod_manager.update_cache(force=True), setup)
+
+
+@benchmark("update_cache_warm")
+def bench_update_cache_warm(bench: Bench) -> Dict:
+    """ Refresh with everything cached: a 304 for the catalogue and a merge that keeps every entry. """
+    bench.reset("downloads")
+    bench.mod_manager().update_cache(force=True)
+    return bench.time(lambda mod_manager: mod_manager.update_cache(force=True), lambda: bench.mod_manager(load_cache=True))
+
+
+@benchmark("update_cache_peak_memory")
+def bench_update_cache_peak_memory(bench: Bench) -> Dict:
+    """ Peak Python heap while refreshing the catalogue from scratch (tracemalloc, so not part of the timings). """
+    runs = []
+    for _ in range(bench.args.repeat):
+        bench.reset("downloads")
+        mod_manager = bench.mod_manager()
+        tracemalloc.start()
+        try:
+            mod_manager.update_cache(force=True)
+            runs.append(tracemalloc.get_traced_memory()[1] / (1024 * 1024))
+        finally:
+            tracemalloc.stop()
+    return summarize(runs, "MB")
+
+
+@benchmark("load_cache_from_disk")
+def bench_load_cache_from_disk(bench: Bench) -> Dict:
+    bench.reset("downloads")
+    bench.mod_manager().update_cache(force=True)
+    return bench.time(lambda mod_manager: mod_manager.load_cache_from_disk(), bench.mod_manager)
+
+
+@benchmark("get_mod_info_cold")
+def bench_get_mod_info_cold(bench: Bench) -> Dict:
+    modids = range(1, min(bench.args.mod_info_calls, bench.args.scale) + 1)
+
+    def setup():
+        bench.reset("downloads")
+        return bench.mod_manager()
+    result = bench.time(lambda mod_manager: [mod_manager.get_mod_info(modid) for modid in modids], setup)
+    result["calls"] = len(modids)
+    return result
+
+
+@benchmark("get_mod_info_warm")
+def bench_get_mod_info_warm(bench: Bench) -> Dict:
+    modids = range(1, min(bench.args.mod_info_calls, bench.args.scale) + 1)
+    bench.reset("downloads")
+    mod_manager = bench.mod_manager()
+    for modid in modids:
+        mod_manager.get_mod_info(modid)
+    result = bench.time(lambda _: [mod_manager.get_mod_info(modid) for modid in modids])
+    result["calls"] = len(modids)
+    return result
+
+
+def fresh_profile(bench: Bench) -> ProfileManager:
+    """ An empty workspace with one profile of profile_mods mods, none of them downloaded or deployed. """
+    for folder in ("downloads", "profiles", "game"):
+        bench.reset(folder)
+    profile_manager = bench.profile_manager(bench.mod_manager())
+    catalogue = bench.stub.catalogue
+    release = bench.stub.config.releases - 1
+    mods = []
+    for modid in range(1, min(bench.args.profile_mods, bench.args.scale) + 1):
+        archive_name = catalogue.archive_name(modid, release)
+        mods.append(ProfileModEntry(
+            id=modid,
+            name=catalogue.mods[modid - 1]["name"],
+            tags=catalogue.mods[modid - 1]["tags"],
+            version=catalogue.version(release),
+            archive_path=bench.path("downloads", archive_name),
+            archive_name=archive_name,
+        ))
+    profile_manager.profile_store.add(Profile(name="bench", desc="", mods=mods, last_update="2023-01-01T00:00:00"))
+    return profile_manager
+
+
+@benchmark("deploy_profile_cold")
+def bench_deploy_profile_cold(bench: Bench) -> Dict:
+    """ Deploy with nothing downloaded: mod info lookups, downloads and installs. """
+    result = bench.time(lambda profile_manager: profile_manager.deploy_profile("bench"), lambda: fresh_profile(bench))
+    result["mods"] = bench.args.profile_mods
+    return result
+
+
+@benchmark("deploy_profile_noop")
+def bench_deploy_profile_noop(bench: Bench) -> Dict:
+    """ Redeploy a profile that is already in place. """
+    profile_manager = fresh_profile(bench)
+    profile_manager.deploy_profile("bench")
+    return bench.time(lambda _: profile_manager.deploy_profile("bench"))
+
+
+@benchmark("undeploy_profile")
+def bench_undeploy_profile(bench: Bench) -> Dict:
+    def setup():
+        profile_manager = fresh_profile(bench)
+        profile_manager.deploy_profile("bench")
+        return profile_manager
+    return bench.time(lambda profile_manager: profile_manager.undeploy_profile("bench"), setup)
+
+
+@benchmark("download_throughput")
+def bench_download_throughput(bench: Bench) -> Dict:
+    size = bench.args.download_size
+    url = f"{bench.stub.base_url}files/1/{bench.stub.catalogue.archive_name(1, 0)}?size={size}"
+    bench.stub.catalogue.archive(1, bench.stub.catalogue.archive_name(1, 0), size) # build it outside the timing
+    target = bench.path("throughput", "archive.zip")
+    runs = []
+    for _ in range(bench.args.repeat):
+        bench.reset("throughput")
+        target.parent.mkdir(parents=True)
+        started = time.perf_counter()
+        bench.api.download_archive(url, target)
+        elapsed = time.perf_counter() - started
+        runs.append(target.stat().st_size / elapsed / (1024 * 1024))
+    return summarize(runs, "MB/s", higher_is_better=True)
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[Dict]:
+    """ One row per benchmark present in both. A benchmark regressed when it is more than threshold (a fraction)
+    worse than the baseline median. """
+    rows = []
+    for name, result in results["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None or not base["median"] or not result["median"]:
+            continue
+        if result.get("higher_is_better"):
+            slowdown = base["median"] / result["median"]
+        else:
+            slowdown = result["median"] / base["median"]
+        rows.append({"name": name, "baseline": base["median"], "current": result["median"], "unit": result["unit"],
+                     "slowdown": slowdown, "regressed": slowdown > 1 + threshold})
+    return rows
+
+
+def run(args) -> Dict:
+    selected = args.only or list(BENCHMARKS)
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        raise SystemExit(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+    stub_config = StubConfig(scale=args.scale, archive_size=args.archive_size, latency=args.latency)
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": args.scale,
+            "archive_size": args.archive_size,
+            "latency": args.latency,
+            "repeat": args.repeat,
+            "profile_mods": args.profile_mods,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": {},
+    }
+    cwd = os.getcwd()
+    workspace = Path(tempfile.mkdtemp(prefix="vsmm-bench-"))
+    try:
+        with StubModDB(stub_config) as stub:
+            client.BASE_API_URI = stub.base_url + "api/{stub}"
+            client.BASE_FILE_URI = stub.base_url + "{file_path}"
+            os.chdir(workspace) # vsmm resolves every configured location against the working directory
+            bench = Bench(args, stub, workspace)
+            for name in selected:
+                requests_before = stub.requests
+                with redirect_stdout(io.StringIO()): # vsmm reports progress with print
+                    result = BENCHMARKS[name](bench)
+                result["requests"] = stub.requests - requests_before # setup included
+                results["results"][name] = result
+                print(f"{name:24} median {result['median']:10.4f} {result['unit']:5} (min {result['min']:.4f}, {len(result['runs'])} runs)")
+            bench.api.close()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workspace, ignore_errors=True)
+    return results
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark vsmm against a local stub mod db")
+    parser.add_argument("--scale", type=int, default=1000, help="mods in the synthetic catalogue (e.g. 100 to 50000)")
+    parser.add_argument("--archive-size", type=int, default=256 * 1024, help="bytes per mod archive")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every stub request")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--profile-mods", type=int, default=20, help="mods in the deployed profile")
+    parser.add_argument("--mod-info-calls", type=int, default=50)
+    parser.add_argument("--download-size", type=int, default=32 * 1024 * 1024, help="bytes for the throughput run")
+    parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument("--output", type=Path, help="write the results as JSON")
+    parser.add_argument("--baseline", type=Path, help="compare against these stored results")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before failing, 0.25 = 25%%")
+    parser.add_argument("--save-baseline", type=Path, help="store the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    status = 0
+    if args.baseline is not None:
+        if not args.baseline.is_file():
+            print(f"No baseline at {args.baseline}, nothing to compare against")
+        else:
+            rows = compare(results, json.loads(args.baseline.read_text()), args.threshold)
+            results["comparison"] = {"baseline": str(args.baseline), "threshold": args.threshold, "rows": rows}
+            for row in rows:
+                flag = "REGRESSED" if row["regressed"] else "ok"
+                print(f"{row['name']:24} {row['baseline']:10.4f} -> {row['current']:10.4f} {row['unit']:5} x{row['slowdown']:.2f} {flag}")
+            if any(row["regressed"] for row in rows):
+                status = 1
+    for path in (args.output, args.save_baseline):
+        if path is not None:
+            path.write_text(json.dumps(results, indent=2))
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
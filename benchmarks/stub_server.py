@@ -0,0 +1,205 @@
+"""
+Local stand-in for the mods.vintagestory.at API, serving a synthetic catalogue.
+
+    /api/mods               every mod's metadata
+    /api/mod/{modid}        one mod with its releases
+    /files/{modid}/{name}   a release archive: a valid zip with a modinfo.json, padded to archive_size bytes
+
+Responses carry an ETag and honour If-None-Match and Range, so the client's conditional requests and resumable
+downloads are exercised the same way they are against the real server. latency is added to every request.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import hashlib
+import io
+import json
+import random
+import re
+import threading
+import time
+import zipfile
+from typing import Dict, List
+from urllib.parse import parse_qs
+
+TAGS = ["Library", "QoL", "Worldgen", "Creatures", "Crafting", "Cooking", "Tweak", "Graphics", "Storage", "Tools"]
+WORDS = ["better", "more", "simple", "extended", "primitive", "carry", "farming", "light", "trees", "ores", "boats",
+         "survival", "map", "chisel", "pottery", "metal", "rust", "temporal", "gear", "trader"]
+RANGE_PATTERN = re.compile(r"bytes=(\d+)-(\d*)")
+
+
+@dataclass
+class StubConfig:
+    scale: int = 1000 # mods in the catalogue
+    archive_size: int = 256 * 1024 # bytes per release archive
+    latency: float = 0.0 # seconds added to every request
+    releases: int = 3 # releases per mod
+    seed: int = 1
+
+
+class SyntheticCatalogue:
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        rng = random.Random(config.seed)
+        self.mods: List[Dict] = []
+        for modid in range(1, config.scale + 1):
+            name = " ".join(rng.sample(WORDS, 2)).title() + f" {modid}"
+            self.mods.append({
+                "modid": modid,
+                "assetid": 10000 + modid,
+                "name": name,
+                "author": f"author{rng.randrange(max(1, config.scale // 10))}",
+                "logo": None,
+                "downloads": rng.randrange(1_000_000),
+                "follows": rng.randrange(5000),
+                "trendingpoints": rng.randrange(1000),
+                "lastreleased": f"2023-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d} 12:00:00",
+                "tags": rng.sample(TAGS, rng.randrange(1, 4)),
+                "side": rng.choice(["both", "client", "server"]),
+            })
+        self.mods_body = json.dumps({"statuscode": "200", "mods": self.mods}).encode("utf-8")
+
+    @staticmethod
+    def version(release: int) -> str:
+        return f"1.{release}.0"
+
+    def archive_name(self, modid: int, release: int) -> str:
+        return f"mod{modid}_v{self.version(release)}.zip"
+
+    def mod_body(self, modid: int) -> bytes:
+        mod = self.mods[modid - 1]
+        releases = [
+            {
+                "releaseid": modid * 100 + release,
+                "mainfile": f"files/{modid}/{self.archive_name(modid, release)}",
+                "filename": self.archive_name(modid, release),
+                "modversion": self.version(release),
+                "tags": ["v1.19.0"],
+            }
+            for release in reversed(range(self.config.releases)) # most recent first, like the real API
+        ]
+        info = {**mod, "text": f"<p>{mod['name']} adds <b>things</b>.</p>" * 20, "logofile": None,
+                "homepageurl": None, "screenshots": [], "releases": releases}
+        return json.dumps({"statuscode": "200", "mod": info}).encode("utf-8")
+
+    def archive(self, modid: int, file_name: str, size: int = None) -> bytes:
+        return build_archive(modid, file_name, size or self.config.archive_size)
+
+
+@lru_cache(maxsize=64)
+def build_archive(modid: int, file_name: str, size: int) -> bytes:
+    version = file_name.rsplit("_v", 1)[-1][:-len(".zip")]
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        archive.writestr("modinfo.json", json.dumps({"type": "code", "modid": f"mod{modid}", "version": version,
+                                                     "dependencies": {"game": "1.19.0"}}))
+        archive.writestr("assets/payload.bin", random.Random(modid).randbytes(max(0, size - 400)))
+    return buffer.getvalue()
+
+
+def etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    catalogue: SyntheticCatalogue = None
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True # headers and body go out in separate writes
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.catalogue.config.latency:
+            time.sleep(self.catalogue.config.latency)
+        self.server.requests += 1
+        path, _, query = self.path.partition("?")
+        try:
+            if path == "/api/mods":
+                body = self.catalogue.mods_body
+            elif path.startswith("/api/mod/"):
+                body = self.catalogue.mod_body(int(path.rsplit("/", 1)[1]))
+            elif path.startswith("/files/"):
+                _, _, modid, file_name = path.split("/", 3)
+                size = parse_qs(query).get("size") # ?size=N overrides archive_size, for throughput runs
+                return self._send_file(self.catalogue.archive(int(modid), file_name, int(size[0]) if size else None))
+            else:
+                return self._send(404, b"")
+        except (ValueError, IndexError):
+            return self._send(404, b"")
+        tag = etag(body)
+        if self.headers.get("If-None-Match") == tag:
+            return self._send(304, b"", {"ETag": tag})
+        self._send(200, body, {"ETag": tag, "Content-Type": "application/json"})
+
+    def _send_file(self, body: bytes):
+        tag = etag(body)
+        match = RANGE_PATTERN.fullmatch(self.headers.get("Range", ""))
+        if_range = self.headers.get("If-Range")
+        if match and (if_range is None or if_range == tag):
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else len(body) - 1
+            if start >= len(body):
+                return self._send(416, b"", {"Content-Range": f"bytes */{len(body)}"})
+            return self._send(206, body[start:end + 1], {"ETag": tag, "Content-Range": f"bytes {start}-{end}/{len(body)}"})
+        self._send(200, body, {"ETag": tag, "Content-Type": "application/zip"})
+
+    def _send(self, status: int, body: bytes, headers: Dict[str, str] = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.bytes_sent += len(body)
+
+
+class StubModDB:
+    """ Runs the stub server on a background thread: `with StubModDB(StubConfig(scale=5000)) as server: ...` """
+
+    def __init__(self, config: StubConfig, host: str = "127.0.0.1", port: int = 0):
+        self.config = config
+        self.catalogue = SyntheticCatalogue(config)
+        handler = type("Handler", (StubHandler,), {"catalogue": self.catalogue})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.server.requests = 0
+        self.server.bytes_sent = 0
+        self._thread = threading.Thread(target=self.server.serve_forever, name="stub-moddb", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    @property
+    def requests(self) -> int:
+        return self.server.requests
+
+    def start(self) -> "StubModDB":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "StubModDB":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Serve a synthetic mod db")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--scale", type=int, default=1000)
+    parser.add_argument("--archive-size", type=int, default=256 * 1024)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+    stub = StubModDB(StubConfig(scale=args.scale, archive_size=args.archive_size, latency=args.latency), port=args.port)
+    print(f"Serving {args.scale} synthetic mods on {stub.base_url}")
+    stub.server.serve_forever()
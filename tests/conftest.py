@@ -0,0 +1,91 @@
+from datetime import datetime
+import hashlib
+from types import SimpleNamespace
+
+import pytest
+
+from api.manifest import ArchiveManifest, write_manifest
+from manager.file import FileManager
+from manager.mod import ModMetadata
+from manager.profile import Profile, ProfileManager, ProfileModEntry
+
+
+def make_mod(modid: int, **fields) -> ModMetadata:
+    values = dict(modid=modid, assetid=modid + 1000, name=f"Mod {modid}", author="author", logo=None, downloads=modid,
+                  follows=0, trendingpoints=0, lastreleased="2023-01-01 00:00:00", tags=[], side="both")
+    values.update(fields)
+    return ModMetadata(**values)
+
+
+def make_config(**mod_cache) -> SimpleNamespace:
+    """ The few config keys the managers under test read, in place of vsmm/config.json. """
+    return SimpleNamespace(
+        app=SimpleNamespace(
+            downloads_location="downloads",
+            profiles_location="profiles",
+            deploy=SimpleNamespace(link_mode="auto", download_workers=2, install_workers=2),
+            mod_cache=SimpleNamespace(format=mod_cache.get("format", "binary"), max_age=mod_cache.get("max_age", 3600)),
+            modinfo_cache=SimpleNamespace(ttl=3600, size=16),
+            mods_folder=SimpleNamespace(watch=False),
+            profiles=SimpleNamespace(flush_delay=0),
+            updates=SimpleNamespace(workers=2, prereleases=False),
+        ),
+        game=SimpleNamespace(folder_path="game"),
+    )
+
+
+@pytest.fixture
+def config():
+    return make_config()
+
+
+@pytest.fixture
+def file_manager(config):
+    return FileManager(config)
+
+
+class FakeModManager:
+    """ Serves archives from a dict of archive name -> bytes, "downloading" them into the downloads folder. """
+
+    def __init__(self, downloads, archives):
+        self.downloads = downloads
+        self.archives = archives
+        self.downloaded = []
+
+    def mod_archive_local_path(self, mod_id, mod_version):
+        return None
+
+    def download_mod_version(self, mod_id, mod_version):
+        name = f"mod{mod_id}-{mod_version}.zip"
+        if name not in self.archives:
+            raise ConnectionError(f"{name} is not on the mod db")
+        self.downloaded.append(name)
+        return local_archive(self.downloads, name, self.archives[name])
+
+
+def local_archive(downloads, name, data):
+    path = downloads / name
+    path.write_bytes(data)
+    write_manifest(path, ArchiveManifest(url=name, size=len(data), sha256=hashlib.sha256(data).hexdigest()))
+    return path
+
+
+def profile_entry(downloads, modid, version="1.0.0"):
+    name = f"mod{modid}-{version}.zip"
+    return ProfileModEntry(id=modid, name=f"Mod {modid}", tags=[], version=version, archive_path=downloads / name, archive_name=name)
+
+
+def make_profile_manager(config, file_manager, downloads, archives):
+    """ A ProfileManager with profiles a (mods 1 and 2) and b (mods 2 and 3), whose archives come from archives. """
+    manager = ProfileManager(config, api=None, mod=FakeModManager(downloads, archives), file=file_manager)
+    for name, modids in (("a", (1, 2)), ("b", (2, 3))):
+        mods = [profile_entry(downloads, modid) for modid in modids]
+        manager.profile_store.add(Profile(name=name, desc="", mods=mods, last_update=datetime(2023, 1, 1)))
+    return manager
+
+
+@pytest.fixture
+def downloads(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path) # downloads, profiles and game folders are relative to the working directory
+    (tmp_path / "downloads").mkdir()
+    return tmp_path / "downloads"
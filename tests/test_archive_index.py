@@ -0,0 +1,63 @@
+import os
+import zipfile
+
+import pytest
+
+from manager.archive_index import ArchiveIndex, parse_lenient_json
+
+
+def test_lenient_json():
+    text = """{
+        // as the game accepts it
+        modid: 'primitivesurvival', "name": 'It\\'s "quoted"',
+        dependencies: { game: "1.18.0", },
+        /* numbers keep their exponents */ weight: 1e5, scale: -2.5E-3, offset: 1E+2,
+        tags: [1, 2.5, true, null,],
+    }"""
+    assert parse_lenient_json(text) == {
+        "modid": "primitivesurvival", "name": 'It\'s "quoted"', "dependencies": {"game": "1.18.0"},
+        "weight": 1e5, "scale": -2.5e-3, "offset": 100.0, "tags": [1, 2.5, True, None],
+    }
+
+
+def write_archive(path, modinfo):
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("ModInfo.json", modinfo)
+        archive.writestr("assets/readme.txt", "")
+
+
+@pytest.fixture
+def index(tmp_path, file_manager):
+    return ArchiveIndex(file_manager, tmp_path / "archive_index.json")
+
+
+def test_scan_reads_each_archive_once(tmp_path, index, file_manager):
+    mods = tmp_path / "mods"
+    mods.mkdir()
+    write_archive(mods / "a.zip", "{ModID: 'a', Version: '1.0.0', Dependencies: {game: '1.18.0'}}")
+    write_archive(mods / "broken.zip", "{name: 'no id'}")
+    (mods / "notazip.zip").write_bytes(b"junk")
+
+    found = index.scan(mods)
+    assert (found["a.zip"].modid, found["a.zip"].version, found["a.zip"].dependencies) == ("a", "1.0.0", {"game": "1.18.0"})
+    assert not found["broken.zip"].ok and "no modid" in found["broken.zip"].error
+    assert found["notazip.zip"].error.startswith("BadZipFile")
+
+    restarted = ArchiveIndex(file_manager, index.index_path)
+    restarted.scan(mods)
+    assert restarted.stats() == {"hits": 3, "misses": 0, "entries": 3}
+
+
+def test_changed_and_removed_archives(tmp_path, index):
+    mods = tmp_path / "mods"
+    mods.mkdir()
+    write_archive(mods / "a.zip", "{modid: 'a', version: '1.0.0'}")
+    write_archive(mods / "b.zip", "{modid: 'b', version: '1.0.0'}")
+    index.scan(mods)
+    stat = os.stat(mods / "a.zip")
+    write_archive(mods / "a.zip", "{modid: 'a', version: '1.1.0'}")
+    os.utime(mods / "a.zip", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    (mods / "b.zip").unlink()
+    found = index.scan(mods)
+    assert list(found) == ["a.zip"] and found["a.zip"].version == "1.1.0"
+    assert index.stats()["entries"] == 1
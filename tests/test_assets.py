@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+
+from manager import assets
+from manager.assets import PNG_MAGIC, UNUSABLE, AssetCache, mod_image_urls
+from manager.mod import ModInfo
+
+
+def png(size: int) -> bytes:
+    return PNG_MAGIC + b"\0" * size
+
+
+class FakeFetch:
+
+    def __init__(self, images):
+        self.images = images
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, url: str) -> bytes:
+        self.calls.append(url)
+        self.release.wait(5)
+        return self.images[url]
+
+
+@pytest.fixture(autouse=True)
+def without_pillow(monkeypatch):
+    monkeypatch.setattr(assets, "Image", None) # PNGs are kept as they are, the sizes below stay predictable
+
+
+def make_cache(tmp_path, fetch, max_bytes=10_000, memory_entries=8):
+    return AssetCache(tmp_path / "assets", fetch, max_bytes=max_bytes, memory_entries=memory_entries, thumbnail_size=64)
+
+
+def test_fetch_then_hit(tmp_path):
+    fetch = FakeFetch({"logo": png(10)})
+    cache = make_cache(tmp_path, fetch)
+    assert cache.get("logo") is None
+    assert cache.fetch("logo").result(5) == png(10)
+    assert cache.fetch("logo").result(5) == png(10)
+    assert fetch.calls == ["logo"]
+    assert cache.stats()["misses"] == 1
+    cache.shutdown()
+
+
+def test_concurrent_fetches_share_one_download(tmp_path):
+    fetch = FakeFetch({"logo": png(10)})
+    fetch.release.clear()
+    cache = make_cache(tmp_path, fetch)
+    futures = [cache.fetch("logo") for _ in range(5)]
+    assert len({id(future) for future in futures}) == 1
+    fetch.release.set()
+    assert futures[0].result(5) == png(10)
+    assert fetch.calls == ["logo"]
+    cache.shutdown()
+
+
+def test_thumbnails_survive_a_restart(tmp_path):
+    fetch = FakeFetch({"logo": png(10)})
+    make_cache(tmp_path, fetch).fetch("logo").result(5)
+    restarted = make_cache(tmp_path, fetch)
+    assert restarted.get("logo") == png(10)
+    assert restarted.stats()["disk_hits"] == 1
+    assert fetch.calls == ["logo"]
+
+
+def test_unusable_images_are_remembered_on_disk(tmp_path):
+    fetch = FakeFetch({"shot.jpg": b"\xff\xd8 not a png"})
+    assert make_cache(tmp_path, fetch).fetch("shot.jpg").result(5) is None
+    restarted = make_cache(tmp_path, fetch)
+    assert restarted.get("shot.jpg") == UNUSABLE
+    assert restarted.fetch("shot.jpg").result(5) is None
+    assert fetch.calls == ["shot.jpg"]
+
+
+def test_directory_is_capped(tmp_path):
+    images = {f"logo{n}": png(100) for n in range(5)}
+    cache = make_cache(tmp_path, FakeFetch(images), max_bytes=3 * len(png(100)), memory_entries=1)
+    for url in images:
+        cache.fetch(url).result(5)
+    stats = cache.stats()
+    assert stats["disk_entries"] == 3 and stats["disk_bytes"] <= 3 * len(png(100))
+    assert cache.get("logo0") is None # least recently used went first
+    assert cache.get("logo4") == png(100)
+    cache.shutdown()
+
+
+def test_mod_image_urls():
+    mod_info = ModInfo(modid=1, assetid=2, name="m", author="a", side="both", logofile="logo.png",
+                       screenshots=[{"mainfile": "one.png"}, {"mainfile": None}, "two.png"])
+    assert list(mod_image_urls(mod_info)) == ["logo.png", "one.png", "two.png"]
+    mod_info.logofile = None
+    assert next(mod_image_urls(mod_info)) == "one.png"
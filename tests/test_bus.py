@@ -0,0 +1,93 @@
+import gc
+import threading
+
+import pytest
+
+from signalling.bus import EventBus, QueuedExecutor, ThreadedExecutor
+from signalling.observer import Observable
+
+
+def test_inline_delivery_with_event_attributes():
+    bus = EventBus()
+    received = []
+    bus.subscribe("mod_deployed", lambda event: received.append((event.signal, event.name, event.source)))
+    bus.emit("mod_deployed", source="manager", name="a.zip")
+    bus.emit("mod_failed", name="b.zip") # nobody listens
+    assert received == [("mod_deployed", "a.zip", "manager")]
+
+
+def test_queued_delivery_runs_on_the_draining_thread():
+    wakeups = []
+    executor = QueuedExecutor(max_queue=2, wakeup=lambda: wakeups.append(1))
+    bus = EventBus()
+    threads = []
+    bus.subscribe("progress", lambda event: threads.append((event.done, threading.current_thread())), executor=executor)
+    worker = threading.Thread(target=lambda: [bus.emit("progress", done=n) for n in range(3)])
+    worker.start()
+    worker.join()
+    assert threads == [] and wakeups == [1]
+    assert executor.drain() == 2 and executor.dropped == 1 # the oldest was dropped
+    assert threads == [(1, threading.current_thread()), (2, threading.current_thread())]
+
+
+def test_coalesced_subscribers_only_see_the_newest_event():
+    executor = QueuedExecutor()
+    bus = EventBus()
+    seen = []
+    bus.subscribe("progress", lambda event: seen.append(event.done), executor=executor, coalesce=True)
+    for done in range(5):
+        bus.emit("progress", done=done)
+    executor.drain()
+    assert seen == [4]
+
+
+def test_throttled_subscriber():
+    bus = EventBus()
+    seen = []
+    delivered = threading.Event()
+    bus.subscribe("progress", lambda event: seen.append(event.done) or delivered.set(), min_interval=0.2)
+    bus.emit("progress", done=1) # delivered right away
+    delivered.clear()
+    for done in range(2, 6):
+        bus.emit("progress", done=done)
+    assert delivered.wait(2)
+    assert seen == [1, 5]
+
+
+def test_threaded_executor_survives_failing_subscribers():
+    executor = ThreadedExecutor(workers=1, overflow="drop_newest")
+    bus = EventBus(default_executor=executor)
+    done = threading.Event()
+    bus.subscribe("signal", lambda event: 1 / 0)
+    bus.subscribe("signal", lambda event: done.set())
+    bus.emit("signal")
+    assert done.wait(2)
+    executor.shutdown()
+    with pytest.raises(ValueError):
+        ThreadedExecutor(overflow="explode")
+
+
+def test_bound_methods_are_weak():
+    class Panel:
+        def __init__(self):
+            self.seen = []
+
+        def on_event(self, event):
+            self.seen.append(event.signal)
+    bus = EventBus()
+    panel = Panel()
+    bus.subscribe("signal", panel.on_event)
+    bus.emit("signal")
+    assert panel.seen == ["signal"]
+    del panel
+    gc.collect()
+    bus.emit("signal")
+    assert not bus.has_subscribers("signal")
+
+
+def test_observable_rejects_unknown_signals():
+    observable = Observable(["known"])
+    with pytest.raises(KeyError):
+        observable.subscribe("unknown", print)
+    with pytest.raises(KeyError):
+        observable.emit_signal("unknown")
@@ -0,0 +1,54 @@
+import pytest
+
+from api.cache import ResponseCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(tmp_path / "responses")
+
+
+def test_key_ignores_slashes_and_param_order():
+    assert ResponseCache.make_key("/mods/", {"a": 1, "b": 2}) == ResponseCache.make_key("mods", {"b": 2, "a": 1})
+    assert ResponseCache.make_key("mods") != ResponseCache.make_key("mod/1")
+
+
+def test_store_and_load(cache):
+    key = cache.make_key("mods")
+    cache.store(key, b"body", etag='"v1"')
+    cached = cache.load(key)
+    assert (cached.body, cached.etag, cached.last_modified) == (b"body", '"v1"', None)
+    assert cache.load(key, with_body=False).body is None
+    assert cache.conditional_headers(cached) == {"If-None-Match": '"v1"'}
+
+
+def test_responses_without_validators_are_not_kept(cache):
+    key = cache.make_key("mods")
+    assert cache.store(key, b"body") is None
+    assert cache.load(key) is None
+
+
+def test_store_stream(cache):
+    key = cache.make_key("mods")
+    chunks = [b"one ", b"two ", b"three"]
+    assert list(cache.store_stream(key, chunks, last_modified="yesterday")) == chunks
+    assert b"".join(cache.iter_body(key, chunk_size=3)) == b"one two three"
+    assert cache.load(key).last_modified == "yesterday"
+
+
+def test_abandoned_stream_keeps_the_previous_entry(cache):
+    key = cache.make_key("mods")
+    cache.store(key, b"old", etag='"v1"')
+    stream = cache.store_stream(key, [b"new ", b"partial"], etag='"v2"')
+    next(stream)
+    stream.close()
+    cached = cache.load(key)
+    assert (cached.body, cached.etag) == (b"old", '"v1"')
+    assert not list(cache.cache_dir.glob("*.tmp"))
+
+
+def test_invalidate(cache):
+    key = cache.make_key("mods")
+    cache.store(key, b"body", etag='"v1"')
+    cache.invalidate(key)
+    assert cache.load(key) is None
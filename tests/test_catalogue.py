@@ -0,0 +1,89 @@
+from datetime import datetime
+
+import pytest
+
+from manager.catalogue import NULL_INT, Catalogue, CatalogueClosedError, CatalogueFormatError, write_catalogue
+from manager.index import ModIndex
+from manager.mod import ModMetadata
+
+from .conftest import make_mod
+
+
+@pytest.fixture
+def mods():
+    return [
+        make_mod(1, name="Primitive Survival", tags=["crafting", "survival"], logo="logos/1.png"),
+        make_mod(2, name="Carry On", author="Mod Author", tags=["utility"], downloads=None),
+        make_mod(3, name="Ünïcode", tags=["survival"], side="server", lastreleased=None),
+    ]
+
+
+@pytest.fixture
+def catalogue(tmp_path, mods):
+    path = tmp_path / "mod_cache.bin"
+    write_catalogue(path, mods, datetime(2023, 5, 1, 12, 0))
+    catalogue = Catalogue(path, ModMetadata)
+    yield catalogue
+    catalogue.close()
+
+
+def test_round_trip(catalogue, mods):
+    assert len(catalogue) == 3
+    assert list(catalogue) == mods
+    assert catalogue.last_updated == datetime(2023, 5, 1, 12, 0)
+
+
+def test_rows_are_materialized_once(catalogue):
+    assert catalogue[0] is catalogue[0]
+    assert catalogue[-1].name == "Ünïcode"
+    assert [mod.modid for mod in catalogue[1:]] == [2, 3]
+    with pytest.raises(IndexError):
+        catalogue[3]
+
+
+def test_peek_does_not_keep_the_row(catalogue):
+    assert catalogue.peek(1).name == "Carry On"
+    assert 1 not in catalogue._rows
+
+
+def test_column_marks_missing_values(catalogue):
+    assert list(catalogue.column("modid")) == [1, 2, 3]
+    assert catalogue.column("downloads")[1] == NULL_INT
+    assert catalogue[1].downloads is None
+
+
+def test_closed_catalogue_keeps_materialized_rows(catalogue):
+    first = catalogue[0]
+    catalogue.close()
+    assert catalogue.closed
+    assert catalogue[0] is first
+    with pytest.raises(CatalogueClosedError):
+        catalogue[1]
+    with pytest.raises(CatalogueClosedError):
+        catalogue.column("modid")
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "mod_cache.bin"
+    path.write_bytes(b"not a catalogue" * 8)
+    with pytest.raises(CatalogueFormatError):
+        Catalogue(path, ModMetadata)
+
+
+def test_row_cache_is_bounded(tmp_path):
+    path = tmp_path / "mod_cache.bin"
+    write_catalogue(path, (make_mod(modid) for modid in range(50)), datetime(2023, 5, 1))
+    catalogue = Catalogue(path, ModMetadata, row_cache_size=8)
+    for row in range(50):
+        catalogue[row]
+    catalogue[42]
+    assert len(catalogue._rows) == 8
+    assert list(catalogue._rows)[-1] == 42
+    catalogue.close()
+
+
+def test_full_passes_do_not_keep_rows(catalogue):
+    index = ModIndex(catalogue)
+    assert [mod.modid for mod in catalogue] == [1, 2, 3]
+    assert list(index.query(sort="name", descending=False)) == [1, 0, 2]
+    assert len(catalogue._rows) == 0
@@ -0,0 +1,17 @@
+from cli import build_parser
+
+
+def test_check_updates_profile_is_not_the_cprofile_capture():
+    args = build_parser().parse_args(["check-updates", "--profile", "default"])
+    assert args.profile == "default"
+    assert args.cprofile is None
+
+
+def test_cprofile_and_profile_together():
+    args = build_parser().parse_args(["--cprofile", "run.prof", "check-updates", "--profile", "default", "--prefetch"])
+    assert (args.cprofile, args.profile, args.prefetch) == ("run.prof", "default", True)
+
+
+def test_metrics_flags():
+    args = build_parser().parse_args(["--metrics", "-", "--metrics-log", "spans.jsonl", "status"])
+    assert (args.metrics, args.metrics_log) == ("-", "spans.jsonl")
@@ -0,0 +1,148 @@
+import hashlib
+import io
+from types import SimpleNamespace
+import zipfile
+
+import pytest
+
+from api.client import PART_SUFFIX, DownloadIntegrityError, RequestClient
+from api.manifest import read_manifest
+
+
+def zip_bytes(version: str = "1.0.0") -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("modinfo.json", f"{{modid: 'a', version: '{version}'}}" + " " * 5000)
+    return buffer.getvalue()
+
+
+class Body:
+
+    def __init__(self, data: bytes, fail_after: int = None):
+        self.data = data
+        self.position = 0
+        self.fail_after = fail_after
+
+    def read(self, size):
+        if self.fail_after is not None and self.position >= self.fail_after:
+            raise ConnectionError("connection reset")
+        end = self.position + size if self.fail_after is None else min(self.position + size, self.fail_after)
+        chunk = self.data[self.position:end]
+        self.position += len(chunk)
+        return chunk
+
+
+class Response:
+
+    def __init__(self, status_code, body=b"", headers=None, fail_after=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.raw = Body(body, fail_after)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise OSError(f"HTTP {self.status_code}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class FakeFileServer:
+    """ Serves one file, honouring Range and If-Range the way the mod db's file server does. """
+
+    def __init__(self, data: bytes, etag='"v1"'):
+        self.data = data
+        self.etag = etag
+        self.requests = []
+        self.fail_after = None # cut the next response off after this many bytes
+        self.ignore_range = False
+
+    def get(self, url, stream=False, headers=None):
+        headers = headers or {}
+        self.requests.append(headers)
+        fail_after, self.fail_after = self.fail_after, None
+        start = int(headers["Range"][len("bytes="):-1]) if "Range" in headers else 0
+        if start and not self.ignore_range and headers.get("If-Range", self.etag) == self.etag:
+            if start >= len(self.data):
+                return Response(416)
+            headers = {"ETag": self.etag, "Content-Range": f"bytes {start}-{len(self.data) - 1}/{len(self.data)}",
+                       "Content-Length": str(len(self.data) - start)}
+            return Response(206, self.data[start:], headers, fail_after)
+        return Response(200, self.data, {"ETag": self.etag, "Content-Length": str(len(self.data))}, fail_after)
+
+
+@pytest.fixture
+def server():
+    return FakeFileServer(zip_bytes())
+
+
+@pytest.fixture
+def client(server):
+    cfg = SimpleNamespace(app=SimpleNamespace(downloads_location="downloads", http=SimpleNamespace(
+        cache=False, retries=0, backoff_factor=0, pool_size=1, requests_per_second=0, bytes_per_second=0)))
+    client = RequestClient(cfg)
+    client.session = server
+    return client
+
+
+def test_interrupted_download_resumes(tmp_path, client, server):
+    target = tmp_path / "mod.zip"
+    server.fail_after = 1000
+    with pytest.raises(ConnectionError):
+        client.download_archive("files/mod.zip", target)
+    part = target.with_name(target.name + PART_SUFFIX)
+    assert part.stat().st_size == 1000 and not target.exists()
+
+    assert client.download_archive("files/mod.zip", target) == target
+    assert server.requests[-1]["Range"] == "bytes=1000-" and server.requests[-1]["If-Range"] == '"v1"'
+    assert target.read_bytes() == server.data
+    assert read_manifest(target).sha256 == hashlib.sha256(server.data).hexdigest()
+    assert not part.exists()
+
+    client.download_archive("files/mod.zip", target)
+    assert len(server.requests) == 2 # complete and verified, not downloaded again
+
+
+def test_changed_file_is_downloaded_again(tmp_path, client, server):
+    target = tmp_path / "mod.zip"
+    server.fail_after = 1000
+    with pytest.raises(ConnectionError):
+        client.download_archive("files/mod.zip", target)
+    server.etag, server.data = '"v2"', zip_bytes("1.0.1") # If-Range no longer matches: the whole file with 200
+    client.download_archive("files/mod.zip", target)
+    assert target.read_bytes() == server.data
+
+
+def test_unsatisfiable_range_restarts(tmp_path, client, server):
+    target = tmp_path / "mod.zip"
+    target.with_name(target.name + PART_SUFFIX).write_bytes(b"x" * (len(server.data) + 10)) # longer than the file
+    client.download_archive("files/mod.zip", target)
+    assert [("Range" in headers) for headers in server.requests] == [True, False]
+    assert target.read_bytes() == server.data
+
+
+def test_server_without_range_support(tmp_path, client, server):
+    target = tmp_path / "mod.zip"
+    server.fail_after = 1000
+    with pytest.raises(ConnectionError):
+        client.download_archive("files/mod.zip", target)
+    server.ignore_range = True
+    client.download_archive("files/mod.zip", target)
+    assert target.read_bytes() == server.data # not the first 1000 bytes twice
+
+
+def test_short_download_is_rejected(tmp_path, client, server):
+    target = tmp_path / "mod.zip"
+    real_get = server.get
+
+    def truncated(url, stream=False, headers=None):
+        response = real_get(url, stream, headers)
+        response.raw.data = response.raw.data[:-100] # the connection closed early without an error
+        return response
+    server.get = truncated
+    with pytest.raises(DownloadIntegrityError):
+        client.download_archive("files/mod.zip", target)
+    assert target.with_name(target.name + PART_SUFFIX).exists() and not target.exists()
@@ -0,0 +1,39 @@
+import os
+
+from manager.deploy import plan_deployment
+
+
+def test_plan(tmp_path):
+    mods_folder = tmp_path / "mods"
+    mods_folder.mkdir()
+    sources = tmp_path / "downloads"
+    sources.mkdir()
+    for name, size in (("kept.zip", 10), ("resized.zip", 20)):
+        (sources / name).write_bytes(b"x" * size)
+    os.link(sources / "kept.zip", mods_folder / "kept.zip")
+    (mods_folder / "resized.zip").write_bytes(b"x" * 5)
+    (mods_folder / "old.zip").write_bytes(b"old")
+    (mods_folder / "mine.zip").write_bytes(b"not from a profile")
+
+    wanted = {"kept.zip": sources / "kept.zip", "resized.zip": sources / "resized.zip", "new.zip": None}
+    plan = plan_deployment("default", mods_folder, wanted, managed={"kept.zip", "resized.zip", "old.zip"})
+
+    assert plan.keep == ["kept.zip"]
+    assert sorted(plan.remove) == ["old.zip", "resized.zip"]
+    assert plan.add == {"resized.zip": sources / "resized.zip", "new.zip": None}
+    assert plan.unmanaged == ["mine.zip"]
+    assert not plan.is_noop
+
+
+def test_plan_for_a_deployed_profile_is_a_noop(tmp_path):
+    mods_folder = tmp_path / "mods"
+    mods_folder.mkdir()
+    (mods_folder / "a.zip").write_bytes(b"a")
+    plan = plan_deployment("default", mods_folder, {"a.zip": None}, managed={"a.zip"})
+    assert plan.is_noop
+    assert plan.keep == ["a.zip"]
+
+
+def test_missing_mods_folder(tmp_path):
+    plan = plan_deployment("default", tmp_path / "missing", {"a.zip": None}, managed=set())
+    assert plan.add == {"a.zip": None}
@@ -0,0 +1,53 @@
+import pytest
+
+from manager.fleet import FleetDeployer, TargetRegistry
+
+from .conftest import make_profile_manager
+
+
+ARCHIVES = {f"mod{n}-1.0.0.zip": b"archive %d" % n for n in (1, 2, 3)}
+
+
+@pytest.fixture
+def fleet(tmp_path, config, file_manager, downloads):
+    manager = make_profile_manager(config, file_manager, downloads, ARCHIVES)
+    registry = TargetRegistry(file_manager, tmp_path / "targets.json")
+    for name in ("server1", "server2"):
+        registry.add(name, tmp_path / name)
+    return FleetDeployer(manager, registry, tmp_path / "snapshots", workers=2)
+
+
+def contents(folder):
+    return {path.name: path.read_bytes() for path in folder.iterdir()}
+
+
+def test_deploy_to_every_target(tmp_path, fleet):
+    result = fleet.deploy("a")
+    assert result.ok and result.staged == 2
+    assert fleet.profile_manager.mod.downloaded == ["mod1-1.0.0.zip", "mod2-1.0.0.zip"] # once, not per target
+    for name in ("server1", "server2"):
+        assert contents(tmp_path / name / "mods") == {"mod1-1.0.0.zip": b"archive 1", "mod2-1.0.0.zip": b"archive 2"}
+        assert result.targets[name].added == 2
+    assert TargetRegistry(fleet.file, fleet.registry.path).targets["server1"].profile == "a"
+
+    result = fleet.undeploy("a", ["server1"])
+    assert result.targets["server1"].removed == 2
+    assert contents(tmp_path / "server1" / "mods") == {}
+
+
+def test_dry_run_plans_like_the_real_run(tmp_path, fleet):
+    fleet.profile_manager.stage_archives("a")
+    mods = tmp_path / "server1" / "mods"
+    mods.mkdir(parents=True)
+    (mods / "mod2-1.0.0.zip").write_bytes(b"an older build") # same name, other content, not deployed by vsmm
+
+    planned = fleet.deploy("a", ["server1"], dry_run=True).targets["server1"]
+    assert contents(mods) == {"mod2-1.0.0.zip": b"an older build"}
+    deployed = fleet.deploy("a", ["server1"]).targets["server1"]
+    assert (planned.kept, planned.removed, planned.added) == (deployed.kept, deployed.removed, deployed.added) == (0, 1, 2)
+    assert contents(mods) == {"mod1-1.0.0.zip": b"archive 1", "mod2-1.0.0.zip": b"archive 2"}
+
+
+def test_unknown_targets(fleet):
+    with pytest.raises(ValueError):
+        fleet.deploy("a", ["nope"])
@@ -0,0 +1,47 @@
+import pytest
+
+from manager.index import ModIndex, tokenize
+
+from .conftest import make_mod
+
+
+@pytest.fixture
+def index():
+    return ModIndex([
+        make_mod(1, name="Primitive Survival", author="Spear and Fang", tags=["Survival", "crafting"], downloads=50),
+        make_mod(2, name="Carry On", author="copygirl", tags=["utility"], downloads=900, side="both"),
+        make_mod(3, name="Survival Cats", author="Spear and Fang", tags=["survival"], downloads=10, side="server"),
+    ])
+
+
+def test_tokenize():
+    assert tokenize("Carry-On v1.2") == ["carry", "on", "v1", "2"]
+    assert tokenize(None) == []
+
+
+def test_lookups(index):
+    assert index.get(2).name == "Carry On"
+    assert index.get_by_assetid(1003).modid == 3
+    assert index.get(99) is None
+
+
+def test_unfiltered_query_is_sorted(index):
+    assert list(index.query()) == [1, 0, 2] # downloads, descending
+    assert list(index.query(sort="name", descending=False)) == [1, 0, 2]
+
+
+def test_filters_intersect(index):
+    assert index.query(tags=["SURVIVAL"], sort="downloads") == [0, 2]
+    assert index.query(tags=["survival"], side="server") == [2]
+    assert index.query("surv", author="spear and fang", sort="name", descending=False) == [0, 2]
+    assert index.query(tags=["utility"], author="nobody") == []
+
+
+def test_fuzzy_name_match(index):
+    assert index.query("survivl") == []
+    assert index.query("survivl", fuzzy=True) == [0, 2]
+
+
+def test_unknown_sort_key(index):
+    with pytest.raises(ValueError):
+        index.query(sort="modid")
@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from api.jsonstream import JSONStreamError, iter_array
+
+
+def chunked(document: str, size: int):
+    data = document.encode("utf-8")
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+DOCUMENT = json.dumps({
+    "statuscode": "200",
+    "meta": {"nested": [1, 2, {"mods": []}]},
+    "mods": [{"modid": 1, "name": "Ünïcode ✓"}, {"modid": 2, "downloads": 123456789}, 3.25, "text", None],
+    "after": True,
+})
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 64, len(DOCUMENT) * 4])
+def test_items_match_the_whole_document(size):
+    assert list(iter_array(chunked(DOCUMENT, size), "mods")) == json.loads(DOCUMENT)["mods"]
+
+
+def test_numbers_split_across_chunks():
+    assert list(iter_array([b'{"mods": [12', b'34, 5', b'6]}'], "mods")) == [1234, 56]
+
+
+def test_empty_array():
+    assert list(iter_array([b'{"mods": [ ]}'], "mods")) == []
+
+
+def test_reads_the_rest_of_the_stream():
+    seen = []
+
+    def chunks():
+        for chunk in chunked(DOCUMENT, 5):
+            seen.append(chunk)
+            yield chunk
+    list(iter_array(chunks(), "mods"))
+    assert b"".join(seen) == DOCUMENT.encode("utf-8")
+
+
+def test_missing_key():
+    with pytest.raises(JSONStreamError):
+        list(iter_array([b'{"statuscode": "200"}'], "mods"))
+
+
+@pytest.mark.parametrize("document", [b'[1, 2]', b'{"mods": [1 2]}', b'{"mods": [1, 2', b'{"mods": [{"a": }]}'])
+def test_malformed(document):
+    with pytest.raises(JSONStreamError):
+        list(iter_array(chunked(document.decode(), 3), "mods"))
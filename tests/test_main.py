@@ -0,0 +1,93 @@
+from concurrent.futures import Future
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("PySimpleGUI") # the window itself is not needed, but main imports the toolkit
+
+from main import MODINFO_LOADED_EVENT, App
+
+from .conftest import make_mod
+
+
+class Element:
+
+    def update(self, *args, **kwargs):
+        pass
+
+
+class Window:
+    """ Collects the events worker threads post back to the GUI loop. """
+
+    def __init__(self):
+        self.events = []
+        self.posted = threading.Condition()
+
+    def __getitem__(self, key):
+        return Element()
+
+    def write_event_value(self, event, value):
+        with self.posted:
+            self.events.append((event, value))
+            self.posted.notify_all()
+
+    def wait_for(self, count):
+        with self.posted:
+            assert self.posted.wait_for(lambda: len(self.events) >= count, timeout=5)
+        return self.events
+
+
+class Assets:
+
+    def get(self, url):
+        return None
+
+    def fetch(self, url):
+        future = Future()
+        future.set_result(None)
+        return future
+
+
+@pytest.fixture
+def app():
+    lookups = []
+    release = threading.Event()
+
+    def get_mod_info(mod_id):
+        lookups.append(mod_id)
+        release.wait(5)
+        return SimpleNamespace(modid=mod_id, assetid=mod_id, text=f"<p>mod {mod_id}</p>")
+    mod_manager = SimpleNamespace(mod_cache=SimpleNamespace(mods=[make_mod(modid) for modid in range(1, 11)]),
+                                  get_mod_info=get_mod_info)
+    cfg = SimpleNamespace(app=SimpleNamespace(ui=SimpleNamespace(workers=2, prefetch_rows=2)))
+    descriptions = SimpleNamespace(render=lambda assetid, text: text)
+    app = App(cfg, None, mod_manager, None, None, descriptions, Assets())
+    app.window = Window()
+    app.modinfo_panel = [[Element()] for _ in range(6)]
+    app.lookups, app.release = lookups, release
+    yield app
+    release.set()
+    app.executor.shutdown(wait=True)
+
+
+def test_selection_loads_off_the_gui_thread_and_prefetches_neighbours(app):
+    app.select_mod_row(3) # returns before the lookup finished
+    assert not app.window.events
+    app.release.set()
+    token, mod_info, text = app.window.wait_for(1)[0][1]
+    assert (token, mod_info.modid, text) == (1, 4, "<p>mod 4</p>")
+    app.executor.shutdown(wait=True) # let the prefetches finish
+    assert sorted(app.lookups) == [2, 3, 4, 5, 6] # two rows either side, each looked up once
+
+
+def test_neighbours_are_not_looked_up_twice(app):
+    app.release.set()
+    app.select_mod_row(3)
+    app.window.wait_for(1)
+    app.select_mod_row(4)
+    events = app.window.wait_for(2)
+    assert [event for event, _ in events] == [MODINFO_LOADED_EVENT, MODINFO_LOADED_EVENT]
+    assert events[1][1][0] == 2 # the newest selection's token, older responses are dropped by the loop
+    app.executor.shutdown(wait=True)
+    assert sorted(app.lookups) == [2, 3, 4, 5, 6, 7]
@@ -0,0 +1,152 @@
+import threading
+import time
+
+import pytest
+
+from manager import catalogue, mod
+from manager.catalogue import Catalogue, CatalogueClosedError
+from manager.mod import ModManager
+from mod_table import ModTableModel, TableQuery
+
+from .conftest import make_config, make_mod
+
+
+class FakeAPI:
+    """ Serves the /api/mods listing from a list of dicts. """
+
+    def __init__(self, mods):
+        self.mods = mods
+
+    def iter_mods(self):
+        for mod in self.mods:
+            yield dict(mod)
+
+
+def listing(*mods):
+    return [make_mod(mod["modid"], **{key: value for key, value in mod.items() if key != "modid"}).dict() for mod in mods]
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch, file_manager):
+    monkeypatch.chdir(tmp_path) # the cache lives under downloads_location, relative to the working directory
+    (tmp_path / "downloads").mkdir()
+    api = FakeAPI(listing({"modid": 1, "name": "First"}, {"modid": 2, "name": "Second"}))
+    manager = ModManager(make_config(), api, file_manager, load_cache=False)
+    manager.update_cache(force=True)
+    return manager
+
+
+def test_update_uses_the_binary_catalogue(manager):
+    assert isinstance(manager.mod_cache.mods, Catalogue)
+    assert [mod.name for mod in manager.mod_cache.mods] == ["First", "Second"]
+
+
+def test_merge_refreshes_any_changed_field(manager):
+    unchanged = manager.mod_cache.mods[0]
+    manager.api.mods = listing({"modid": 1, "name": "First"}, {"modid": 2, "name": "Second", "tags": ["new"]},
+                               {"modid": 3, "name": "Third"})
+    manager.update_cache(force=True)
+    mods = manager.mod_cache.mods
+    assert [mod.name for mod in mods] == ["First", "Second", "Third"]
+    assert mods[0] == unchanged
+    assert mods[1].tags == ["new"]
+
+
+def test_failed_write_keeps_the_current_catalogue(manager, monkeypatch):
+    current = manager.mod_cache.mods
+
+    def fail(self, path, last_updated):
+        raise OSError("disk full")
+    monkeypatch.setattr(catalogue.CatalogueWriter, "write", fail)
+    with pytest.raises(OSError):
+        manager.update_cache(force=True)
+    assert manager.mod_cache.mods is current
+    assert [mod.name for mod in current] == ["First", "Second"]
+
+
+def test_replaced_catalogue_stays_readable_until_released(manager):
+    table = ModTableModel(manager, page_size=10)
+    table.apply(*table.run_query(TableQuery()))
+    old = manager.mod_cache.mods
+    manager.update_cache(force=True) # e.g. the GUI's background refresh
+
+    assert manager.mod_cache.mods is not old
+    assert not old.closed
+    assert [mod.modid for mod in (table.mod_at(0), table.mod_at(1))] == [2, 1] # the table still reads the old one
+    stale = table.run_query(TableQuery())
+    stale = (stale[0], stale[1], old) # a result computed before the update landed
+    assert not table.apply(*stale)
+
+    table.reload()
+    manager.release_retired_catalogues()
+    assert old.closed
+    assert table.page_mod_ids() == [1, 2]
+    with pytest.raises(CatalogueClosedError):
+        old.column("modid")
+
+
+def test_release_waits_for_queries_on_the_old_catalogue(manager):
+    with manager.reading_index() as index: # a worker query started before the update
+        old = index.mods
+        manager.update_cache(force=True)
+        manager.release_retired_catalogues()
+        assert not old.closed
+        assert list(index.query(sort="name", descending=False)) == [0, 1]
+        assert list(old.column("modid")) == [1, 2]
+    assert old.closed
+    assert [path.name for path in manager._catalogue_files()] == [manager.mod_cache.mods.path.name]
+
+
+def test_concurrent_queries_build_the_index_once(manager, monkeypatch):
+    built = []
+
+    class SlowIndex(mod.ModIndex):
+        def __init__(self, mods):
+            built.append(mods)
+            time.sleep(0.1)
+            super().__init__(mods)
+    monkeypatch.setattr(mod, "ModIndex", SlowIndex)
+    indexes = []
+    workers = [threading.Thread(target=lambda: indexes.append(manager.mod_index)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(5)
+    assert len(built) == 1
+    assert all(index is indexes[0] for index in indexes)
+
+
+def test_json_cache_round_trip(tmp_path, monkeypatch, file_manager):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "downloads").mkdir()
+    api = FakeAPI(listing({"modid": 1, "name": "Ünïcode \"quoted\""}, {"modid": 2, "tags": ["a", "b"]}))
+    manager = ModManager(make_config(format="json"), api, file_manager, load_cache=False)
+    manager.update_cache(force=True)
+    reloaded = ModManager(make_config(format="json"), api, file_manager)
+    assert reloaded.mod_cache.mods == manager.mod_cache.mods
+
+
+def test_updates_never_replace_a_mapped_file(manager, monkeypatch):
+    replace = catalogue.os.replace
+
+    def windows_replace(source, destination):
+        mapped = [manager._catalogue, *manager._retired_catalogues]
+        if any(mapped_catalogue.path == destination for mapped_catalogue in mapped if mapped_catalogue is not None):
+            raise PermissionError("The process cannot access the file because it is being used by another process")
+        replace(source, destination)
+    monkeypatch.setattr(catalogue.os, "replace", windows_replace)
+    first = manager.mod_cache.mods
+    manager.update_cache(force=True)
+    assert manager.mod_cache.mods.path != first.path
+    assert first.path.exists() # still mapped by the retired catalogue
+    manager.release_retired_catalogues()
+    assert [path.name for path in manager._catalogue_files()] == [manager.mod_cache.mods.path.name]
+
+
+def test_reads_the_unversioned_catalogue_of_older_releases(manager, file_manager):
+    manager.mod_cache.mods.path.rename(manager.mod_cache.mods.path.with_name("mod_cache.bin"))
+    reloaded = ModManager(make_config(), manager.api, file_manager)
+    assert [mod.name for mod in reloaded.mod_cache.mods] == ["First", "Second"]
+    reloaded.update_cache(force=True)
+    reloaded.release_retired_catalogues()
+    assert [path.name for path in reloaded._catalogue_files()] == ["mod_cache.1.bin"]
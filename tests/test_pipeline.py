@@ -0,0 +1,58 @@
+import threading
+
+from manager.pipeline import DeployJob, DeployPipeline
+
+
+class Recorder:
+
+    def __init__(self):
+        self.events = []
+        self.threads = set()
+
+    def __call__(self, signal, **attrs):
+        self.events.append((signal, attrs.get("name")))
+        self.threads.add(threading.current_thread())
+
+
+def test_fetched_jobs_are_installed_and_reported(tmp_path):
+    local = tmp_path / "local.zip"
+    local.write_bytes(b"local")
+
+    def fetch(job):
+        path = tmp_path / job.name
+        path.write_bytes(b"fetched")
+        return path
+
+    emit = Recorder()
+    pipeline = DeployPipeline(fetch=fetch, install=lambda job, path: "hardlink", emit=emit, download_workers=2, install_workers=2)
+    progress = pipeline.run([DeployJob("local.zip", 1, "1.0", source=local), DeployJob("remote.zip", 2, "1.0")])
+
+    assert (progress.installed, progress.downloaded, progress.failed) == (2, 1, 0)
+    assert progress.bytes_downloaded == len(b"fetched")
+    assert progress.bytes_installed == len(b"local") + len(b"fetched")
+    assert emit.events.index(("mod_downloaded", "remote.zip")) < emit.events.index(("mod_deployed", "remote.zip"))
+    assert ("mod_deployed", "local.zip") in emit.events
+    assert emit.threads == {threading.current_thread()}
+    assert progress.eta == 0
+
+
+def test_failures_do_not_stop_other_jobs(tmp_path):
+    def fetch(job):
+        raise ConnectionError("offline")
+
+    emit = Recorder()
+    pipeline = DeployPipeline(fetch=fetch, install=lambda job, path: "copy", emit=emit, download_workers=1,
+                              install_workers=1, done_signal="mod_staged")
+    local = tmp_path / "local.zip"
+    local.write_bytes(b"local")
+    progress = pipeline.run([DeployJob("remote.zip", 2, "1.0"), DeployJob("local.zip", 1, "1.0", source=local)])
+
+    assert (progress.installed, progress.failed) == (1, 1)
+    assert progress.failures == {"remote.zip": "fetch: ConnectionError: offline"}
+    assert ("mod_failed", "remote.zip") in emit.events
+    assert ("mod_staged", "local.zip") in emit.events
+
+
+def test_no_jobs():
+    progress = DeployPipeline(fetch=None, install=None, emit=None, download_workers=1, install_workers=1).run([])
+    assert progress.total == 0 and progress.eta is None
@@ -0,0 +1,68 @@
+import pytest
+
+from instrumentation import metrics
+
+from .conftest import local_archive, make_profile_manager
+
+
+@pytest.fixture
+def mods_folder(tmp_path):
+    return tmp_path / "game" / "mods"
+
+
+def test_deploy_applies_the_difference(config, file_manager, downloads, mods_folder):
+    archives = {f"mod{n}-1.0.0.zip": b"archive %d" % n for n in (1, 2, 3)}
+    manager = make_profile_manager(config, file_manager, downloads, archives)
+    local_archive(downloads, "mod1-1.0.0.zip", archives["mod1-1.0.0.zip"])
+    events = []
+    for signal in ("mod_staged", "mod_deployed"):
+        manager.subscribe(signal, lambda event: events.append((event.signal, event.name)))
+    assert manager.deploy_profile("a")
+    assert sorted(events) == [("mod_deployed", "mod1-1.0.0.zip"), ("mod_deployed", "mod2-1.0.0.zip"),
+                              ("mod_staged", "mod1-1.0.0.zip"), ("mod_staged", "mod2-1.0.0.zip")]
+    assert events.index(("mod_staged", "mod2-1.0.0.zip")) < events.index(("mod_deployed", "mod1-1.0.0.zip"))
+    assert sorted(path.name for path in mods_folder.iterdir()) == ["mod1-1.0.0.zip", "mod2-1.0.0.zip"]
+    assert manager.mod.downloaded == ["mod2-1.0.0.zip"] # mod1 was already downloaded
+    assert manager.get_active_profile().name == "a"
+
+    (mods_folder / "mine.zip").write_bytes(b"not from a profile")
+    assert manager.deploy_profile("b")
+    assert sorted(path.name for path in mods_folder.iterdir()) == ["mine.zip", "mod2-1.0.0.zip", "mod3-1.0.0.zip"]
+    assert (mods_folder / "mod3-1.0.0.zip").read_bytes() == b"archive 3"
+    assert manager.mods_snapshot.drift("b", ["mod2-1.0.0.zip", "mod3-1.0.0.zip"], manager.managed_archives()).clean
+
+
+def test_failed_download_leaves_the_mods_folder_alone(config, file_manager, downloads, mods_folder):
+    archives = {f"mod{n}-1.0.0.zip": b"archive %d" % n for n in (1, 2)} # mod3 cannot be downloaded
+    manager = make_profile_manager(config, file_manager, downloads, archives)
+    assert manager.deploy_profile("a")
+    before = {path.name: path.read_bytes() for path in mods_folder.iterdir()}
+
+    failures = []
+    manager.subscribe("mod_failed", lambda event: failures.append(event.name))
+    assert not manager.deploy_profile("b")
+    assert failures == ["mod3-1.0.0.zip"]
+    assert {path.name: path.read_bytes() for path in mods_folder.iterdir()} == before
+    assert manager.get_active_profile().name == "a"
+
+
+def test_dry_run_touches_nothing(config, file_manager, downloads, mods_folder, capsys):
+    manager = make_profile_manager(config, file_manager, downloads, {})
+    assert manager.deploy_profile("a", dry_run=True)
+    assert "mod1-1.0.0.zip (download)" in capsys.readouterr().out
+    assert not mods_folder.exists()
+    assert manager.mod.downloaded == []
+
+
+def test_deploy_counts_only_the_files_placed_in_the_mods_folder(config, file_manager, downloads, monkeypatch):
+    config.app.deploy.link_mode = "copy"
+    archives = {f"mod{n}-1.0.0.zip": b"archive %d" % n for n in (1, 2, 3)}
+    manager = make_profile_manager(config, file_manager, downloads, archives)
+    monkeypatch.setattr(metrics, "enabled", True)
+    metrics.reset()
+    assert manager.deploy_profile("a")
+    assert manager.deploy_profile("b")
+    counters = {labels: value for (name, labels), value in metrics.counters.items() if name == "deploy_files_total"}
+    metrics.reset()
+    # storing the three downloads links (or copies) them too, those are not deploys
+    assert counters == {(("action", "copy"),): 3, (("action", "removed"),): 1, (("action", "kept"),): 1}
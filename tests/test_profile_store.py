@@ -0,0 +1,91 @@
+from datetime import datetime
+import gc
+import threading
+import time
+
+import pytest
+
+from manager import profile_store
+from manager.profile import Profile
+from manager.profile_store import ProfileStore
+
+
+def make_profile(name: str) -> Profile:
+    return Profile(name=name, desc="", mods=[], last_update=datetime(2023, 1, 1))
+
+
+@pytest.fixture
+def store(tmp_path, file_manager):
+    store = ProfileStore(file_manager, tmp_path / "profiles", model=Profile)
+    store.load()
+    return store
+
+
+def test_transaction_writes_each_profile_once(store):
+    with store.transaction():
+        store.add(make_profile("a"))
+        for desc in ("one", "two", "three"):
+            store.get("a").desc = desc
+            store.mark_dirty(store.get("a"))
+    assert store.writes == 1
+    assert Profile.parse_file(store.folder / "a.json").desc == "three"
+
+
+def test_rollback_restores_profiles_in_place(store):
+    store.add(make_profile("a"))
+    held = store.get("a")
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            held.desc = "changed"
+            store.mark_dirty(held)
+            store.remove("a")
+            store.add(make_profile("new"))
+            raise RuntimeError
+    assert store.get("a") is held
+    assert held.desc == ""
+    assert "new" not in store
+    assert store.pending == 0
+
+
+def test_delayed_flush(tmp_path, file_manager):
+    store = ProfileStore(file_manager, tmp_path / "profiles", model=Profile, flush_delay=60)
+    store.load()
+    store.add(make_profile("a"))
+    assert store.pending == 1 and not (store.folder / "a.json").exists()
+    assert store.flush() == 1
+    assert store.pending == 0 and (store.folder / "a.json").exists()
+
+
+def test_stores_are_not_kept_alive_for_the_exit_hook(tmp_path, file_manager):
+    store = ProfileStore(file_manager, tmp_path / "profiles", model=Profile)
+    assert store in profile_store._open_stores
+    del store
+    gc.collect()
+    assert not any(store.folder == tmp_path / "profiles" for store in profile_store._open_stores)
+
+
+def test_timer_flush_and_transaction_do_not_deadlock(tmp_path, file_manager, monkeypatch):
+    store = ProfileStore(file_manager, tmp_path / "profiles", model=Profile, flush_delay=0.05)
+    store.load()
+    writing = threading.Event()
+    write_atomic = file_manager.write_atomic
+
+    def slow_write_atomic(path, data):
+        writing.set()
+        time.sleep(0.2)
+        return write_atomic(path, data)
+    monkeypatch.setattr(file_manager, "write_atomic", slow_write_atomic)
+
+    store.add(make_profile("a"))
+    assert writing.wait(5) # the timer's flush is now writing, holding the write lock
+    store.mark_dirty(make_profile("b"))
+
+    def edit():
+        with store.transaction():
+            store.add(make_profile("c"))
+    worker = threading.Thread(target=edit, daemon=True)
+    worker.start()
+    worker.join(5)
+    assert not worker.is_alive()
+    store.flush()
+    assert sorted(path.name for path in store.folder.glob("*.json")) == ["a.json", "b.json", "c.json"]
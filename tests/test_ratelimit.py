@@ -0,0 +1,56 @@
+import pytest
+
+from api import ratelimit
+from api.ratelimit import RateLimiter, TokenBucket
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 100.0
+        self.slept = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(ratelimit.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_burst_up_to_capacity_then_wait(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    assert [bucket.consume() for _ in range(3)] == [0, 0, 0]
+    assert bucket.consume() == pytest.approx(0.5)
+    assert clock.slept == [pytest.approx(0.5)]
+
+
+def test_refills_over_time(clock):
+    bucket = TokenBucket(rate=10)
+    bucket.consume(10)
+    clock.now += 0.5
+    assert bucket.consume(5) == 0
+    assert bucket.consume(1) == pytest.approx(0.1)
+
+
+def test_disabled_limits_never_wait(clock):
+    limiter = RateLimiter()
+    for _ in range(100):
+        limiter.acquire_request()
+        limiter.consume_bytes(1 << 20)
+    assert clock.slept == []
+
+
+def test_bytes_limit(clock):
+    limiter = RateLimiter(bytes_per_second=1000)
+    limiter.consume_bytes(1000)
+    limiter.consume_bytes(500)
+    assert clock.slept == [pytest.approx(0.5)]
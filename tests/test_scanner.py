@@ -0,0 +1,100 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from manager import scanner
+from manager.scanner import FileStat, FolderSnapshot
+
+
+@pytest.fixture
+def mods(tmp_path):
+    folder = tmp_path / "Mods"
+    folder.mkdir()
+    return folder
+
+
+@pytest.fixture
+def snapshot(tmp_path, mods, file_manager):
+    snapshot = FolderSnapshot(file_manager, mods, tmp_path / "snapshot.json")
+    yield snapshot
+    snapshot.close()
+
+
+def deploy(snapshot, name, data=b"zip"):
+    (snapshot.folder / name).write_bytes(data)
+    snapshot.record_deployed(name)
+
+
+class WindowsEntry:
+    """ A DirEntry as os.scandir() returns it on Windows: stat() knows no inode or device. """
+
+    def __init__(self, entry):
+        self.entry = entry
+        self.name = entry.name
+
+    def is_file(self):
+        return self.entry.is_file()
+
+    def stat(self):
+        stat = self.entry.stat()
+        return SimpleNamespace(st_size=stat.st_size, st_mtime_ns=stat.st_mtime_ns, st_ino=0, st_dev=0)
+
+
+class WindowsScan:
+
+    scandir = os.scandir
+
+    def __init__(self, path):
+        self.scan = WindowsScan.scandir(path)
+
+    def __enter__(self):
+        return (WindowsEntry(entry) for entry in self.scan)
+
+    def __exit__(self, *exc_info):
+        self.scan.close()
+
+
+def test_drift(snapshot):
+    deploy(snapshot, "a.zip")
+    deploy(snapshot, "b.zip")
+    (snapshot.folder / "other.zip").write_bytes(b"")
+    (snapshot.folder / "mine.zip").write_bytes(b"")
+    (snapshot.folder / "b.zip").unlink()
+    drift = snapshot.drift("default", expected=["a.zip", "b.zip"], managed=["a.zip", "b.zip", "other.zip"])
+    assert (drift.extra, drift.unmanaged, drift.missing, drift.modified) == (["other.zip"], ["mine.zip"], ["b.zip"], [])
+    assert not drift.clean
+
+
+def test_listing_without_inodes_is_not_a_modification(snapshot, monkeypatch):
+    deploy(snapshot, "a.zip")
+    monkeypatch.setattr(scanner.os, "scandir", WindowsScan)
+    changes = snapshot._list(os.stat(snapshot.folder).st_mtime_ns)
+    assert changes.listed and not changes
+    assert snapshot.entries["a.zip"].inode == 0
+    assert not snapshot.is_modified("a.zip")
+    assert not snapshot.entries["a.zip"].same_file(snapshot.deployed["a.zip"])
+
+
+def test_edited_archive_is_modified(snapshot):
+    deploy(snapshot, "a.zip")
+    stat = os.stat(snapshot.folder / "a.zip")
+    (snapshot.folder / "a.zip").write_bytes(b"edited")
+    os.utime(snapshot.folder / "a.zip", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert snapshot.refresh().changed == ["a.zip"]
+    assert snapshot.is_modified("a.zip")
+
+
+def test_snapshot_survives_a_restart(tmp_path, mods, file_manager, snapshot):
+    deploy(snapshot, "a.zip")
+    snapshot.save()
+    restarted = FolderSnapshot(file_manager, mods, tmp_path / "snapshot.json")
+    assert restarted.deployed == snapshot.deployed
+    assert not restarted.refresh()
+    restarted.forget("a.zip")
+    assert "a.zip" not in restarted.deployed
+
+
+def test_file_stat_equality_ignores_the_inode():
+    assert FileStat(3, 10, 0, 0) == FileStat(3, 10, 42, 7)
+    assert FileStat(3, 10, 42, 7) != FileStat(3, 11, 42, 7)
@@ -0,0 +1,104 @@
+import os
+
+import pytest
+
+from manager.store import ArchiveStore
+
+
+@pytest.fixture
+def store(tmp_path, file_manager):
+    return ArchiveStore(file_manager, tmp_path / "store")
+
+
+def test_ingest_links_the_download_to_one_blob(tmp_path, store):
+    first = tmp_path / "mod-1.0.zip"
+    second = tmp_path / "copy-of-mod-1.0.zip"
+    first.write_bytes(b"archive")
+    second.write_bytes(b"archive")
+    sha256 = store.ingest(first)
+    assert store.ingest(second) == sha256
+    blob = store.blob_path(sha256)
+    assert store.has(sha256)
+    assert blob.read_bytes() == b"archive"
+    assert os.path.samefile(first, blob) and os.path.samefile(second, blob)
+    assert store.blobs[sha256]["names"] == [str(first), str(second)]
+
+
+def test_index_survives_a_reload(tmp_path, store, file_manager):
+    archive = tmp_path / "mod.zip"
+    archive.write_bytes(b"archive")
+    sha256 = store.ingest(archive)
+    store.set_profile_refs("default", [sha256])
+    reloaded = ArchiveStore(file_manager, store.root)
+    assert reloaded.blobs == store.blobs
+    assert reloaded.refs == {sha256: ["default"]}
+
+
+def test_gc_removes_unreferenced_blobs(tmp_path, store):
+    kept, dropped = tmp_path / "kept.zip", tmp_path / "dropped.zip"
+    kept.write_bytes(b"kept")
+    dropped.write_bytes(b"dropped")
+    kept_hash, dropped_hash = store.ingest(kept), store.ingest(dropped)
+    store.set_profile_refs("default", [kept_hash, dropped_hash])
+    store.set_profile_refs("default", [kept_hash])
+
+    assert store.gc(dry_run=True) == {"blobs": 1, "bytes": len(b"dropped")}
+    assert dropped.exists()
+    assert store.gc() == {"blobs": 1, "bytes": len(b"dropped")}
+    assert not dropped.exists() and not store.has(dropped_hash)
+    assert kept.exists() and store.has(kept_hash)
+
+
+def test_drop_profile(tmp_path, store):
+    archive = tmp_path / "mod.zip"
+    archive.write_bytes(b"archive")
+    sha256 = store.ingest(archive)
+    store.set_profile_refs("a", [sha256])
+    store.set_profile_refs("b", [sha256])
+    store.drop_profile("a")
+    assert store.refs == {sha256: ["b"]}
+    store.drop_profile("b")
+    assert store.unreferenced() == [sha256]
+
+
+def test_batch_writes_the_index_once(tmp_path, store, file_manager, monkeypatch):
+    writes = []
+    write_atomic = file_manager.write_atomic
+    monkeypatch.setattr(file_manager, "write_atomic", lambda path, data: writes.append(path) or write_atomic(path, data))
+    with store.batch():
+        hashes = []
+        for n in range(3):
+            archive = tmp_path / f"mod{n}.zip"
+            archive.write_bytes(b"archive %d" % n)
+            hashes.append(store.ingest(archive))
+        store.set_profile_refs("default", hashes)
+        assert writes == []
+    assert writes == [store.root / "index.json"]
+    assert ArchiveStore(file_manager, store.root).refs == {sha256: ["default"] for sha256 in hashes}
+
+
+def test_damaged_index_is_rebuilt_from_the_blobs(tmp_path, store, file_manager):
+    archive = tmp_path / "mod.zip"
+    archive.write_bytes(b"archive")
+    sha256 = store.ingest(archive)
+    index = store.root / "index.json"
+    index.write_text(index.read_text()[:20]) # cut short mid-write
+    rebuilt = ArchiveStore(file_manager, store.root)
+    assert rebuilt.blobs == {sha256: {"size": len(b"archive"), "names": []}}
+    assert rebuilt.refs == {}
+    assert ArchiveStore(file_manager, store.root).blobs == rebuilt.blobs
+
+
+def test_gc_removes_copied_downloads(tmp_path, file_manager):
+    file_manager.cfg.app.deploy.link_mode = "copy" # e.g. downloads and store on different filesystems
+    store = ArchiveStore(file_manager, tmp_path / "store")
+    copied, replaced = tmp_path / "copied.zip", tmp_path / "replaced.zip"
+    copied.write_bytes(b"archive")
+    replaced.write_bytes(b"archive")
+    sha256 = store.ingest(copied)
+    store.ingest(replaced)
+    assert not os.path.samefile(copied, store.blob_path(sha256))
+    replaced.write_bytes(b"another archive") # the name now holds something else
+    assert store.gc() == {"blobs": 1, "bytes": len(b"archive")}
+    assert not copied.exists()
+    assert replaced.read_bytes() == b"another archive"
@@ -0,0 +1,54 @@
+import pytest
+
+from text_stripper import TRUNCATION_MARKER, DescriptionRenderer, TextStripper
+
+
+@pytest.fixture
+def renderer(tmp_path):
+    renderer = DescriptionRenderer(max_entries=2, max_chars=20, cache_path=tmp_path / "descriptions.json")
+    yield renderer
+    renderer.shutdown()
+
+
+def test_parser_is_reusable():
+    stripper = TextStripper()
+    assert stripper.strip("<p>Fish &amp; <b>chips</b></p>") == "Fish & chips"
+    assert stripper.strip("<p>second") == "second"
+
+
+def test_render_is_memoized(renderer):
+    assert renderer.render(1, "<p>Hello</p>") == "Hello"
+    assert renderer.render(1, "<p>Hello</p>") == "Hello"
+    assert renderer.render(1, "<p>Edited</p>") == "Edited" # a changed description is rendered again
+    assert renderer.render(2, "") == ""
+    assert renderer.stats() == {"hits": 1, "misses": 2, "entries": 2}
+
+
+def test_long_descriptions_are_capped(renderer):
+    assert renderer.render(1, "<p>" + "x" * 50 + "</p>") == "x" * 20 + TRUNCATION_MARKER
+
+
+def test_least_recently_used_entries_are_dropped(renderer):
+    for assetid in (1, 2):
+        renderer.render(assetid, f"<p>{assetid}</p>")
+    renderer.render(1, "<p>1</p>")
+    renderer.render(3, "<p>3</p>")
+    assert renderer.cache_key(2, "<p>2</p>") not in renderer._rendered
+    assert renderer.cache_key(1, "<p>1</p>") in renderer._rendered
+
+
+def test_prerender_and_persist(tmp_path, renderer):
+    documents = iter([(1, "<p>one</p>"), (2, "<p>two</p>")]) # consumed on the worker thread
+    assert renderer.prerender(documents).result(5) == ["one", "two"]
+    renderer.save()
+    reloaded = DescriptionRenderer(max_entries=2, max_chars=20, cache_path=tmp_path / "descriptions.json")
+    assert reloaded.render(2, "<p>two</p>") == "two"
+    assert reloaded.stats()["hits"] == 1
+    reloaded.shutdown()
+
+
+def test_damaged_cache_is_ignored(tmp_path):
+    (tmp_path / "descriptions.json").write_text("{not json")
+    renderer = DescriptionRenderer(max_entries=2, max_chars=20, cache_path=tmp_path / "descriptions.json")
+    assert renderer.stats()["entries"] == 0
+    renderer.shutdown()
@@ -0,0 +1,55 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+from manager.profile import Profile
+from manager.updates import UpdateChecker, is_prerelease, version_key
+
+from .conftest import profile_entry
+
+
+def test_semver_precedence():
+    ordered = ["not a version", "1.0.0-alpha", "1.0.0-alpha.1", "1.0.0-alpha.beta", "1.0.0-beta", "1.0.0-beta.2",
+               "1.0.0-beta.11", "1.0.0-rc.1", "1.0.0", "1.2", "v1.2.1", "1.10.0"]
+    assert sorted(reversed(ordered), key=version_key) == ordered
+    assert version_key("1.2.0+build.5") == version_key("1.2") == version_key("1.2.0")
+
+
+def test_is_prerelease():
+    assert is_prerelease("1.0.0-rc.1")
+    assert not is_prerelease("1.0.0+build.1")
+    assert not is_prerelease("nonsense")
+
+
+class FakeModManager:
+
+    def __init__(self, releases):
+        self.releases = releases
+        self.lookups = []
+
+    def get_mod_info(self, modid, refresh=False):
+        self.lookups.append(modid)
+        if modid not in self.releases:
+            raise ConnectionError("mod db unreachable")
+        return SimpleNamespace(releases=[{"modversion": version, "mainfile": f"files/mod{modid}-{version}.zip"}
+                                         for version in self.releases[modid]])
+
+
+def make_profile(name, downloads, *mods):
+    return Profile(name=name, desc="", last_update=datetime(2023, 1, 1),
+                   mods=[profile_entry(downloads, modid, version) for modid, version in mods])
+
+
+def test_check_looks_each_mod_up_once(tmp_path):
+    mod_manager = FakeModManager({1: ["1.9.0", "1.10.0", "2.0.0-rc.1"], 2: ["1.0.0"]})
+    checker = UpdateChecker(mod_manager, api=None, workers=2)
+    profiles = [make_profile("a", tmp_path, (1, "1.9.0"), (2, "1.0.0")), make_profile("b", tmp_path, (1, "1.10.0"), (3, "1.0.0"))]
+    report = checker.check(profiles)
+
+    assert sorted(mod_manager.lookups) == [1, 2, 3] and report.checked == 3
+    assert [(update.modid, update.latest) for update in report.profiles["a"]] == [(1, "1.10.0")]
+    assert report.profiles["b"] == []
+    assert list(report.errors) == [3]
+    assert report.release_stubs() == {(1, "1.10.0"): "files/mod1-1.10.0.zip"}
+
+    checker.include_prereleases = True
+    assert [update.latest for update in checker.check(profiles).profiles["b"]] == ["2.0.0-rc.1"]
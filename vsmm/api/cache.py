@@ -0,0 +1,105 @@
+"""
+On-disk cache of ModDB API responses, revalidated with ETag/Last-Modified.
+"""
+from dataclasses import dataclass
+import hashlib
+import json
+import os
+import pathlib
+from typing import Dict, Iterable, Iterator, Optional
+
+
+@dataclass
+class CachedResponse:
+    key: str
+    body: Optional[bytes] # None when loaded without the body
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class ResponseCache:
+    """ Stores response bodies keyed by api stub + query params, alongside the validators the server sent. """
+
+    def __init__(self, cache_dir: pathlib.Path):
+        self.cache_dir = pathlib.Path(cache_dir)
+
+    @staticmethod
+    def make_key(stub: str, params: Dict = None) -> str:
+        raw = json.dumps([stub.strip("/"), params or {}], sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str):
+        return self.cache_dir / f"{key}.body", self.cache_dir / f"{key}.meta.json"
+
+    def load(self, key: str, with_body: bool = True) -> Optional[CachedResponse]:
+        body_path, meta_path = self._paths(key)
+        if not (body_path.is_file() and meta_path.is_file()):
+            return None
+        try:
+            meta = json.loads(meta_path.read_bytes())
+            body = body_path.read_bytes() if with_body else None
+        except (OSError, ValueError):
+            return None # a damaged entry is just a cache miss
+        return CachedResponse(key=key, body=body, etag=meta.get("etag"), last_modified=meta.get("last_modified"))
+
+    def store(self, key: str, body: bytes, etag: str = None, last_modified: str = None) -> Optional[CachedResponse]:
+        """ Persist a response. Responses without validators are not worth keeping, as they can never be revalidated. """
+        if not (etag or last_modified):
+            return None
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        body_path, meta_path = self._paths(key)
+        self._write_replace(body_path, body)
+        self._write_replace(meta_path, json.dumps({"etag": etag, "last_modified": last_modified}).encode("utf-8"))
+        return CachedResponse(key=key, body=body, etag=etag, last_modified=last_modified)
+
+    def store_stream(self, key: str, chunks: Iterable[bytes], etag: str = None, last_modified: str = None) -> Iterator[bytes]:
+        """ Pass a streamed response through while writing it to the cache. The entry is only replaced once the
+        whole body went through, a stream abandoned halfway leaves the previous entry in place. """
+        if not (etag or last_modified):
+            yield from chunks
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        body_path, meta_path = self._paths(key)
+        tmp_path = body_path.with_name(body_path.name + ".tmp")
+        complete = False
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            complete = True
+        finally:
+            if not complete and tmp_path.exists():
+                tmp_path.unlink()
+        os.replace(tmp_path, body_path)
+        self._write_replace(meta_path, json.dumps({"etag": etag, "last_modified": last_modified}).encode("utf-8"))
+
+    def iter_body(self, key: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """ Read a cached body back in chunks. """
+        with open(self._paths(key)[0], "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def conditional_headers(self, cached: Optional[CachedResponse]) -> Dict[str, str]:
+        headers = {}
+        if cached is None:
+            return headers
+        if cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+        return headers
+
+    def invalidate(self, key: str):
+        for path in self._paths(key):
+            if path.exists():
+                path.unlink()
+
+    def _write_replace(self, path: pathlib.Path, data: bytes):
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
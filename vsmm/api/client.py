@@ -1,17 +1,41 @@
 """
 API Client for Vintage Story MOD DB
 """
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
+import hashlib
+import json
+import os
+from os import getcwd
 import pathlib
-from typing import Dict, List
-from app_config import AppConfig
+import time
+import zipfile
+from typing import Dict, Iterator, List, Optional, Tuple
 from config import configuration
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from os.path import exists, isfile
 
+from instrumentation import metrics
+
+from .cache import ResponseCache
+from .jsonstream import iter_array
+from .manifest import ArchiveManifest, hash_file, verify_archive, write_manifest
+from .ratelimit import RateLimiter
+
 BASE_API_URI = "http://mods.vintagestory.at/api/{stub}"
 BASE_FILE_URI = "https://mods.vintagestory.at/{file_path}"
-FILE_CHUNK_SIZE = 8192
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+STREAM_CHUNK_SIZE = 64 * 1024 # read size for streamed api responses
+CHUNK_TARGET_SECONDS = 0.25 # grow or shrink reads so each one takes roughly this long
+PART_SUFFIX = ".part"
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class DownloadIntegrityError(IOError):
+    pass
 
 
 @dataclass
@@ -24,6 +48,18 @@ class SearchQueryParams:
     orderdirection: str
 
 
+@dataclass
+class BulkDownloadResult:
+    modid: int
+    version: str
+    path: Optional[pathlib.Path] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
 class RequestClient:
 
     headers = {
@@ -31,25 +67,210 @@ class RequestClient:
         'From': ''  # This is another valid field
     }
     def __init__(self, cfg: configuration):
-        #todo: pass app config on init
         self.cfg = cfg
-        pass
+        self.session = self._make_session()
+        self.rate_limiter = RateLimiter(
+            requests_per_second=self.cfg.app.http.requests_per_second,
+            bytes_per_second=self.cfg.app.http.bytes_per_second,
+        )
+        self.response_cache = None
+        if self.cfg.app.http.cache:
+            self.response_cache = ResponseCache(pathlib.Path(getcwd(), self.cfg.app.downloads_location, "http_cache"))
+
+    def _make_session(self) -> requests.Session:
+        """ One pooled keep-alive session shared by every request this client makes. """
+        # backoff is bounded by the retry count: factor * 2^(retries-1) seconds at most between attempts
+        retry = Retry(
+            total=self.cfg.app.http.retries,
+            backoff_factor=self.cfg.app.http.backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=self.cfg.app.http.pool_size,
+            pool_maxsize=self.cfg.app.http.pool_size,
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.headers.update(self.headers)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
 
     def get(self, stub, params=None):
         query_params = params.as_dict() if params else None
-        response = requests.get(BASE_API_URI.format(stub=stub), params=query_params, headers=self.headers)
-        # todo: check response, raise exc
-        return response.json()
+        endpoint = stub.strip("/").split("/")[0] # "mod/123" -> "mod", keeps metric labels bounded
+        self.rate_limiter.acquire_request()
+        if self.response_cache is None:
+            with metrics.span("http.get", endpoint=endpoint):
+                response = self.session.get(BASE_API_URI.format(stub=stub), params=query_params)
+                self._count_response(endpoint, response)
+                response.raise_for_status()
+            with metrics.span("http.parse", endpoint=endpoint):
+                return response.json()
+
+        cache_key = ResponseCache.make_key(stub, query_params)
+        cached = self.response_cache.load(cache_key)
+        with metrics.span("http.get", endpoint=endpoint):
+            response = self.session.get(
+                BASE_API_URI.format(stub=stub),
+                params=query_params,
+                headers=self.response_cache.conditional_headers(cached),
+            )
+            self._count_response(endpoint, response)
+        if response.status_code == 304 and cached is not None:
+            metrics.count("http_cache_hits_total", endpoint=endpoint)
+            with metrics.span("http.parse", endpoint=endpoint):
+                return json.loads(cached.body) # unchanged on the server, reuse what we already have
+        response.raise_for_status()
+        self.response_cache.store(
+            cache_key,
+            response.content,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+        with metrics.span("http.parse", endpoint=endpoint):
+            return response.json()
+
+    def stream(self, stub, params=None) -> Iterator[bytes]:
+        """ Like get, but yields the raw response body in chunks as it arrives instead of parsing it. A 304 replays
+        the cached body from disk, chunk by chunk as well. """
+        query_params = params.as_dict() if params else None
+        endpoint = stub.strip("/").split("/")[0]
+        cache_key = cached = None
+        headers = {}
+        if self.response_cache is not None:
+            cache_key = ResponseCache.make_key(stub, query_params)
+            cached = self.response_cache.load(cache_key, with_body=False)
+            headers = self.response_cache.conditional_headers(cached)
+        self.rate_limiter.acquire_request()
+        with metrics.span("http.get", endpoint=endpoint):
+            response = self.session.get(BASE_API_URI.format(stub=stub), params=query_params, headers=headers, stream=True)
+        with response:
+            metrics.count("http_requests_total", endpoint=endpoint, status=response.status_code)
+            if response.status_code == 304 and cached is not None:
+                metrics.count("http_cache_hits_total", endpoint=endpoint)
+                yield from self.response_cache.iter_body(cache_key, STREAM_CHUNK_SIZE)
+                return
+            response.raise_for_status()
+            chunks = response.iter_content(STREAM_CHUNK_SIZE)
+            if self.response_cache is not None:
+                chunks = self.response_cache.store_stream(
+                    cache_key,
+                    chunks,
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified"),
+                )
+            for chunk in chunks:
+                metrics.count("http_received_bytes_total", len(chunk), endpoint=endpoint)
+                yield chunk
+
+    @staticmethod
+    def _count_response(endpoint: str, response: requests.Response):
+        metrics.count("http_requests_total", endpoint=endpoint, status=response.status_code)
+        metrics.count("http_received_bytes_total", len(response.content), endpoint=endpoint)
+
+    def close(self):
+        self.session.close()
 
     def download_archive(self, url, save_location: pathlib.Path) -> pathlib.Path:
-        if exists(save_location) and isfile(save_location): return save_location # dont redownload existing files
-        with requests.get(url, stream=True) as req:
+        """ Download url to save_location via a .part file that is resumed with a Range request if interrupted,
+        checked against the advertised size, hashed into a sidecar manifest and then renamed into place. """
+        save_location = pathlib.Path(save_location)
+        if self._is_complete_archive(url, save_location):
+            metrics.count("downloads_total", result="cached")
+            return save_location # dont redownload existing files
+        with metrics.span("http.download"):
+            return self._download_archive(url, save_location)
+
+    def _download_archive(self, url, save_location: pathlib.Path) -> pathlib.Path:
+        part_path = save_location.with_name(save_location.name + PART_SUFFIX)
+        validator_path = part_path.with_name(part_path.name + ".validator")
+        offset = part_path.stat().st_size if part_path.is_file() else 0
+
+        headers = {"Accept-Encoding": "identity"} # byte offsets must refer to the raw archive
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            if validator_path.is_file():
+                headers["If-Range"] = validator_path.read_text() # server sends the whole file if it changed
+
+        self.rate_limiter.acquire_request()
+        with self.session.get(url, stream=True, headers=headers) as req:
+            if req.status_code == 416: # the part file is unusable, start again
+                self._discard(part_path, validator_path)
+                return self._download_archive(url, save_location)
+            metrics.count("http_requests_total", endpoint="files", status=req.status_code)
             req.raise_for_status()
-            with open(str(save_location), 'wb') as f:
-                for chunk in req.iter_content(chunk_size=FILE_CHUNK_SIZE):
-                    f.write(chunk)
+            digest = hashlib.sha256()
+            if req.status_code == 206:
+                hash_file(part_path, digest)
+            else:
+                offset = 0
+            expected_size = self._expected_size(req, offset)
+            validator = req.headers.get("ETag") or req.headers.get("Last-Modified")
+            if validator:
+                validator_path.write_text(validator)
+            with open(part_path, "ab" if offset else "wb", buffering=MAX_CHUNK_SIZE) as f:
+                self._stream_to_file(req, f, digest)
+                f.flush()
+                os.fsync(f.fileno())
+
+        size = part_path.stat().st_size
+        metrics.count("http_received_bytes_total", size - offset, endpoint="files")
+        metrics.count("downloads_total", result="resumed" if offset else "downloaded")
+        if expected_size is not None and size != expected_size:
+            raise DownloadIntegrityError(f"{url}: expected {expected_size} bytes, got {size}") # keep .part to resume
+        if save_location.suffix == ".zip" and not zipfile.is_zipfile(part_path):
+            self._discard(part_path, validator_path)
+            raise DownloadIntegrityError(f"{url}: downloaded file is not a valid zip archive")
+        os.replace(part_path, save_location)
+        self._discard(validator_path)
+        write_manifest(save_location, ArchiveManifest(url=url, size=size, sha256=digest.hexdigest()))
         return save_location
 
+    def _is_complete_archive(self, url, save_location: pathlib.Path) -> bool:
+        if not (exists(save_location) and isfile(save_location)):
+            return False
+        if verify_archive(save_location):
+            return True
+        # archives downloaded before manifests existed are trusted only if the zip directory is intact
+        if save_location.suffix == ".zip" and zipfile.is_zipfile(save_location):
+            write_manifest(save_location, ArchiveManifest(
+                url=url, size=save_location.stat().st_size, sha256=hash_file(save_location).hexdigest()
+            ))
+            return True
+        return False
+
+    def _expected_size(self, req: requests.Response, offset: int) -> Optional[int]:
+        content_range = req.headers.get("Content-Range", "") # "bytes start-end/total"
+        if req.status_code == 206 and "/" in content_range and not content_range.endswith("*"):
+            return int(content_range.rsplit("/", 1)[1])
+        content_length = req.headers.get("Content-Length")
+        return offset + int(content_length) if content_length is not None else None
+
+    def _stream_to_file(self, req: requests.Response, f, digest):
+        """ Copy the response body into f, adapting the read size to the link speed. """
+        chunk_size = MIN_CHUNK_SIZE
+        while True:
+            started = time.monotonic()
+            chunk = req.raw.read(chunk_size)
+            if not chunk:
+                break
+            elapsed = time.monotonic() - started
+            self.rate_limiter.consume_bytes(len(chunk))
+            digest.update(chunk)
+            f.write(chunk)
+            if elapsed < CHUNK_TARGET_SECONDS / 2:
+                chunk_size = min(chunk_size * 2, MAX_CHUNK_SIZE)
+            elif elapsed > CHUNK_TARGET_SECONDS * 2:
+                chunk_size = max(chunk_size // 2, MIN_CHUNK_SIZE)
+
+    def _discard(self, *paths: pathlib.Path):
+        for path in paths:
+            if path.exists():
+                path.unlink()
+
 
 
 class APIClient(RequestClient):
@@ -76,15 +297,53 @@ class APIClient(RequestClient):
     def get_mods(self, query: SearchQueryParams=None) -> Dict:
         return self.get("mods", query)["mods"]
 
+    def iter_mods(self, query: SearchQueryParams=None) -> Iterator[Dict]:
+        """ The mods of get_mods, parsed and yielded one at a time while the response is still downloading. """
+        return iter_array(self.stream("mods", query), "mods")
+
     def get_mod_metadata(self, modid: int) -> Dict:
         return self.get("mod/{}".format(modid))["mod"]
 
     def download_mod(self, archive_asset_stub: str, save_location: pathlib.Path) -> pathlib.Path:
         return self.download_archive(BASE_FILE_URI.format(file_path=archive_asset_stub), save_location)
 
-    def bulk_download_mods(self, mod_ids: List[int]) -> List[str]:
-        downloaded_files = []
-        for id in mod_ids:
-            downloaded_files.append(self.download_archive(id))
-            # todo: add rate limit
-        return downloaded_files
\ No newline at end of file
+    def get_asset(self, url: str) -> bytes:
+        """ Download an image (mod logo or screenshot) into memory. Paths without a host are on the file server. """
+        if "://" not in url:
+            url = BASE_FILE_URI.format(file_path=url.lstrip("/"))
+        self.rate_limiter.acquire_request()
+        with metrics.span("http.get", endpoint="assets"):
+            response = self.session.get(url)
+            self._count_response("assets", response)
+            response.raise_for_status()
+        return response.content
+
+    def get_release_stub(self, modid: int, version: str) -> str:
+        """ Resolve a mod version to the asset stub of its release archive. """
+        for release in self.get_mod_metadata(modid)["releases"]:
+            if release["modversion"] == version:
+                return release["mainfile"]
+        raise ValueError(f"Mod {modid} has no release {version}")
+
+    def bulk_download_mods(self, mods: List[Tuple[int, str]], save_dir: pathlib.Path, max_workers: int = None,
+                           stubs: Dict[Tuple[int, str], str] = None) -> Iterator[BulkDownloadResult]:
+        """ Download the release archives for (modid, version) pairs concurrently. stubs maps pairs whose asset
+        stub the caller already knows, those skip the metadata lookup.
+        Results are yielded as each file finishes; a failed mod is reported, not raised. """
+        pending = list(dict.fromkeys(mods)) # drop duplicates, keep order
+        if not pending:
+            return
+        workers = max_workers or self.cfg.app.downloads.workers
+        with ThreadPoolExecutor(max_workers=min(workers, len(pending)), thread_name_prefix="vsmm-download") as pool:
+            futures = [pool.submit(self._download_release, modid, version, pathlib.Path(save_dir), (stubs or {}).get((modid, version)))
+                       for modid, version in pending]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def _download_release(self, modid: int, version: str, save_dir: pathlib.Path, asset_stub: str = None) -> BulkDownloadResult:
+        try:
+            asset_stub = asset_stub or self.get_release_stub(modid, version)
+            path = self.download_mod(asset_stub, save_dir / asset_stub.split('/')[-1])
+        except (requests.RequestException, OSError, KeyError, ValueError) as exc:
+            return BulkDownloadResult(modid=modid, version=version, error=f"{type(exc).__name__}: {exc}")
+        return BulkDownloadResult(modid=modid, version=version, path=path)
\ No newline at end of file
@@ -0,0 +1,114 @@
+"""
+Incremental parsing of large JSON responses.
+
+iter_array() yields the items of one array in the top-level object as the bytes arrive, so only the item being
+parsed and the current network chunk are held in memory, never the whole document. Each item is decoded with the
+stdlib decoder (json.JSONDecoder.raw_decode), retrying with more input whenever an item straddles a chunk boundary.
+"""
+import codecs
+import json
+from typing import Any, Iterable, Iterator
+
+WHITESPACE = " \t\n\r"
+NUMBER_CHARS = frozenset("0123456789+-.eE")
+
+_decoder = json.JSONDecoder()
+
+
+class JSONStreamError(ValueError):
+    pass
+
+
+class _Buffer:
+    """ A sliding window of decoded text over a stream of byte chunks. """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._decode = codecs.getincrementaldecoder("utf-8")().decode
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """ Append the next chunk and drop the text already consumed. False once the stream is exhausted. """
+        if self.eof:
+            return False
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self.eof = True
+            tail = self._decode(b"", final=True)
+        else:
+            tail = self._decode(chunk)
+        self.text = self.text[self.pos:] + tail
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """ The next non-whitespace character, or "" at the end of the stream. """
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text) or not self.fill():
+                return self.text[self.pos:self.pos + 1]
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise JSONStreamError(f"Expected {char!r}, found {found or 'end of document'!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError as exc:
+                if self.fill():
+                    continue # the value is incomplete, read on
+                raise JSONStreamError(f"Malformed JSON: {exc.msg}") from None
+            # strings, objects and arrays are self-delimiting, a number may continue past the end of the buffer,
+            # including through a fraction or exponent that is still incomplete ("3." or "1e")
+            if isinstance(value, (int, float)) and not isinstance(value, bool) \
+                    and all(char in NUMBER_CHARS for char in self.text[end:]) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def drain(self):
+        while self.fill():
+            self.pos = len(self.text)
+
+
+def iter_array(chunks: Iterable[bytes], key: str) -> Iterator[Any]:
+    """ Yield the items of the array stored under key in the top-level object of the JSON document in chunks.
+    The rest of the stream is read (not parsed) afterwards, so a caller teeing it into a cache sees all of it. """
+    buffer = _Buffer(chunks)
+    buffer.expect("{")
+    while buffer.peek() != "}":
+        name = buffer.value()
+        if not isinstance(name, str):
+            raise JSONStreamError(f"Expected an object key, found {name!r}")
+        buffer.expect(":")
+        if name == key:
+            yield from _iter_items(buffer)
+            buffer.drain()
+            return
+        buffer.value() # some other member, e.g. statuscode
+        if buffer.peek() == ",":
+            buffer.pos += 1
+    raise JSONStreamError(f"Document has no {key!r} member")
+
+
+def _iter_items(buffer: _Buffer) -> Iterator[Any]:
+    buffer.expect("[")
+    if buffer.peek() == "]":
+        buffer.pos += 1
+        return
+    while True:
+        yield buffer.value()
+        separator = buffer.peek()
+        buffer.pos += 1
+        if separator == "]":
+            return
+        if separator != ",":
+            raise JSONStreamError(f"Expected ',' or ']' in array, found {separator or 'end of document'!r}")
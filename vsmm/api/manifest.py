@@ -0,0 +1,61 @@
+"""
+Sidecar manifests recording the size and content hash of a completed archive download.
+"""
+from dataclasses import asdict, dataclass
+import hashlib
+import json
+import os
+import pathlib
+from typing import Optional
+
+MANIFEST_SUFFIX = ".manifest.json"
+HASH_READ_SIZE = 1024 * 1024
+
+
+@dataclass
+class ArchiveManifest:
+    url: str
+    size: int
+    sha256: str
+
+
+def manifest_path(archive_path: pathlib.Path) -> pathlib.Path:
+    archive_path = pathlib.Path(archive_path)
+    return archive_path.with_name(archive_path.name + MANIFEST_SUFFIX)
+
+
+def read_manifest(archive_path: pathlib.Path) -> Optional[ArchiveManifest]:
+    try:
+        return ArchiveManifest(**json.loads(manifest_path(archive_path).read_bytes()))
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def write_manifest(archive_path: pathlib.Path, manifest: ArchiveManifest):
+    path = manifest_path(archive_path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(asdict(manifest), f)
+    os.replace(tmp_path, path)
+
+
+def hash_file(path: pathlib.Path, digest=None):
+    """ Feed the contents of path into digest (a new sha256 by default) and return it. """
+    digest = digest if digest is not None else hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_READ_SIZE), b""):
+            digest.update(block)
+    return digest
+
+
+def verify_archive(archive_path: pathlib.Path, full: bool = False) -> bool:
+    """ Check an archive against its manifest. The size check is cheap; full=True also re-hashes the content. """
+    manifest = read_manifest(archive_path)
+    if manifest is None:
+        return False
+    try:
+        if os.path.getsize(archive_path) != manifest.size:
+            return False
+    except OSError:
+        return False
+    return not full or hash_file(archive_path).hexdigest() == manifest.sha256
@@ -0,0 +1,44 @@
+"""
+Token bucket rate limiting shared by every request a client makes, so concurrent workers stay polite to the ModDB.
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    """ Thread-safe token bucket. Callers that overdraw the bucket reserve their tokens and sleep off the debt. """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount: float = 1.0) -> float:
+        """ Take amount tokens, blocking until they are available. Returns the time spent waiting. """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class RateLimiter:
+    """ Global requests-per-second and bytes-per-second limits. A rate of 0 (or None) disables that limit. """
+
+    def __init__(self, requests_per_second: float = 0, bytes_per_second: float = 0):
+        self.requests = TokenBucket(requests_per_second) if requests_per_second else None
+        self.bytes = TokenBucket(bytes_per_second) if bytes_per_second else None
+
+    def acquire_request(self):
+        if self.requests is not None:
+            self.requests.consume(1)
+
+    def consume_bytes(self, amount: int):
+        if self.bytes is not None and amount:
+            self.bytes.consume(amount)
@@ -0,0 +1,437 @@
+"""
+Headless command line interface, for deploying profiles to servers from cron or CI.
+
+    vsmm mods list [--limit N] [--sort KEY]
+    vsmm mods search TEXT [--tag TAG] [--author NAME] [--side SIDE]
+    vsmm profiles list | create NAME [--desc TEXT] | add NAME MODID VERSION | remove NAME MODID VERSION
+    vsmm deploy NAME [--dry-run] [--target T ... | --all-targets]
+    vsmm undeploy NAME [--target T ... | --all-targets]
+    vsmm targets list | add NAME GAME_PATH | remove NAME
+    vsmm status [NAME]
+    vsmm check-updates [--profile NAME] [--prefetch]
+    vsmm archives [--folder PATH | --downloads]
+    vsmm prune [--dry-run]
+
+Every command prints a single JSON document on stdout when --json is given (progress messages go to stderr) and
+exits non-zero on failure. --metrics, --metrics-log and --cprofile record where a command spent its time. Nothing beyond what a command needs is imported or loaded: PySimpleGUI never is, the
+http stack only when a command actually talks to the mod db, and the mod catalogue only for the mods commands.
+"""
+import argparse
+from contextlib import redirect_stdout
+from dataclasses import asdict
+import json
+from os import chdir, getcwd
+from pathlib import Path
+import sys
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent)) # modules import each other relative to vsmm/, as in main.py
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+
+
+class CommandError(Exception):
+    pass
+
+
+class LazyAPIClient:
+    """ Builds the real APIClient (and imports requests) the first time anything asks the mod db for something. """
+
+    def __init__(self, cfg):
+        self._cfg = cfg
+        self._client = None
+        self._lock = threading.Lock() # update checks reach for the client from several threads at once
+
+    def __getattr__(self, name):
+        with self._lock:
+            if self._client is None:
+                from api.client import APIClient
+                self._client = APIClient(self._cfg)
+        return getattr(self._client, name)
+
+
+class Context:
+    """ Builds the managers on demand so each command only pays for what it uses. """
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.api = LazyAPIClient(cfg)
+        self._file_manager = None
+        self._mod_manager = None
+        self._profile_manager = None
+        self._fleet = None
+
+    @property
+    def file_manager(self):
+        if self._file_manager is None:
+            from manager.file import FileManager
+            self._file_manager = FileManager(self.cfg)
+        return self._file_manager
+
+    def mod_manager(self, load_catalogue: bool = False):
+        if self._mod_manager is None:
+            from manager.mod import ModManager
+            self._mod_manager = ModManager(self.cfg, self.api, self.file_manager, load_cache=False)
+        if load_catalogue and not self._mod_manager.mod_cache.mods:
+            self._mod_manager.load_cache_from_disk()
+        return self._mod_manager
+
+    @property
+    def profile_manager(self):
+        if self._profile_manager is None:
+            from manager.profile import ProfileManager
+            self._profile_manager = ProfileManager(self.cfg, self.api, self.mod_manager(), self.file_manager)
+        return self._profile_manager
+
+    @property
+    def fleet(self):
+        if self._fleet is None:
+            from manager.fleet import FleetDeployer, TargetRegistry
+            self._fleet = FleetDeployer(
+                self.profile_manager,
+                TargetRegistry(self.file_manager, Path(getcwd(), self.cfg.app.fleet.targets_file)),
+                snapshot_dir=Path(getcwd(), self.cfg.app.downloads_location, "snapshots"),
+                workers=self.cfg.app.fleet.workers,
+            )
+        return self._fleet
+
+    def close(self):
+        """ Make profile edits durable before the process exits. """
+        if self._profile_manager is not None:
+            self._profile_manager.flush()
+            self._profile_manager.mods_snapshot.close()
+
+    def profile(self, name: str):
+        profile = self.profile_manager.get_profile(name)
+        if profile is None:
+            raise CommandError(f"No profile named {name}")
+        return profile
+
+
+def load_config(path: Path):
+    import config
+    return config.config_from_json(str(path), read_from_file=True)
+
+
+def mod_summary(mod) -> Dict[str, Any]:
+    return {
+        "modid": mod.modid,
+        "name": mod.name,
+        "author": mod.author,
+        "downloads": mod.downloads,
+        "side": mod.side,
+        "tags": list(mod.tags or []),
+        "lastreleased": mod.lastreleased,
+    }
+
+
+def profile_summary(profile) -> Dict[str, Any]:
+    return {
+        "name": profile.name,
+        "desc": profile.desc,
+        "active": profile.active,
+        "last_update": profile.last_update.isoformat(),
+        "mods": [{"id": mod.id, "name": mod.name, "version": mod.version, "archive": mod.archive_name} for mod in profile.mods],
+    }
+
+
+def cmd_mods_list(ctx: Context, args) -> Dict:
+    mod_manager = ctx.mod_manager(load_catalogue=not args.refresh)
+    if args.refresh:
+        mod_manager.update_cache(force=True)
+    rows = mod_manager.mod_index.query(sort=args.sort, descending=not args.ascending)
+    mods = mod_manager.mod_cache.mods
+    return {"total": len(rows), "mods": [mod_summary(mods[row]) for row in rows[:args.limit]]}
+
+
+def cmd_mods_search(ctx: Context, args) -> Dict:
+    mod_manager = ctx.mod_manager(load_catalogue=True)
+    mods = mod_manager.search_mods(args.text, tags=args.tag, author=args.author, side=args.side, sort=args.sort,
+                                   descending=not args.ascending, fuzzy=args.fuzzy)
+    return {"total": len(mods), "mods": [mod_summary(mod) for mod in mods[:args.limit]]}
+
+
+def cmd_profiles_list(ctx: Context, args) -> Dict:
+    return {"profiles": [profile_summary(profile) for profile in ctx.profile_manager.profiles]}
+
+
+def cmd_profiles_create(ctx: Context, args) -> Dict:
+    if not ctx.profile_manager.create_profile(args.name, args.desc, []):
+        raise CommandError(f"Profile {args.name} already exists")
+    return {"profile": profile_summary(ctx.profile(args.name))}
+
+
+def cmd_profiles_add(ctx: Context, args) -> Dict:
+    ctx.profile(args.name)
+    ctx.profile_manager.add_mod_to_profile(args.name, args.modid, args.version)
+    return {"profile": profile_summary(ctx.profile(args.name))}
+
+
+def cmd_profiles_remove(ctx: Context, args) -> Dict:
+    ctx.profile(args.name)
+    ctx.profile_manager.remove_mod_from_profile(args.name, args.modid, args.version)
+    return {"profile": profile_summary(ctx.profile(args.name))}
+
+
+def fleet_result(result) -> Dict:
+    return {
+        "profile": result.profile,
+        "ok": result.ok,
+        "staged": result.staged,
+        "failures": result.failures,
+        "targets": {name: asdict(target) for name, target in result.targets.items()},
+    }
+
+
+def fleet_targets(ctx: Context, args) -> Optional[List[str]]:
+    if args.all_targets:
+        return None
+    try:
+        ctx.fleet.registry.resolve(args.target)
+    except ValueError as exc:
+        raise CommandError(str(exc))
+    return args.target
+
+
+def cmd_deploy(ctx: Context, args) -> Dict:
+    ctx.profile(args.name)
+    if args.target or args.all_targets:
+        result = fleet_result(ctx.fleet.deploy(args.name, fleet_targets(ctx, args), dry_run=args.dry_run))
+        if not result["ok"]:
+            raise CommandError(f"Deploying {args.name} failed", result)
+        return result
+    profile_manager = ctx.profile_manager
+    failures: Dict[str, str] = {}
+    profile_manager.subscribe("mod_failed", lambda event: failures.__setitem__(event.name, f"{event.stage}: {event.error}"))
+    plan = profile_manager.plan_deploy(args.name)
+    result = {
+        "profile": args.name,
+        "dry_run": args.dry_run,
+        "keep": sorted(plan.keep),
+        "remove": sorted(plan.remove),
+        "add": sorted(plan.add),
+        "unmanaged": sorted(plan.unmanaged),
+    }
+    if args.dry_run:
+        return result
+    result["ok"] = profile_manager.deploy_profile(args.name)
+    result["failures"] = failures
+    if not result["ok"]:
+        raise CommandError(f"Deploying {args.name} failed", result)
+    return result
+
+
+def cmd_undeploy(ctx: Context, args) -> Dict:
+    ctx.profile(args.name)
+    if args.target or args.all_targets:
+        result = fleet_result(ctx.fleet.undeploy(args.name, fleet_targets(ctx, args)))
+        if not result["ok"]:
+            raise CommandError(f"Undeploying {args.name} failed", result)
+        return result
+    if not ctx.profile_manager.undeploy_profile(args.name):
+        raise CommandError(f"Undeploying {args.name} failed")
+    return {"profile": args.name, "ok": True}
+
+
+def cmd_targets_list(ctx: Context, args) -> Dict:
+    return {"targets": [{"name": t.name, "game_path": str(t.game_path), "profile": t.profile} for t in ctx.fleet.registry.targets.values()]}
+
+
+def cmd_targets_add(ctx: Context, args) -> Dict:
+    try:
+        target = ctx.fleet.registry.add(args.name, args.game_path)
+    except ValueError as exc:
+        raise CommandError(str(exc))
+    return {"name": target.name, "game_path": str(target.game_path)}
+
+
+def cmd_targets_remove(ctx: Context, args) -> Dict:
+    if not ctx.fleet.registry.remove(args.name):
+        raise CommandError(f"No target named {args.name}")
+    return {"name": args.name, "removed": True}
+
+
+def cmd_status(ctx: Context, args) -> Dict:
+    if args.name:
+        ctx.profile(args.name)
+    drift = ctx.profile_manager.drift(args.name)
+    return {**asdict(drift), "clean": drift.clean}
+
+
+def cmd_check_updates(ctx: Context, args) -> Dict:
+    report = ctx.profile_manager.check_for_updates([ctx.profile(args.profile).name] if args.profile else None,
+                                                   prefetch=args.prefetch)
+    result = {
+        "checked": report.checked,
+        "updates": {name: [asdict(update) for update in updates] for name, updates in report.profiles.items()},
+        "errors": report.errors,
+    }
+    if report.prefetch is not None:
+        downloads = report.prefetch.result() # a one-shot command has to wait for its background downloads
+        result["downloaded"] = [{"modid": d.modid, "version": d.version, "path": d.path, "error": d.error} for d in downloads]
+    return result
+
+
+def cmd_archives(ctx: Context, args) -> Dict:
+    if args.downloads:
+        folder = Path(getcwd(), ctx.cfg.app.downloads_location)
+    else:
+        folder = args.folder or ctx.profile_manager.mods_folder()
+    archives = ctx.profile_manager.inspect_archives(folder)
+    return {
+        "folder": str(folder),
+        "archives": {name: asdict(info) for name, info in sorted(archives.items())},
+        "invalid": sorted(name for name, info in archives.items() if not info.ok),
+        "index": ctx.profile_manager.archives.stats(),
+    }
+
+
+def cmd_prune(ctx: Context, args) -> Dict:
+    return {"dry_run": args.dry_run, **ctx.profile_manager.collect_garbage(dry_run=args.dry_run)}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="vsmm", description="Vintage Story Mod Manager (headless)")
+    parser.add_argument("--root", type=Path, default=None, help="directory containing vsmm/config.json (default: cwd)")
+    parser.add_argument("--config", type=Path, default=None, help="config file (default: ROOT/vsmm/config.json)")
+    parser.add_argument("--json", action="store_true", help="print a JSON document instead of text")
+    parser.add_argument("--metrics", metavar="PATH", default=None, help="write Prometheus metrics to PATH ('-' for stderr)")
+    parser.add_argument("--metrics-log", metavar="PATH", default=None, help="append one JSON line per timed operation to PATH")
+    parser.add_argument("--cprofile", metavar="PATH", default=None, help="write a cProfile capture of the command to PATH")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_command(subparsers, name: str, handler: Callable, help: str) -> argparse.ArgumentParser:
+        command = subparsers.add_parser(name, help=help)
+        command.set_defaults(handler=handler)
+        return command
+
+    def add_query_options(command: argparse.ArgumentParser):
+        command.add_argument("--limit", type=int, default=50)
+        command.add_argument("--sort", default="downloads")
+        command.add_argument("--ascending", action="store_true")
+
+    mods = commands.add_parser("mods", help="browse the mod catalogue").add_subparsers(dest="mods_command", required=True)
+    command = add_command(mods, "list", cmd_mods_list, "list mods")
+    add_query_options(command)
+    command.add_argument("--refresh", action="store_true", help="refresh the catalogue from the mod db first")
+    command = add_command(mods, "search", cmd_mods_search, "search mods by name")
+    command.add_argument("text", nargs="?")
+    command.add_argument("--tag", action="append", default=[])
+    command.add_argument("--author")
+    command.add_argument("--side")
+    command.add_argument("--fuzzy", action="store_true")
+    add_query_options(command)
+
+    profiles = commands.add_parser("profiles", help="manage profiles").add_subparsers(dest="profiles_command", required=True)
+    add_command(profiles, "list", cmd_profiles_list, "list profiles")
+    command = add_command(profiles, "create", cmd_profiles_create, "create an empty profile")
+    command.add_argument("name")
+    command.add_argument("--desc", default="")
+    for name, handler, help in (("add", cmd_profiles_add, "add a mod version to a profile"),
+                                ("remove", cmd_profiles_remove, "remove a mod version from a profile")):
+        command = add_command(profiles, name, handler, help)
+        command.add_argument("name")
+        command.add_argument("modid", type=int)
+        command.add_argument("version")
+
+    def add_target_options(command: argparse.ArgumentParser):
+        command.add_argument("--target", action="append", default=[], help="registered target to use instead of the game folder")
+        command.add_argument("--all-targets", action="store_true", help="use every registered target")
+
+    command = add_command(commands, "deploy", cmd_deploy, "deploy a profile to the game mods folder")
+    command.add_argument("name")
+    command.add_argument("--dry-run", action="store_true")
+    add_target_options(command)
+    command = add_command(commands, "undeploy", cmd_undeploy, "remove a deployed profile from the mods folder")
+    command.add_argument("name")
+    add_target_options(command)
+
+    targets = commands.add_parser("targets", help="manage fleet deployment targets").add_subparsers(dest="targets_command", required=True)
+    add_command(targets, "list", cmd_targets_list, "list targets")
+    command = add_command(targets, "add", cmd_targets_add, "register a game or server install")
+    command.add_argument("name")
+    command.add_argument("game_path", type=Path)
+    command = add_command(targets, "remove", cmd_targets_remove, "forget a target")
+    command.add_argument("name")
+    command = add_command(commands, "status", cmd_status, "compare the mods folder with a deployed profile")
+    command.add_argument("name", nargs="?", help="profile to compare against (default: the active one)")
+    command = add_command(commands, "check-updates", cmd_check_updates, "list mods with newer releases")
+    command.add_argument("--profile")
+    command.add_argument("--prefetch", action="store_true", help="download the new releases too")
+    command = add_command(commands, "archives", cmd_archives, "show the modid/version inside each archive")
+    command.add_argument("--folder", type=Path, help="folder to inspect (default: the game mods folder)")
+    command.add_argument("--downloads", action="store_true", help="inspect the downloads folder")
+    command = add_command(commands, "prune", cmd_prune, "delete stored archives no profile uses")
+    command.add_argument("--dry-run", action="store_true")
+    return parser
+
+
+def print_text(result: Any, indent: int = 0):
+    pad = "  " * indent
+    if isinstance(result, dict):
+        for key, value in result.items():
+            if isinstance(value, (dict, list)) and value:
+                print(f"{pad}{key}:")
+                print_text(value, indent + 1)
+            else:
+                print(f"{pad}{key}: {value}")
+    elif isinstance(result, list):
+        for value in result:
+            if isinstance(value, dict):
+                print(f"{pad}- " + ", ".join(f"{key}={item}" for key, item in value.items()))
+            else:
+                print(f"{pad}- {value}")
+    else:
+        print(f"{pad}{result}")
+
+
+def main(argv: List[str] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.root is not None:
+        chdir(args.root) # every configured location is relative to the working directory
+    config_path = args.config or Path(getcwd(), "vsmm", "config.json")
+    if not config_path.is_file():
+        print(f"Config file {config_path} not found", file=sys.stderr)
+        return EXIT_USAGE
+    out = sys.stdout
+    status, result = EXIT_OK, None
+    # library code reports progress with print, keep it out of the JSON document
+    with redirect_stdout(sys.stderr if args.json else sys.stdout):
+        from instrumentation import metrics
+        cfg = load_config(config_path)
+        metrics.configure(
+            cfg,
+            enabled=True if args.metrics == "-" else None,
+            log=args.metrics_log,
+            dump=args.metrics if args.metrics != "-" else None,
+            profile=args.cprofile,
+        )
+        ctx = Context(cfg)
+        try:
+            result = args.handler(ctx, args)
+        except CommandError as exc:
+            status = EXIT_FAILED
+            result = {"error": str(exc.args[0])}
+            if len(exc.args) > 1:
+                result.update(exc.args[1])
+        except Exception as exc:
+            status = EXIT_FAILED
+            result = {"error": f"{type(exc).__name__}: {exc}"}
+        finally:
+            ctx.close()
+            metrics.close()
+            if args.metrics == "-":
+                sys.stderr.write(metrics.prometheus_text())
+        if not args.json:
+            print_text(result)
+    if args.json:
+        json.dump(result, out, indent=2, default=str)
+        out.write("\n")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+"""
+Timing spans, counters and latency histograms for the hot paths (API calls, downloads, caches, deploy steps).
+
+    with metrics.span("deploy.install", mod=name):
+        ...
+    metrics.count("http_requests_total", endpoint="mods", status=200)
+
+Everything is off unless configure() turns it on (app.metrics.* in config.json, the VSMM_METRICS environment
+variable or the cli's --metrics flags). While off, span() hands out one shared no-op context manager and count()
+returns straight away, so instrumented code pays an attribute check per call.
+
+Output:
+    structured log      one JSON line per finished span (app.metrics.log)
+    Prometheus text     counters and histograms in the text exposition format (app.metrics.dump, or prometheus_text())
+    cProfile            optional capture of the main thread into a pstats file (app.metrics.profile)
+"""
+from bisect import bisect_left
+import cProfile
+import json
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Dict, List, Optional, TextIO, Tuple
+
+PREFIX = "vsmm_"
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1) # the last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+
+class _NullSpan:
+    """ What span() returns while metrics are disabled. """
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+    def set(self, **labels):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    __slots__ = ("metrics", "name", "labels", "parent", "started")
+
+    def __init__(self, metrics: "Metrics", name: str, labels: Dict):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.parent: Optional[str] = None
+        self.started = 0.0
+
+    def set(self, **labels):
+        """ Add labels known only once the work is done, e.g. a response status. """
+        self.labels.update(labels)
+
+    def __enter__(self) -> "Span":
+        stack = self.metrics._stack()
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        elapsed = time.perf_counter() - self.started
+        stack = self.metrics._stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        self.metrics._finish(self, elapsed, exc_type)
+        return False
+
+
+class Metrics:
+
+    def __init__(self):
+        self.enabled = False
+        self.counters: Dict[Tuple[str, LabelKey], float] = {}
+        self.histograms: Dict[Tuple[str, LabelKey], Histogram] = {}
+        self.dump_path: Optional[Path] = None
+        self._log: Optional[TextIO] = None
+        self._owns_log = False
+        self._profiler: Optional[cProfile.Profile] = None
+        self.profile_path: Optional[Path] = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def configure(self, cfg=None, enabled: bool = None, log=None, dump=None, profile=None):
+        """ Turn metrics on or off. Explicit arguments win over the app.metrics.* config keys; log may be a path
+        or an open text stream, dump and profile are paths. Any output implies enabled. """
+        if cfg is not None:
+            log = log or cfg.app.metrics.log or None
+            dump = dump or cfg.app.metrics.dump or None
+            profile = profile or cfg.app.metrics.profile or None
+        if enabled is None:
+            enabled = (cfg is not None and cfg.app.metrics.enabled) or os.environ.get("VSMM_METRICS", "") not in ("", "0")
+        self.close()
+        self.enabled = bool(enabled or log or dump or profile)
+        self.dump_path = Path(dump) if dump else None
+        if isinstance(log, (str, Path)):
+            self._log = open(log, "a", encoding="utf-8", buffering=1)
+            self._owns_log = True
+        else:
+            self._log = log
+        if profile:
+            self.profile_path = Path(profile)
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def span(self, name: str, **labels):
+        """ Time a block. The duration goes into the histogram for name and labels, and into the log. """
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, labels)
+
+    def count(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        """ Record a duration measured elsewhere. """
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _finish(self, span: Span, elapsed: float, exc_type):
+        self.observe(span.name, elapsed, **span.labels)
+        if exc_type is not None:
+            self.count("span_errors_total", span=span.name, error=exc_type.__name__)
+        if self._log is None:
+            return
+        record = {"ts": round(time.time(), 6), "span": span.name, "seconds": round(elapsed, 6), "parent": span.parent,
+                  "thread": threading.current_thread().name, **span.labels}
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            if self._log is not None:
+                self._log.write(line)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def prometheus_text(self) -> str:
+        """ Every counter and histogram in the Prometheus text exposition format. """
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+        lines = []
+        seen = set()
+        for (name, key), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+            lines.append(f"{PREFIX}{name}{_format_labels(key)} {value:g}")
+        if histograms:
+            name = f"{PREFIX}span_seconds"
+            lines.append(f"# HELP {name} Time spent in instrumented operations")
+            lines.append(f"# TYPE {name} histogram")
+        for (span, key), histogram in histograms:
+            key = (("span", span),) + key
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS + (float("inf"),), histogram.counts):
+                cumulative += bucket
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{PREFIX}span_seconds_bucket{_format_labels(key, (('le', le),))} {cumulative}")
+            lines.append(f"{PREFIX}span_seconds_sum{_format_labels(key)} {histogram.total:.6f}")
+            lines.append(f"{PREFIX}span_seconds_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """ count, total and max seconds per span name, summed over labels. """
+        result: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            for (span, _), histogram in self.histograms.items():
+                entry = result.setdefault(span, {"count": 0, "total": 0.0, "max": 0.0})
+                entry["count"] += histogram.count
+                entry["total"] += histogram.total
+                entry["max"] = max(entry["max"], histogram.max)
+        return result
+
+    def close(self):
+        """ Write the configured dump and profile, and close the log. Safe to call more than once. """
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(str(self.profile_path))
+            self._profiler = None
+        if self.dump_path is not None and self.enabled:
+            self.dump_path.write_text(self.prometheus_text(), encoding="utf-8")
+        with self._lock:
+            log, self._log = self._log, None
+        if log is not None and self._owns_log:
+            log.close()
+        self._owns_log = False
+
+
+metrics = Metrics()
@@ -1,33 +1,58 @@
 import sys
 sys.path.append("..") # added!
 
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from os import getcwd
+from typing import Dict, Iterable, List, Set
 from api.client import APIClient
 from app_config import AppConfig
 from config import Configuration
-from manager.mod import ModManager
+from instrumentation import metrics
+from manager.assets import AssetCache, mod_image_urls
+from manager.mod import ModInfo, ModManager
 from manager.file import FileManager
 from manager.profile import ProfileManager
-from text_stripper import TextStripper
+from mod_table import TABLE_HEADINGS, ModTableModel, TableQuery
+from text_stripper import DescriptionRenderer
 
 import PySimpleGUI as sg
 
 WWINDOW_SIZE_X = 1400
 WINDOW_SIZE_Y  = 600
+TABLE_PAGE_SIZE = 30
+
+# events posted back to the window from worker threads
+MODINFO_LOADED_EVENT = "-MODINFO_LOADED-"
+MODINFO_FAILED_EVENT = "-MODINFO_FAILED-"
+CACHE_UPDATED_EVENT = "-CACHE_UPDATED-"
+MOD_IMAGE_LOADED_EVENT = "-MOD_IMAGE_LOADED-"
+TABLE_QUERY_DONE_EVENT = "-TABLE_QUERY_DONE-"
 
 
 class App:
     #todo: add theme functionality?
     #todo: move panel logic to subclasses for easier access to specific elements.
 
-    def __init__(self, cfg: Configuration, api: APIClient, mod_manager: ModManager, profile_manager: ProfileManager, file_manager: FileManager):
+    def __init__(self, cfg: Configuration, api: APIClient, mod_manager: ModManager, profile_manager: ProfileManager, file_manager: FileManager, descriptions: DescriptionRenderer, assets: AssetCache):
         self.cfg = cfg
         self.api = api
         self.mod_manager = mod_manager
         self.profile_manager = profile_manager
         self.file_manager = file_manager
+        self.descriptions = descriptions
+        self.assets = assets
         
-        #todo: perform initialisation/load for mod_manager and profile_manager
-        self.mod_manager.update_cache()
+        # backend calls run here and post their results back with window.write_event_value
+        self.executor = ThreadPoolExecutor(max_workers=self.cfg.app.ui.workers, thread_name_prefix="vsmm-ui")
+        self._modinfo_futures: Dict[int, Future] = {} # mod id -> in flight or finished (mod_info, text) lookup
+        self._selection_token = 0 # bumped on every selection so stale responses can be recognised and dropped
+        self._mod_image_url = None # image currently shown or being fetched for the modinfo panel
+        self._mod_image_shown = False
+        self._mod_image_candidates: List[str] = [] # images still to try for the selected mod, best first
+        self._mod_images_tried: Set[str] = set()
+        self.mod_table = ModTableModel(self.mod_manager, TABLE_PAGE_SIZE)
+        self._query_token = 0 # same idea for table sort/filter queries
 
         # SG specific objects
         self.window: sg.Window = None
@@ -37,15 +62,177 @@ class App:
 
     def run(self):
         self.make_window()
+        # only refreshes a cache older than app.mod_cache.max_age, and never blocks the window
+        self.run_in_background(self.mod_manager.update_cache, CACHE_UPDATED_EVENT)
+        self.submit_table_query(self.mod_table.query)
+        active_profile = self.profile_manager.get_active_profile()
+        if active_profile is not None:
+            self.prerender_descriptions([mod.id for mod in active_profile.mods])
         while True:
             #todo: find a cleaner way to read and dispatch events
             event, values = self.window.read() # capture the key of the event emitter and the value sent.
             if event == sg.WINDOW_CLOSED or event == 'Exit':
                 break
-            if event == "-MOD_TABLE-":
-                mod_row = values["-MOD_TABLE-"][0]
-                selected_mod_id = self.mod_manager.mod_cache.mods[mod_row].modid
-                self.update_modinfo_panel(selected_mod_id)
+            if isinstance(event, tuple) and event[0] == "-MOD_TABLE-":
+                row, column = event[2]
+                if row == -1 and column is not None: # header click
+                    query = self.mod_table.with_sort_column(column)
+                    if query is not None:
+                        self.submit_table_query(query)
+            elif event == "-MOD_TABLE-" and values["-MOD_TABLE-"]:
+                self.select_mod_row(values["-MOD_TABLE-"][0])
+            elif event == "-MOD_FILTER-":
+                self.submit_table_query(self.mod_table.with_filters(
+                    values["-MOD_FILTER_TEXT-"], values["-MOD_FILTER_AUTHOR-"], values["-MOD_FILTER_TAGS-"]
+                ))
+            elif event in ("-PREV_PAGE-", "-NEXT_PAGE-"):
+                if self.mod_table.set_page(self.mod_table.page + (1 if event == "-NEXT_PAGE-" else -1)):
+                    self.update_mods_panel()
+            elif event == TABLE_QUERY_DONE_EVENT and values[event]:
+                token, result = values[event]
+                if token == self._query_token and self.mod_table.apply(*result):
+                    self.update_mods_panel()
+                    self.prerender_descriptions(self.mod_table.page_mod_ids())
+            elif event == MODINFO_LOADED_EVENT:
+                token, mod_info, text = values[event]
+                if token == self._selection_token: # ignore responses for rows the user already left
+                    self.update_modinfo_panel(mod_info, text)
+                    if not self._mod_image_shown: # the catalogue logo is missing or unusable, try the mod info's images
+                        self._mod_image_candidates.extend(mod_image_urls(mod_info))
+                        if self._mod_image_url is None:
+                            self.show_next_mod_image(token)
+            elif event == MODINFO_FAILED_EVENT:
+                token, error = values[event]
+                if token == self._selection_token:
+                    self.modinfo_panel[5][0].update(f"Could not load mod information: {error}")
+            elif event == MOD_IMAGE_LOADED_EVENT:
+                token, url, data = values[event]
+                if token == self._selection_token and url == self._mod_image_url:
+                    if data:
+                        self.window["-MOD_IMAGE-"].update(data=data, visible=True)
+                        self._mod_image_shown = True
+                    else:
+                        self.show_next_mod_image(token)
+            elif event == CACHE_UPDATED_EVENT and values[event]:
+                self._modinfo_futures.clear()
+                self.mod_table.reload()
+                self.mod_manager.release_retired_catalogues() # queries still running on it keep it mapped until they end
+                self.update_mods_panel()
+                self.submit_table_query(self.mod_table.query)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.descriptions.shutdown()
+        self.descriptions.save()
+        self.assets.shutdown()
+        self.profile_manager.flush()
+        self.profile_manager.mods_snapshot.close()
+
+    def run_in_background(self, fn, done_event: str, *args):
+        """ Run fn on the worker pool and post its result to the window as done_event. """
+        def post(future: Future):
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                print(f"Background task {fn.__name__} failed: {future.exception()!r}")
+                self.window.write_event_value(done_event, None)
+            else:
+                self.window.write_event_value(done_event, future.result())
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(post)
+        return future
+
+    def submit_table_query(self, query: TableQuery):
+        """ Filter and sort the mods table on the worker pool; only the newest query's result is applied. """
+        self._query_token += 1
+        token = self._query_token
+
+        def run_table_query():
+            return token, self.mod_table.run_query(query)
+        self.run_in_background(run_table_query, TABLE_QUERY_DONE_EVENT)
+
+    def select_mod_row(self, table_row: int):
+        """ Load the selected mod's info off the GUI thread and prefetch its neighbours. """
+        self._selection_token += 1
+        token = self._selection_token
+        selected_mod = self.mod_table.mod_at(table_row)
+        selected_mod_id = selected_mod.modid
+        self.modinfo_panel[5][0].update("Loading...")
+        # the catalogue knows the logo, no need to wait for the mod info
+        self._mod_image_candidates = [selected_mod.logo] if selected_mod.logo else []
+        self._mod_images_tried = set()
+        self._mod_image_shown = False
+        self.window["-MOD_IMAGE-"].update(visible=False)
+        self.show_next_mod_image(token)
+
+        radius = self.cfg.app.ui.prefetch_rows
+        page_mod_ids = self.mod_table.page_mod_ids()
+        neighbour_rows = range(max(table_row - radius, 0), min(table_row + radius + 1, len(page_mod_ids)))
+        neighbours = [page_mod_ids[row] for row in neighbour_rows]
+        for row in neighbour_rows:
+            logo = self.mod_table.mod_at(row).logo
+            if logo:
+                self.assets.fetch(logo)
+        for mod_id, future in list(self._modinfo_futures.items()):
+            if mod_id not in neighbours and future.cancel(): # only lookups that have not started can be cancelled
+                del self._modinfo_futures[mod_id]
+        for mod_id in neighbours:
+            self._modinfo_future(mod_id)
+
+        def post(future: Future):
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                self.window.write_event_value(MODINFO_FAILED_EVENT, (token, future.exception()))
+            else:
+                self.window.write_event_value(MODINFO_LOADED_EVENT, (token, *future.result()))
+        self._modinfo_future(selected_mod_id).add_done_callback(post)
+
+    def show_next_mod_image(self, token: int):
+        """ Show the first remaining candidate image in the modinfo panel: straight away from the asset cache, or
+        once it has been fetched. Images that fail to load or cannot be displayed move on to the next candidate. """
+        self._mod_image_url = None
+        while self._mod_image_candidates:
+            url = self._mod_image_candidates.pop(0)
+            if url in self._mod_images_tried:
+                continue
+            self._mod_images_tried.add(url)
+            data = self.assets.get(url)
+            if data:
+                self._mod_image_url = url
+                self._mod_image_shown = True
+                self.window["-MOD_IMAGE-"].update(data=data, visible=True)
+                return
+            if data is None: # not cached yet, anything else is known to be unusable
+                self._mod_image_url = url
+
+                def post(future: Future, url=url):
+                    if not future.cancelled(): # a failed download counts as no image, so the next one is tried
+                        data = future.result() if future.exception() is None else None
+                        self.window.write_event_value(MOD_IMAGE_LOADED_EVENT, (token, url, data))
+                self.assets.fetch(url).add_done_callback(post)
+                return
+
+    def _modinfo_future(self, mod_id: int) -> Future:
+        future = self._modinfo_futures.get(mod_id)
+        if future is None or future.cancelled() or (future.done() and future.exception() is not None):
+            future = self._modinfo_futures[mod_id] = self.executor.submit(self._load_mod_info, mod_id)
+        return future
+
+    def _load_mod_info(self, mod_id: int):
+        """ Worker side of a selection: fetch (or read from cache) the mod info and render its description. """
+        mod_info = self.mod_manager.get_mod_info(mod_id)
+        return mod_info, self.descriptions.render(mod_info.assetid, mod_info.text)
+
+    def prerender_descriptions(self, mod_ids: Iterable[int]):
+        """ Render the descriptions of mods whose info is already cached in the background, so selecting them
+        later skips parsing. Never fetches anything. """
+        mod_ids = list(mod_ids)
+
+        def cached_documents():
+            for mod_id in mod_ids:
+                mod_info = self.mod_manager.mod_info_cache.get(mod_id)
+                if mod_info is not None:
+                    yield mod_info.assetid, mod_info.text
+        self.descriptions.prerender(cached_documents())
 
     def make_window(self):
         """ Create the sg.Window object to render the App to screen. """
@@ -62,14 +249,18 @@ class App:
 
     def make_mods_panel_layout(self):
         """ Builds the mods browser table layout and returns it. Also stores a reference on the app object to this layout."""
-        table_headings = ["Mod Name", "Author", "Version", "Tags", "Last Updated"]
         self.mods_panel = [[
+            sg.Text("Name"), sg.Input(key="-MOD_FILTER_TEXT-", size=(20, 1)),
+            sg.Text("Author"), sg.Input(key="-MOD_FILTER_AUTHOR-", size=(12, 1)),
+            sg.Text("Tags"), sg.Input(key="-MOD_FILTER_TAGS-", size=(16, 1)),
+            sg.Button("Filter", key="-MOD_FILTER-", bind_return_key=True),
+        ], [
             sg.Table(
-                values=[[mod.name, mod.author, "1", ", ".join(mod.tags),  mod.lastreleased] for mod in self.mod_manager.mod_cache.mods], headings=table_headings,
+                values=self.mod_table.page_values(), headings=TABLE_HEADINGS,
                 auto_size_columns=True,
                 display_row_numbers=False,
                 justification='center',
-                num_rows=30,
+                num_rows=TABLE_PAGE_SIZE,
                 alternating_row_color='lightblue',
                 key='-MOD_TABLE-',
                 selected_row_colors='red on yellow',
@@ -80,12 +271,17 @@ class App:
                 enable_click_events=True,           # Comment out to not enable header and other clicks
                 tooltip=f"Cache Last Updated: {self.mod_manager.mod_cache.last_updated}",
                 pad=(10,10)
-        )]]
+        )], [
+            sg.Button("<", key="-PREV_PAGE-"),
+            sg.Text(self.mod_table.page_label(), key="-PAGE_LABEL-"),
+            sg.Button(">", key="-NEXT_PAGE-"),
+        ]]
         return self.mods_panel
 
     def make_modinfo_panel_layout(self):
         """ Builds the mod info panel layout and returns it. Also stores a reference on the app object to this layout."""
         self.modinfo_panel= [
+            [sg.Image(key="-MOD_IMAGE-", visible=False)],
             [sg.Text("Mod Name", font="Any 16")],
             [sg.Text("Author"), sg.Text("Tags")],
             [sg.Text("Last Updated: ", justification="center")],
@@ -105,37 +301,47 @@ class App:
         return self.profile_panel
 
     def update_mods_panel(self):
-        pass
+        """ Push the visible page of the table model to the widget. """
+        self.window["-MOD_TABLE-"].update(values=self.mod_table.page_values())
+        self.window["-PAGE_LABEL-"].update(self.mod_table.page_label())
 
-    def update_modinfo_panel(self, mod_id: int):
-        """ Fetch the detailed mod info from the ModDB and populate the modinfo panel elements. """
-        mod_info = self.mod_manager.get_mod_info(mod_id)
+    def update_modinfo_panel(self, mod_info: ModInfo, text: str):
+        """ Populate the modinfo panel elements with mod info loaded by a worker. """
         # This index logic sucks ;_;
-        self.modinfo_panel[0][0].update(mod_info.name)
-        self.modinfo_panel[1][0].update(mod_info.author)
-        self.modinfo_panel[1][1].update(", ".join(mod_info.tags))
-        self.modinfo_panel[2][0].update(f"Last Updated: Time is Relative")
-        self.modinfo_panel[4][0].update(self._strip_html_from_text(mod_info.text))
+        self.modinfo_panel[1][0].update(mod_info.name)
+        self.modinfo_panel[2][0].update(mod_info.author)
+        self.modinfo_panel[2][1].update(", ".join(mod_info.tags or []))
+        self.modinfo_panel[3][0].update(f"Last Updated: Time is Relative")
+        self.modinfo_panel[5][0].update(text)
 
     def update_profile_panel(self):
         pass
 
 
-    def _strip_html_from_text(self, html_text):
-        """ Returns a clean version of html_text with any HTML tags stripped from the content. """
-        text_stripper = TextStripper() #todo: this is not IoC, move this to dependency injection
-        text_stripper.feed(html_text)
-        return text_stripper.get_data()
-
-
 
 if __name__ == '__main__':
     icon = b'iVBORw0KGgoAAAANSUhEUgAAAIAAAACACAMAAAD04JH5AAAAAXNSR0IArs4c6QAAAARnQU1BAACxjwv8YQUAAAMAUExURQAAAB69LymqOSm6LSq2OTSrOjS2Ox28RjqdQC6qSiy3Riu3UTisRzirVDi1STq0UiuyYz6pYz62ZCjDNyjQPzTAOxrIQinARTXDRzXBVEWsP1ieZ0OrSUaqV0S0SkOzVFKnSVKrWlK0W0iqZUWmcEe0a1eoZ1apclW0Z1uzd2G8X2W8Z2i3dXStdnS/ZHW7dkXCTEnCWVnDbF3Gc1zUc2bGbGjId2fRbWjQfnLFbnTGeHfReXu6hWzFgWzRgXfGhn3Jk3bShHvWkd5HPNhYJ9RWPtRbPdxVOtlbM9xdPM5iPNRjO9VsMtNoOttiPOFVNOVUPeNZNOJbPelVPelZN+pcO/ZYPeNjPeFqPOlgNOpiPfBkO8xcR85ZUtZOUNJXQdNcQtNcTNpTRdxVT9xdQ95cSdlbUsBgR8xkRctkTc1oQ81pS8tmVMtxTsx3XtVjQdRjStRoQtNqStxiRNtjSdxpQ9toS9NkU9diWdFqUtVsW9xiU9xlXN5uVtZzWsptZ8Z3Y8p2ddBuY9duat1qY9Nvcdh3Z+VOQ+NUROJcQ+NcSutTROlcQ+pdSuhdVPJcQ/FbS/heQvZbVuFhReJjSeJpRORpTOpiRepiS+toTeVlU/RhRfJhUuZnYeBvaeR4aoPCfN+Hb9eHfNmQfeaIbOKIeOWSefaHbP+Ia/CMffCSePigeoTHhovJmIjWiYXXl5HMnpbYmY3bp4fes5PHoJnapJzUspDhnozjpo3lspnjqaLTm6HOsaPYp7XOuLbduajkqavpuLTpt7f2uKvbwbLYw7nmx7f1ybjw1tqIhtiThtiSkNasnNuimeSLhOWPkOWThuicl/mdiPKbku6fouWjl+Oinuaom+ynl+yjmuqpl+qqm/OllfOlmPSqnf6mkvqhneekoPOho8buuNPtvtbd08bpyMro1cT2ysj109XozNXo2NHzydT52M/45tvs4tj8497+8eD6y+b82+bq6Of+5+n+9fnq7f/p//b96fv7+gAAAAAAAAAAAAAAAAAAAFSfM6AAAAEAdFJOU////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////////wBT9wclAAAACXBIWXMAAA7DAAAOwwHHb6hkAAAMlUlEQVR4Xu2Zf5gbRRnHtd5Fm+Z2FUQOuWQplXI+oAVqA0RrAKUlRGINlkCpei2b2EI1187eFUitBfFgc0nah5m7pFsFnvJD1FIseoDFk1/agj+wpz5gBX8geu31ODmtqb39J76zO5vb/Lzsnjw8Pt7nLpfZmcnMd99533dmc28rvMXMCJgRMCNgRsCMgP9tAQdv23jDTYm72JU9piPg5U29W8OB1O2Jl1mFHaYh4I+dS7NAbkeg8yCrsoF9AS9Ge6++Ik6k4BV9qVW/ZJXWsS3gwf4ORDAWZYQwRsqDrNoydgUc7EcwP8KEEEyQiJQh1mAVmwJeIaKI+5EoUiMggpbYVmBPwFDmk0QiWBaxjCmEoCsz9hTYE/D8J65FGIl0AegawGqQCE7YigWbS9DTK4LvYSwDhMjgiShIEnZsYNcJt9DVJ7Iowy8toQ4cxHZWwa6AAiEwM5HJdpm6AZGVDhTptaHAsoDvdr6gF76WvDqckqT1KJ3GCsnIEJNItJ4PrAoYikc3MgWbU6l+HN+AUql0HEFM2MsHFgUMZe7oiq86oF8kRImaPxtAUpdoNx9YEzCUuTIb6pNjTMHdq6Srli3PdgWxGKYxYScfWBJwMIEjIo5Eigq23JpQYitFBefAIe3lAysChhIkiNbnwsFcb2wnqwNe+OYd27YHtZiwkQ8sCBjKQKh3EEgAKEfE+1kt5bZLUdBuPmhcAKx/BHUoadKZjl8euqqXxYLG5kDKbj5oWMCDCpJgkfXNB0DdzA8oQ6uWs2rYnazlg0YFHFRg/4WtH8ysE+k03+W6LKuGPtbyQYMChjIQ4jAwmwWIJFiTxrrPsGrAWj5oTMBQZhlE2KT9gbDC2jTWrWDVOhbyQUMCaPzDmHTg4hKsSJh8oPDFHaxa62IlHzQiQIt/8D8RIr24CFev7mHNlJ1LWTWcUq3lgwYE6PFPj8B0/2fzYBRWzHe4k1XDMc1aPphaAIt/6t5wANquT4Px+juvW/cL1oXCqrHVfDClgPL4N5C7URabHbFn2aeuIElCokQM9IVCjeaDqQRUxL9BshulkC7g59rfQo8clrDYHQV3JXJOWwfIBy/qjTWZQkBl/BtQAYGM1unzLCsr35ACkQDuT8o5lDTyQWyKWKgvoEr8GyQlJDMLpAMPaO+Fu1cjyAeREJyUQQAAnw1M4Qd1BVSLfwMQkEW6BQgWmQ16yO04EMDZPv0jNB9k5cyf9cbq1BNQNf4NTALi6zsUtjt//bb77t+8ZmUoGzGeF3Aonam3CnUEVI9/gzQIwDGtI5yIyRLT+eD3PWtzESMfxHFIrqegtoAa8W8AFkihpNYzc6ccQoj5gcatX8ixfICVDrxi6aZXWUMltQWsJTiQow5QHSogpDthDCOZSOG7tQudjctYN+oHoXB6HauvpKaAAxIOk2SySgDqUAGi7gMgACfl7E3ahU5P0WkDSrQT51aad64Sagq4T1ke6I/KXWycCkwWiFILxFMbtQude4sCLsMdUnarYl6gEmoK+Bb+LFZWYwio6pRbAKVu1i50Xs6wbhi2ZUW+UrmPNVRQewlW5rCUISE2TgXlPkBKLHBAT0QUInXKOyTTMb6U2k741Y4QrGxdAcwCsAQ4SSKSdqGzJcW6YZF0hLaLNpyw8Oq6uCLKEhungnILJHHQdFDvLJ6S+5OQETt/xuorqS2g8OsglqW6YWj2gUwwtFa7otwiX8O6YVHJ9V1mfoopo46Awkubomh9hohyFpSw8YpsI2l5m54JaVsXkZcH2aPCq3clk8slSJ5hTDKhPvG62vdfX0Dhd4qMRAnSKaR1fdpJkiulZE4/mivhAF6jkO1Y7Nxyy/M7e2IdEgqI/ShAd9K+pck69z+FgMIfEtGuOJIkiRQfPAy2r4FjSlTrpYQiWAK3z0L+l3KpZSmC+7owkrrhZIrE5Le1TrWoL6Bw8MYuFCaK1FEhAF8vhkTdAgmEIQzBEXB2WzoUwtlsYAnCS7qJiLPBWN37n1JA4SVRTOeIJOlfQJgIdy3LYj37dorgI1ERRTBOydev6QbL00dERFLp3BLzM2w1phJQeGXTdWkR9VfsCcuVVA6t1LpsRCRL4BCIYE/syyiZKEReQIaDVHq18U1GbaYUUPgLxEJQqjgShVFauuF5rcdmMLgIpodlJyiZThMZToMEB7O52K+0DvWYWkDhFQShVMztDEKWJNd+R+/wpw3BnNSH5VQ6mU6GgigudUpSBuHgpVPef0MCCi/dGEXx8nwgEXHytPm5yRUyx38D8zckAB4O5K7yfCAFvsJagQMKOKCOHv94yvg3aEhAtXwgyeYt3pSytfiPTxn/Bo0JqJIPxCxr0ohN+miD8W/QoIDKfIAwa9FITApoMP4NGhVQkQ9KlyBWPDc0Gv8GDQsozwdlTlgU0Gj8GzQuoDQfEClpCsMYKgpoNP4NLAgoyQeQ8ZKJ37CGHoR30PiHJ6SG49/AioCSfBDNKdKaL9P/Gj/wJXj8Ehvd/8uxJMCcD4gcwKHLN2zevGEJPA/T3bix/b8cawIm80GOJAOhvh2pT4evyV67IhtbZTX+DSwKmMwHYl9/JCTnMjtwOEzShH6PZCn+DawKKOYDWHG0KpNIikQhSTEZtRr/BpYFsHyQw7DaBCFFkkQp0Y0b3v/LsS6A5QPweJqTLotA6qH/wbca/wY2BJjyQZZ+JwunIxvxb2BHQEk+sBv/BrYElJwPbMa/gT0B5vOBzfg3sCnAdD6wGf8GdgUU84Hd+DewLcDIB3bj38C+AJYP7Ma/wTQEFH4b690aiGztjekPSPaYjoBC4eZVG+IdJf+9ssz0BBSG7j1Q7+uPBpimgOkzI2BGQImAh73nn+8tY5Fvkdd7wUKvz/txr+/CC+FCw+f1ng0vL231ehdfAB3Pp8VF3sWL4c3vXeyj0MZSYIaH2XQaJQL8QhsnlMFxLsHj4Tw80CLwPMdxHnhxTs4jcHyL2wll3tPscXk8LqEF+ntc9JdzOPjZTsHhYMMU4doEP5tOo0TAYkEbuwQXTOxqc0AJpuLhh9JChTiaoOSgwrQ6AEq0ThvE4YB7gTdaLqFNWMym0ygVUBzKBM/PFjjnO13nQNnZdBLM4eTaPJyg9aUi4HbBFHAJE7dyc06mNmmdRaWCJaqMyNcW4K3S/cQmQXC74ZadszgouN2Cxymc5mlqAYucMc/dJrgFV5PDBU1t0LvZ4+ahyDmEecJsnhecc/RRzPBeNp1G2RKwPiYcc8fUibz6xm63sDevqsfU/J75+/PP8tw5Dvdheq3m/R6P++nxkYdcrZx7178njqrj/vb9+bzWVGXEehbQzFkKf6qqTTMx6B5Uj6vHjk0MnnlIHZ3XxjlOOwLV0Oh38WdDj8PgkP788Xweak4dh09B6y43G2YSF2fNAie6J/KD7vmH1fF5e/MT83l3WzO/f2LYPc95srD/2PB8iA9nEzcA2vJnc/yAOt4+68xLzm1+Vh0+gwdPrHRCrp4Tsi5mmk5Q1YEmflA96h5QJ57a8+MnOO6weph6+5wx9Y3BJ/bsbjq5Pa/u/qe6r4Xfo6rPPdIuNHP71fzgnj2XtOiDlFJvCSppFVR1n29XXh2b931qVDUvtIweP3S6p03gh1X1qKrud7seUtUzBo6NtzvOep1a/u8XtYzQd3V4LhvFTD0nrBIFnGsCXABeu8DO6o8ef+Sx2cKwut8J0XbuX8EjB/ZeLLSPqf969Kequod7+9yPPgOaxk4/oh4dHHjsYqGVjWLGmgU4N0w+qh7f+y7uqYmJ+e92z+U8r02M8Kfwguv1/PD893t41wJwxQl4jfG8r7Vl/k/Uo57X1H3t1KOr+IBFC7h4uO9Tn1bzC1oeUdW/jY2O7n0PhN+hI6PPfeAQVBwZHfnek2r+0cG9T6rqxx7Kjxza9w9YLliC0dE3RnZXplbLFjhh/NjjzoV59Zn2H0ISgFTw3DwQQJ3hg8MQfBCG+8YgTubwwkh+5Ac0/PIj/pZxrSk/UBmGVi3AO3f5z3POavf7uHb/eR+h+5/rrHv8sEv6mj/s8y280OdfeLHvdAfPzfL6/e6WBf57zmrnuA9dBDvjIt/CamFg0QLcaS4IaG4O5Hm4nTanm3vvO2g1z78P/nBNsA3wbtdJbo/DyTWf4/TQPaup1e1pbj1lDl8tD9SxwALYjenuVgL9iPZTpaC/0T56P72kNU320kYx4GA/XsCm0ygR4OOc7KNvHryT87HpNMoEwFb7JgN5u7aAXYKncgn+y8AUu9h0GiUCCoODA286g4NsMp1SAW8BMwJmBMwImBHw/y6gUPgPnMncyEC8DLMAAAAASUVORK5CYII='
     
+    metrics.configure(AppConfig)
     api_client = APIClient(AppConfig)
     file_manager = FileManager(AppConfig)
     mod_manager = ModManager(AppConfig, api_client, file_manager)
     profile_manager = ProfileManager(AppConfig, api_client, mod_manager, file_manager)
+    descriptions = DescriptionRenderer(
+        max_entries=AppConfig.app.descriptions.cache_size,
+        max_chars=AppConfig.app.descriptions.max_chars,
+        cache_path=Path(getcwd(), AppConfig.app.downloads_location, "descriptions.json") if AppConfig.app.descriptions.persist else None,
+    )
+
+    assets = AssetCache(
+        Path(getcwd(), AppConfig.app.downloads_location, "assets"),
+        fetch=api_client.get_asset,
+        max_bytes=AppConfig.app.assets.max_bytes,
+        memory_entries=AppConfig.app.assets.memory_entries,
+        thumbnail_size=AppConfig.app.assets.thumbnail_size,
+        workers=AppConfig.app.assets.workers,
+    )
 
-    app = App(AppConfig, api_client, mod_manager, profile_manager, file_manager)
-    app.run()
\ No newline at end of file
+    app = App(AppConfig, api_client, mod_manager, profile_manager, file_manager, descriptions, assets)
+    app.run()
+    metrics.close()
\ No newline at end of file
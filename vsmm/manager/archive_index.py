@@ -0,0 +1,207 @@
+"""
+Index of what is inside mod archives: the modid, version and dependencies declared in their modinfo.json.
+
+Only the zip central directory and the modinfo.json member are read, nothing is extracted. Results are persisted
+keyed by path and checked against the file's size and mtime, so an archive is only reopened after it changed.
+"""
+from dataclasses import asdict, dataclass, field
+import json
+import os
+from pathlib import Path
+import re
+import threading
+from typing import Dict, Optional
+import zipfile
+
+from .file import FileManager
+
+INDEX_VERSION = 1
+MODINFO_MEMBER = "modinfo.json"
+MAX_MODINFO_BYTES = 1024 * 1024 # anything bigger is not a real modinfo.json
+NUMBER = re.compile(r"-?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?")
+
+
+@dataclass
+class ArchiveInfo:
+    path: str
+    size: int
+    mtime_ns: int
+    modid: Optional[str] = None
+    name: Optional[str] = None
+    version: Optional[str] = None
+    side: Optional[str] = None
+    dependencies: Dict[str, str] = field(default_factory=dict)
+    error: Optional[str] = None # why the archive or its modinfo.json could not be read
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.modid is not None
+
+    def matches(self, stat: os.stat_result) -> bool:
+        return self.size == stat.st_size and self.mtime_ns == stat.st_mtime_ns
+
+
+def parse_lenient_json(text: str):
+    """ Parse JSON the way the game reads modinfo.json: comments, trailing commas, single quoted strings and
+    unquoted keys are all accepted. """
+    try:
+        return json.loads(text)
+    except ValueError:
+        return json.loads(_normalize_json(text))
+
+
+def _normalize_json(text: str) -> str:
+    out = []
+    i, n = 0, len(text)
+    while i < n:
+        c = text[i]
+        if c in "\"'":
+            j, chars = i + 1, []
+            while j < n and text[j] != c:
+                if text[j] == "\\" and j + 1 < n:
+                    escaped = text[j + 1]
+                    chars.append("'" if escaped == "'" else "\\" + escaped)
+                    j += 2
+                    continue
+                chars.append('\\"' if text[j] == '"' else text[j])
+                j += 1
+            out.append('"' + "".join(chars) + '"')
+            i = j + 1
+        elif text.startswith("//", i):
+            i = text.find("\n", i)
+            i = n if i < 0 else i
+        elif text.startswith("/*", i):
+            i = text.find("*/", i + 2)
+            i = n if i < 0 else i + 2
+        elif c in "}]":
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop() # trailing comma
+            out.append(c)
+            i += 1
+        elif c in "-.0123456789":
+            match = NUMBER.match(text, i)
+            j = match.end() if match else i + 1
+            out.append(text[i:j]) # numbers are kept as written, exponent included
+            i = j
+        elif c.isalpha() or c in "_$":
+            j = i
+            while j < n and (text[j].isalnum() or text[j] in "_$"):
+                j += 1
+            word = text[i:j]
+            out.append(word if word in ("true", "false", "null") else json.dumps(word))
+            i = j
+        else:
+            out.append(c)
+            i += 1
+    return "".join(out)
+
+
+def read_modinfo(path: Path) -> Dict:
+    """ Read modinfo.json out of a mod archive without extracting it. Keys are lower-cased, as the game treats
+    them case insensitively. """
+    with zipfile.ZipFile(path) as archive: # only parses the central directory
+        member = next((info for info in archive.infolist() if info.filename.lower() == MODINFO_MEMBER), None)
+        if member is None:
+            raise ValueError(f"no {MODINFO_MEMBER} in archive")
+        if member.file_size > MAX_MODINFO_BYTES:
+            raise ValueError(f"{MODINFO_MEMBER} is {member.file_size} bytes")
+        raw = archive.read(member)
+    modinfo = parse_lenient_json(raw.decode("utf-8-sig"))
+    if not isinstance(modinfo, dict):
+        raise ValueError(f"{MODINFO_MEMBER} is not an object")
+    return {key.lower(): value for key, value in modinfo.items()}
+
+
+def inspect_archive(path: Path, stat: os.stat_result) -> ArchiveInfo:
+    info = ArchiveInfo(path=str(path), size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+    try:
+        modinfo = read_modinfo(path)
+    except (OSError, zipfile.BadZipFile, ValueError, UnicodeDecodeError) as exc:
+        info.error = f"{type(exc).__name__}: {exc}"
+        return info
+    modid = modinfo.get("modid")
+    info.modid = str(modid) if modid is not None else None
+    info.name = modinfo.get("name")
+    info.version = modinfo.get("version")
+    info.side = modinfo.get("side")
+    dependencies = modinfo.get("dependencies") or {}
+    info.dependencies = {str(dep): str(version) for dep, version in dependencies.items()} if isinstance(dependencies, dict) else {}
+    if info.modid is None:
+        info.error = f"{MODINFO_MEMBER} has no modid"
+    return info
+
+
+class ArchiveIndex:
+
+    def __init__(self, file: FileManager, index_path: Path):
+        self.file = file
+        self.index_path = Path(index_path)
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, ArchiveInfo] = {}
+        self._dirty = False
+        self._lock = threading.RLock()
+        self.load()
+
+    def load(self):
+        contents = self.file.read(self.index_path)
+        if contents is None:
+            return
+        try:
+            index = json.loads(contents)
+            if index.get("version") != INDEX_VERSION:
+                return
+            entries = {path: ArchiveInfo(**entry) for path, entry in index["entries"].items()}
+        except (ValueError, KeyError, TypeError):
+            return # rebuilt on the next scan
+        with self._lock:
+            self._entries = entries
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            contents = json.dumps({"version": INDEX_VERSION, "entries": {path: asdict(info) for path, info in self._entries.items()}})
+            self._dirty = False
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        self.file.write_atomic(self.index_path, contents)
+
+    def lookup(self, path: Path, stat: os.stat_result = None) -> ArchiveInfo:
+        """ What is inside an archive, from the index unless the file's size or mtime changed. """
+        key = str(Path(path).absolute())
+        stat = stat or os.stat(key)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached.matches(stat):
+                self.hits += 1
+                return cached
+            self.misses += 1
+        info = inspect_archive(Path(key), stat)
+        with self._lock:
+            self._entries[key] = info
+            self._dirty = True
+        return info
+
+    def scan(self, folder: Path, suffix: str = ".zip") -> Dict[str, ArchiveInfo]:
+        """ Index every archive directly inside folder, keyed by file name, and forget archives that are gone.
+        The index is saved if anything changed. """
+        folder = Path(folder).absolute()
+        found: Dict[str, ArchiveInfo] = {}
+        if folder.is_dir():
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.name.lower().endswith(suffix) and entry.is_file():
+                        found[entry.name] = self.lookup(Path(entry.path), entry.stat())
+        prefix = str(folder) + os.sep
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix) and os.sep not in key[len(prefix):]]:
+                if Path(key).name not in found:
+                    del self._entries[key]
+                    self._dirty = True
+        self.save()
+        return found
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
@@ -0,0 +1,190 @@
+"""
+Bounded cache of mod logos and screenshots, downscaled once to thumbnails.
+
+Lookups go memory LRU -> thumbnail directory -> network. Fetches run on a small pool of their own, and concurrent
+requests for the same url share one future. The directory is capped at max_bytes by evicting the least recently
+used thumbnails. Downscaling needs Pillow (the optional "images" extra); without it PNG and GIF images are kept
+as they are and other formats are skipped, since tkinter cannot display them. Such images are remembered as empty
+thumbnail files, so they are not downloaded again after a restart either.
+"""
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import hashlib
+import io
+import os
+import pathlib
+import threading
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from instrumentation import metrics
+
+try:
+    from PIL import Image
+except ImportError: # optional, see the module docstring
+    Image = None
+
+THUMBNAIL_SUFFIX = ".thumb"
+PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+GIF_MAGIC = (b"GIF87a", b"GIF89a")
+UNUSABLE = b"" # stored for urls whose image cannot be shown, so they are not fetched again
+
+
+def mod_image_urls(mod_info: Any) -> Iterator[str]:
+    """ The images that could stand for a ModInfo, best first: its logo, then its screenshots. """
+    if mod_info.logofile:
+        yield mod_info.logofile
+    for screenshot in mod_info.screenshots or []:
+        url = screenshot.get("mainfile") if isinstance(screenshot, dict) else screenshot
+        if url:
+            yield url
+
+
+class AssetCache:
+
+    def __init__(self, cache_dir: pathlib.Path, fetch: Callable[[str], bytes], max_bytes: int, memory_entries: int,
+                 thumbnail_size: int, workers: int = 2):
+        self.cache_dir = pathlib.Path(cache_dir)
+        self.fetch_bytes = fetch # url -> raw image bytes, e.g. APIClient.get_asset
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.thumbnail_size = thumbnail_size
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict() # url -> thumbnail, most recently used last
+        self._disk: "OrderedDict[str, int]" = OrderedDict() # file name -> size, most recently used last
+        self._disk_bytes = 0
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vsmm-assets")
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._scan()
+
+    @staticmethod
+    def file_name(url: str) -> str:
+        return hashlib.sha1(url.encode("utf-8")).hexdigest() + THUMBNAIL_SUFFIX
+
+    def get(self, url: str) -> Optional[bytes]:
+        """ The cached thumbnail for url without touching the network: None if it is not cached, UNUSABLE (empty)
+        if the image is known not to be displayable. """
+        name = self.file_name(url)
+        with self._lock:
+            data = self._memory.get(url)
+            if data is not None:
+                self._memory.move_to_end(url)
+                self.hits += 1
+                metrics.count("assets_total", result="hit")
+                return data
+            if name not in self._disk:
+                return None
+        path = self.cache_dir / name
+        try:
+            data = path.read_bytes()
+            os.utime(path) # the directory order is rebuilt from mtimes on the next start
+        except OSError:
+            with self._lock:
+                self._disk_bytes -= self._disk.pop(name, 0)
+            return None
+        with self._lock:
+            if name in self._disk:
+                self._disk.move_to_end(name)
+            self._remember(url, data)
+            self.disk_hits += 1
+        metrics.count("assets_total", result="disk_hit")
+        return data
+
+    def fetch(self, url: str) -> Future:
+        """ Future of the thumbnail for url, None if it cannot be shown. Already completed on a cache hit; concurrent
+        calls for the same url share one download. """
+        data = self.get(url)
+        if data is not None:
+            future = Future()
+            future.set_result(data or None)
+            return future
+        with self._lock:
+            future = self._inflight.get(url)
+            if future is None:
+                self.misses += 1
+                metrics.count("assets_total", result="miss")
+                future = self._inflight[url] = self._executor.submit(self._load, url)
+                future.add_done_callback(lambda _: self._finished(url))
+            return future
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                    "memory_entries": len(self._memory), "disk_entries": len(self._disk), "disk_bytes": self._disk_bytes}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _finished(self, url: str):
+        with self._lock:
+            self._inflight.pop(url, None)
+
+    def _load(self, url: str) -> Optional[bytes]:
+        with metrics.span("assets.fetch"):
+            raw = self.fetch_bytes(url)
+        with metrics.span("assets.thumbnail"):
+            data = self._thumbnail(raw)
+        if data is None:
+            self._store(url, UNUSABLE) # an empty thumbnail file is the persistent negative entry
+            return None
+        self._store(url, data)
+        return data
+
+    def _thumbnail(self, raw: bytes) -> Optional[bytes]:
+        """ PNG bytes of raw downscaled to fit thumbnail_size, or None if it cannot be displayed. """
+        if Image is None:
+            return raw if raw.startswith(PNG_MAGIC) or raw[:6] in GIF_MAGIC else None
+        try:
+            with Image.open(io.BytesIO(raw)) as image:
+                image.thumbnail((self.thumbnail_size, self.thumbnail_size))
+                if image.mode not in ("RGB", "RGBA"):
+                    image = image.convert("RGBA")
+                output = io.BytesIO()
+                image.save(output, "PNG", optimize=True)
+                return output.getvalue()
+        except (OSError, ValueError, Image.DecompressionBombError):
+            return None
+
+    def _store(self, url: str, data: bytes):
+        name = self.file_name(url)
+        path = self.cache_dir / name
+        tmp_path = path.with_name(name + ".tmp")
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        evicted = []
+        with self._lock:
+            self._disk_bytes -= self._disk.pop(name, 0)
+            self._disk[name] = len(data)
+            self._disk_bytes += len(data)
+            while self._disk_bytes > self.max_bytes and len(self._disk) > 1:
+                evicted_name, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                evicted.append(evicted_name)
+            self._remember(url, data)
+        for evicted_name in evicted:
+            (self.cache_dir / evicted_name).unlink(missing_ok=True)
+        metrics.count("assets_evicted_total", len(evicted))
+
+    def _remember(self, url: str, data: bytes):
+        self._memory[url] = data
+        self._memory.move_to_end(url)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _scan(self):
+        """ Rebuild the directory's LRU order from file mtimes. """
+        if not self.cache_dir.is_dir():
+            return
+        entries = []
+        with os.scandir(self.cache_dir) as scan:
+            for entry in scan:
+                if entry.name.endswith(THUMBNAIL_SUFFIX) and entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, entry.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._disk[name] = size
+            self._disk_bytes += size
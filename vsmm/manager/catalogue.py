@@ -0,0 +1,237 @@
+"""
+Compact, memory-mappable binary format for the mod catalogue (mod_cache.<generation>.bin).
+
+Layout (native byte order, every section aligned to 8 bytes):
+    header          magic, format version, flags, last_updated, mod/string/tag-ref counts
+    string offsets  uint32 x (strings + 1), offsets into the string blob
+    string blob     utf-8, every distinct string stored once (tags, authors and sides are interned)
+    int columns     int64 x mods for each of INT_FIELDS, NULL_INT for None
+    str columns     uint32 x mods for each of STR_FIELDS, string ids or NULL_STR for None
+    tag offsets     uint32 x (mods + 1), slices into tag refs
+    tag refs        uint32 x tag refs, string ids
+
+Loading maps the file and wraps the columns in memoryviews; ModMetadata objects are only built for the rows
+that are actually accessed, and only the most recently used ROW_CACHE_SIZE of them are kept. Iterating over the
+catalogue builds rows without keeping them.
+"""
+from array import array
+from collections import OrderedDict
+from collections.abc import Sequence
+from datetime import datetime
+import mmap
+import os
+import pathlib
+import struct
+import sys
+import threading
+from typing import Callable, Iterable, Iterator, List
+
+MAGIC = b"VSMC"
+FORMAT_VERSION = 1
+FLAG_BIG_ENDIAN = 1
+HEADER = struct.Struct("<4sHHdIII4x")
+INT_FIELDS = ("modid", "assetid", "downloads", "follows", "trendingpoints")
+STR_FIELDS = ("name", "author", "logo", "lastreleased", "side")
+NULL_INT = -(2 ** 63)
+NULL_STR = 2 ** 32 - 1
+NATIVE_FLAGS = FLAG_BIG_ENDIAN if sys.byteorder == "big" else 0
+ROW_CACHE_SIZE = 1024 # materialized rows kept per catalogue, a few table pages plus the selection's neighbours
+MAPPED_ATTRIBUTES = ("_string_offsets", "_blob", "_ints", "_strs", "_tag_offsets", "_tag_refs")
+
+
+class CatalogueFormatError(ValueError):
+    pass
+
+
+class CatalogueClosedError(ValueError):
+    pass
+
+
+def _padding(length: int) -> bytes:
+    return b"\0" * (-length % 8)
+
+
+class CatalogueWriter:
+    """ Accumulates mods one at a time into compact columns, then writes them out in a single pass. """
+
+    def __init__(self):
+        self.strings: List[bytes] = []
+        self.string_ids: Dict[str, int] = {}
+        self.int_columns = {field: array("q") for field in INT_FIELDS}
+        self.str_columns = {field: array("I") for field in STR_FIELDS}
+        self.tag_offsets = array("I", [0])
+        self.tag_refs = array("I")
+
+    def __len__(self) -> int:
+        return len(self.tag_offsets) - 1
+
+    def intern(self, value: str) -> int:
+        if value is None:
+            return NULL_STR
+        string_id = self.string_ids.get(value)
+        if string_id is None:
+            string_id = self.string_ids[value] = len(self.strings)
+            self.strings.append(value.encode("utf-8"))
+        return string_id
+
+    def add(self, mod):
+        for field in INT_FIELDS:
+            value = getattr(mod, field)
+            self.int_columns[field].append(NULL_INT if value is None else value)
+        for field in STR_FIELDS:
+            self.str_columns[field].append(self.intern(getattr(mod, field)))
+        self.tag_refs.extend(self.intern(tag) for tag in mod.tags)
+        self.tag_offsets.append(len(self.tag_refs))
+
+    def write(self, path: pathlib.Path, last_updated: datetime):
+        """ Write the catalogue to path atomically (temp file + rename). """
+        path = pathlib.Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        string_offsets = array("I", [0])
+        for encoded in self.strings:
+            string_offsets.append(string_offsets[-1] + len(encoded))
+        blob = b"".join(self.strings)
+        sections = [string_offsets.tobytes(), blob]
+        sections += [self.int_columns[field].tobytes() for field in INT_FIELDS]
+        sections += [self.str_columns[field].tobytes() for field in STR_FIELDS]
+        sections += [self.tag_offsets.tobytes(), self.tag_refs.tobytes()]
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, NATIVE_FLAGS, last_updated.timestamp(),
+                                len(self), len(self.strings), len(self.tag_refs)))
+            for section in sections:
+                f.write(section)
+                f.write(_padding(len(section)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+
+def write_catalogue(path: pathlib.Path, mods: Iterable, last_updated: datetime):
+    writer = CatalogueWriter()
+    for mod in mods:
+        writer.add(mod)
+    writer.write(path, last_updated)
+
+
+class Catalogue(Sequence):
+    """ Read-only, lazily materialized view of a catalogue file. Behaves like the ModCache.mods list. """
+
+    def __init__(self, path: pathlib.Path, model: Callable, row_cache_size: int = ROW_CACHE_SIZE):
+        self.path = pathlib.Path(path)
+        self.model = model
+        self.row_cache_size = row_cache_size
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._parse()
+        except Exception:
+            self.close()
+            raise
+        self._strings: List[str] = [None] * self._string_count
+        self._rows: "OrderedDict[int, object]" = OrderedDict() # row -> model, most recently used last
+        self._rows_lock = threading.Lock() # table pages and worker queries read rows from different threads
+
+    def _parse(self):
+        if len(self._map) < HEADER.size:
+            raise CatalogueFormatError("Catalogue file is truncated")
+        magic, version, flags, timestamp, mod_count, string_count, tag_ref_count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise CatalogueFormatError("Not a vsmm catalogue file")
+        if version != FORMAT_VERSION or flags != NATIVE_FLAGS:
+            raise CatalogueFormatError(f"Unsupported catalogue format version {version} (flags {flags})")
+        self.last_updated = datetime.fromtimestamp(timestamp)
+        self._mod_count = mod_count
+        self._string_count = string_count
+        view = memoryview(self._map)
+        offset = HEADER.size
+
+        def section(length: int, fmt: str = None) -> memoryview:
+            nonlocal offset
+            if offset + length > len(view):
+                raise CatalogueFormatError("Catalogue file is truncated")
+            data = view[offset:offset + length]
+            offset += length + (-length % 8)
+            return data.cast(fmt) if fmt else data
+
+        self._string_offsets = section(4 * (string_count + 1), "I")
+        self._blob = section(self._string_offsets[-1])
+        self._ints = {field: section(8 * mod_count, "q") for field in INT_FIELDS}
+        self._strs = {field: section(4 * mod_count, "I") for field in STR_FIELDS}
+        self._tag_offsets = section(4 * (mod_count + 1), "I")
+        self._tag_refs = section(4 * tag_ref_count, "I")
+
+    def __len__(self) -> int:
+        return self._mod_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[row] for row in range(*index.indices(self._mod_count))]
+        if index < 0:
+            index += self._mod_count
+        if not 0 <= index < self._mod_count:
+            raise IndexError("catalogue index out of range")
+        with self._rows_lock:
+            mod = self._rows.get(index)
+            if mod is not None:
+                self._rows.move_to_end(index)
+                return mod
+        mod = self._materialize(index)
+        with self._rows_lock:
+            mod = self._rows.setdefault(index, mod) # another thread may have built the same row meanwhile
+            while len(self._rows) > self.row_cache_size:
+                self._rows.popitem(last=False)
+        return mod
+
+    def __iter__(self) -> Iterator:
+        for row in range(self._mod_count):
+            yield self.peek(row)
+
+    def peek(self, index: int):
+        """ Build a row without keeping it materialized, for one-off passes over the whole catalogue. """
+        mod = self._rows.get(index)
+        return mod if mod is not None else self._materialize(index)
+
+    def column(self, field: str) -> memoryview:
+        """ The raw values of one of INT_FIELDS, NULL_INT for None. """
+        return self._ints[field]
+
+    def string(self, string_id: int) -> str:
+        if string_id == NULL_STR:
+            return None
+        value = self._strings[string_id]
+        if value is None:
+            start, end = self._string_offsets[string_id], self._string_offsets[string_id + 1]
+            value = self._strings[string_id] = str(self._blob[start:end], "utf-8")
+        return value
+
+    def _materialize(self, row: int):
+        fields = {}
+        for field, column in self._ints.items():
+            value = column[row]
+            fields[field] = None if value == NULL_INT else value
+        for field, column in self._strs.items():
+            fields[field] = self.string(column[row])
+        fields["tags"] = [self.string(ref) for ref in self._tag_refs[self._tag_offsets[row]:self._tag_offsets[row + 1]]]
+        return self.model.construct(**fields) # the data was validated before it was written
+
+    def __getattr__(self, name):
+        # only reached when normal lookup fails, i.e. for the mapped sections once close() dropped them
+        if name in MAPPED_ATTRIBUTES:
+            raise CatalogueClosedError("Catalogue is closed, only rows still in its row cache are readable")
+        raise AttributeError(name)
+
+    @property
+    def closed(self) -> bool:
+        return self._map.closed
+
+    def close(self):
+        """ Release the mapping. Rows still in the row cache stay readable, any other access raises
+        CatalogueClosedError. """
+        for name in ("_string_offsets", "_blob", "_tag_offsets", "_tag_refs"):
+            view = self.__dict__.pop(name, None)
+            if view is not None:
+                view.release()
+        for columns in (self.__dict__.pop("_ints", {}), self.__dict__.pop("_strs", {})):
+            for view in columns.values():
+                view.release()
+        self._map.close()
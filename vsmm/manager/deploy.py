@@ -0,0 +1,68 @@
+"""
+Plans a profile deployment as a diff against what is already in a game's mods folder.
+"""
+from dataclasses import dataclass, field
+from os import scandir, stat
+from os.path import isfile
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from .scanner import FileStat
+
+
+@dataclass
+class DeployPlan:
+    profile_name: str
+    mods_folder: Path
+    keep: List[str] = field(default_factory=list)
+    remove: List[str] = field(default_factory=list)
+    add: Dict[str, Optional[Path]] = field(default_factory=dict) # archive name -> local source, None if not downloaded
+    unmanaged: List[str] = field(default_factory=list) # files no profile knows about, left alone
+
+    @property
+    def is_noop(self) -> bool:
+        return not (self.remove or self.add)
+
+    def describe(self) -> str:
+        lines = [f"Deploy plan for profile {self.profile_name} into {self.mods_folder}:"]
+        lines += [f"  keep    {name}" for name in self.keep]
+        lines += [f"  remove  {name}" for name in self.remove]
+        lines += [f"  add     {name}" + ("" if source else " (download)") for name, source in self.add.items()]
+        lines += [f"  ignore  {name} (not managed by vsmm)" for name in self.unmanaged]
+        lines.append(f"{len(self.keep)} kept, {len(self.remove)} removed, {len(self.add)} added")
+        return "\n".join(lines)
+
+
+def is_same_archive(deployed: FileStat, source: Optional[Path]) -> bool:
+    """ Cheap identity check: a hardlink to the source, or a file of the same size. Archive names carry the
+    mod version, so a same-named, same-sized file is treated as the same release. """
+    if source is None or not isfile(source):
+        return True # nothing local to compare against, trust the name
+    source_stat = FileStat.of(stat(source))
+    return deployed.same_file(source_stat) or deployed.size == source_stat.size
+
+
+def plan_deployment(profile_name: str, mods_folder: Path, wanted: Dict[str, Optional[Path]], managed: Set[str],
+                    present: Dict[str, FileStat] = None) -> DeployPlan:
+    """ Compare the wanted archives (name -> local source) with the mods folder. Only archives that belong to a
+    known profile (managed) are ever scheduled for removal. present is the folder's current contents, e.g. from
+    a FolderSnapshot; without it the folder is listed. """
+    plan = DeployPlan(profile_name=profile_name, mods_folder=mods_folder)
+    if present is None:
+        present = {}
+        if mods_folder.is_dir():
+            with scandir(mods_folder) as entries:
+                present = {entry.name: FileStat.of(entry.stat()) for entry in entries if entry.is_file()}
+    for name, source in wanted.items():
+        if name in present and is_same_archive(present[name], source):
+            plan.keep.append(name)
+        else:
+            if name in present:
+                plan.remove.append(name) # replaced by the profile's copy
+            plan.add[name] = source
+    for name in sorted(set(present) - set(wanted)):
+        if name in managed:
+            plan.remove.append(name)
+        else:
+            plan.unmanaged.append(name)
+    return plan
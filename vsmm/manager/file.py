@@ -3,9 +3,17 @@
 from typing import Any
 from config import configuration
 from os.path import exists, isfile
-from os import remove, getcwd
+import os
+from os import link, remove, getcwd
 from pathlib import Path
 from shutil import copy
+import sys
+
+if sys.platform.startswith("linux"):
+    import fcntl
+
+FICLONE = 0x40049409 # linux ioctl: share the source extents with the destination (btrfs, xfs, ...)
+LINK_MODES = ("auto", "reflink", "hardlink", "copy")
 
 class FileManager:
 
@@ -17,6 +25,26 @@ class FileManager:
             f.write(data)
         return path
 
+    def write_atomic(self, path: Path, data: Any) -> Path:
+        """ Replace path with data so that readers (and a crash) only ever see the old or the new contents:
+        write a temp file next to it, fsync it, then rename it over the original. data may also be an iterable of
+        str or bytes chunks, written as they are produced. """
+        path = Path(path)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        with open(tmp_path, "wb") as f:
+            for chunk in (data,) if isinstance(data, (str, bytes)) else data:
+                f.write(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        if hasattr(os, "O_DIRECTORY"): # make the rename itself durable where directories can be fsynced
+            dir_fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        return path
+
     def read(self, path: Path) -> any:
         if not (exists(path) and isfile(path)): return None
         with open(path, "rb") as f:
@@ -33,10 +61,47 @@ class FileManager:
         copy(path, destination)
         return True
 
+    def link_or_copy(self, path: Path, destination: Path, mode: str = None) -> str:
+        """ Place path at destination as cheaply as the filesystem allows: a reflink, then a hardlink, then a
+        plain copy. Returns the method that was used. """
+        return self._link_or_copy(path, destination, mode or self.cfg.app.deploy.link_mode)
+
+    def _link_or_copy(self, path: Path, destination: Path, mode: str) -> str:
+        if mode not in LINK_MODES:
+            raise ValueError(f"Unknown link mode {mode}, expected one of {', '.join(LINK_MODES)}")
+        if exists(destination):
+            remove(destination)
+        if mode in ("auto", "reflink") and self._reflink(path, destination):
+            return "reflink"
+        if mode in ("auto", "hardlink"):
+            try:
+                link(path, destination)
+                return "hardlink"
+            except OSError:
+                pass # different filesystem, or links not supported
+        copy(path, destination)
+        return "copy"
+
+    def _reflink(self, path: Path, destination: Path) -> bool:
+        if not sys.platform.startswith("linux"):
+            return False
+        try:
+            with open(path, "rb") as src, open(destination, "wb") as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return True
+        except OSError:
+            if exists(destination):
+                remove(destination)
+            return False
 
-    def delete_all_archives_in_path(self, path: Path):
-        # todo: remove all zip files in a given path
-        pass
+    def delete_all_archives_in_path(self, path: Path) -> int:
+        """ Remove every zip archive directly inside path. Returns how many were deleted. """
+        deleted = 0
+        for archive in Path(path).glob("*.zip"):
+            if archive.is_file():
+                remove(archive)
+                deleted += 1
+        return deleted
 
     def exists_locally(self, path: Path) -> bool:
         return exists(path) and isfile(path)
\ No newline at end of file
@@ -0,0 +1,217 @@
+"""
+Deploy one profile to many game or server installs at once.
+
+Targets are registered in a small JSON registry. A fleet deploy stages every archive of the profile in the
+ArchiveStore first (each one downloaded at most once), then fans out to all targets concurrently, linking the
+blobs into each mods folder. On one filesystem every target ends up with hardlinks to the same blobs, so rolling
+out a modpack costs its unique bytes once, not once per target.
+"""
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import json
+from os import getcwd
+from pathlib import Path
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+
+from pydantic import BaseModel
+
+from instrumentation import metrics
+from signalling.observer import Observable
+from .deploy import plan_deployment
+from .file import FileManager
+from .scanner import FolderSnapshot
+
+if TYPE_CHECKING:
+    from .profile import ProfileManager
+
+FLEET_SIGNALS = ["target_deployed", "target_failed"]
+
+
+class DeployTarget(BaseModel):
+    name: str
+    game_path: Path # the game or server install, archives go into its mods folder
+    profile: Optional[str] = None # profile currently deployed there
+
+    def mods_folder(self) -> Path:
+        return Path(getcwd(), self.game_path, "mods")
+
+
+class TargetRegistry:
+
+    def __init__(self, file: FileManager, path: Path):
+        self.file = file
+        self.path = Path(path)
+        self.targets: Dict[str, DeployTarget] = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        contents = self.file.read(self.path)
+        if contents is None:
+            return
+        self.targets = {target.name: target for target in (DeployTarget.parse_obj(entry) for entry in json.loads(contents))}
+
+    def save(self):
+        with self._lock:
+            contents = "[" + ",".join(target.json() for target in self.targets.values()) + "]"
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.file.write_atomic(self.path, contents)
+
+    def add(self, name: str, game_path: Path) -> DeployTarget:
+        if name in self.targets:
+            raise ValueError(f"Target {name} is already registered")
+        target = self.targets[name] = DeployTarget(name=name, game_path=game_path)
+        self.save()
+        return target
+
+    def remove(self, name: str) -> bool:
+        if self.targets.pop(name, None) is None:
+            return False
+        self.save()
+        return True
+
+    def resolve(self, names: Iterable[str] = None) -> List[DeployTarget]:
+        """ The named targets, or all of them. Unknown names raise ValueError. """
+        if names is None:
+            return list(self.targets.values())
+        unknown = [name for name in names if name not in self.targets]
+        if unknown:
+            raise ValueError(f"Unknown targets: {', '.join(unknown)}")
+        return [self.targets[name] for name in names]
+
+
+@dataclass
+class TargetResult:
+    target: str
+    ok: bool = True
+    kept: int = 0
+    removed: int = 0
+    added: int = 0
+    methods: Dict[str, int] = field(default_factory=dict) # link_or_copy method -> count
+    missing: List[str] = field(default_factory=list) # undeploy: archives that were already gone
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+
+@dataclass
+class FleetResult:
+    profile: str
+    staged: int = 0 # unique archives made available locally
+    failures: Dict[str, str] = field(default_factory=dict) # archive name -> staging error
+    targets: Dict[str, TargetResult] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failures and all(result.ok for result in self.targets.values())
+
+
+class FleetDeployer(Observable):
+
+    def __init__(self, profile_manager: "ProfileManager", registry: TargetRegistry, snapshot_dir: Path, workers: int):
+        super().__init__(FLEET_SIGNALS)
+        self.profile_manager = profile_manager
+        self.file = profile_manager.file
+        self.registry = registry
+        self.snapshot_dir = Path(snapshot_dir)
+        self.workers = workers
+
+    def deploy(self, profile_name: str, target_names: Iterable[str] = None, dry_run: bool = False) -> FleetResult:
+        """ Deploy a profile to the given targets (all registered ones by default). Nothing on any target is
+        touched unless every archive could be staged first. """
+        targets = self.registry.resolve(target_names)
+        result = FleetResult(profile=profile_name)
+        blobs, result.failures = ({}, {}) if dry_run else self.profile_manager.stage_archives(profile_name)
+        result.staged = len(blobs)
+        if result.failures:
+            return result
+        if dry_run: # plan against the same local archives the real run would link, nothing is downloaded
+            blobs = self.profile_manager.archive_sources(profile_name)
+        managed = self.profile_manager.managed_archives()
+        result.targets = self._fan_out(targets, lambda target: self._deploy_target(target, profile_name, blobs, managed, dry_run))
+        if not dry_run:
+            self.registry.save()
+        return result
+
+    def undeploy(self, profile_name: str, target_names: Iterable[str] = None) -> FleetResult:
+        """ Remove a profile's archives from the targets it is deployed to. """
+        targets = [target for target in self.registry.resolve(target_names) if target.profile == profile_name]
+        profile = self.profile_manager.get_profile(profile_name)
+        names = [mod.archive_name for mod in profile.mods]
+        result = FleetResult(profile=profile_name)
+        result.targets = self._fan_out(targets, lambda target: self._undeploy_target(target, names))
+        self.registry.save()
+        return result
+
+    def _fan_out(self, targets: List[DeployTarget], work) -> Dict[str, TargetResult]:
+        if not targets:
+            return {}
+        results: Dict[str, TargetResult] = {}
+        with ThreadPoolExecutor(min(self.workers, len(targets)), thread_name_prefix="vsmm-fleet") as pool:
+            futures = {target.name: pool.submit(self._run_target, target, work) for target in targets}
+            for name, future in futures.items():
+                results[name] = future.result()
+                signal = "target_deployed" if results[name].ok else "target_failed"
+                self.emit_signal(signal, target=name, result=results[name])
+        return results
+
+    def _run_target(self, target: DeployTarget, work) -> TargetResult:
+        started = time.monotonic()
+        try:
+            with metrics.span("fleet.target", target=target.name):
+                result = work(target)
+        except Exception as exc: # one broken target must not stop the others
+            result = TargetResult(target=target.name, ok=False, error=f"{type(exc).__name__}: {exc}")
+        result.seconds = time.monotonic() - started
+        return result
+
+    def _deploy_target(self, target: DeployTarget, profile_name: str, blobs: Dict[str, Optional[Path]], managed, dry_run: bool) -> TargetResult:
+        folder = target.mods_folder()
+        snapshot = self._snapshot(target)
+        snapshot.refresh()
+        plan = plan_deployment(profile_name, folder, blobs, managed, present=snapshot.entries)
+        for name in [name for name in plan.keep if snapshot.is_modified(name)]:
+            plan.keep.remove(name)
+            plan.remove.append(name)
+            plan.add[name] = blobs[name]
+        result = TargetResult(target=target.name, kept=len(plan.keep), removed=len(plan.remove), added=len(plan.add))
+        if dry_run:
+            return result
+        folder.mkdir(parents=True, exist_ok=True)
+        for name in plan.remove:
+            self.file.delete(folder / name)
+            snapshot.forget(name)
+        methods = Counter()
+        for name, blob in plan.add.items():
+            methods[self.file.link_or_copy(blob, folder / name)] += 1
+            snapshot.record_deployed(name)
+        for method, count in methods.items():
+            metrics.count("deploy_files_total", count, action=method)
+        for name in plan.keep:
+            if name not in snapshot.deployed:
+                snapshot.record_deployed(name)
+        snapshot.close()
+        result.methods = dict(methods)
+        target.profile = profile_name
+        return result
+
+    def _undeploy_target(self, target: DeployTarget, names: List[str]) -> TargetResult:
+        folder = target.mods_folder()
+        snapshot = self._snapshot(target)
+        snapshot.refresh()
+        result = TargetResult(target=target.name)
+        for name in names:
+            if name not in snapshot.entries:
+                result.missing.append(name)
+                continue
+            self.file.delete(folder / name)
+            snapshot.forget(name)
+            result.removed += 1
+        snapshot.close()
+        target.profile = None
+        return result
+
+    def _snapshot(self, target: DeployTarget) -> FolderSnapshot:
+        return FolderSnapshot(self.file, target.mods_folder(), self.snapshot_dir / f"{target.name}.json")
@@ -0,0 +1,119 @@
+"""
+In-memory search indexes over the ModCache catalogue.
+
+Queries work on row ids (positions in ModCache.mods) so results can be filtered, sorted and paged without
+copying any ModMetadata.
+"""
+from array import array
+from bisect import bisect_left
+from difflib import get_close_matches
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+SORT_KEYS = ("name", "author", "downloads", "follows", "trendingpoints", "lastreleased")
+FUZZY_MATCHES_PER_TOKEN = 5
+FUZZY_CUTOFF = 0.75
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return TOKEN_PATTERN.findall(text.casefold()) if text else []
+
+
+class ModIndex:
+
+    def __init__(self, mods: Sequence):
+        self.mods = mods
+        self.by_modid: Dict[int, int] = {}
+        self.by_assetid: Dict[int, int] = {}
+        self.tags: Dict[str, Set[int]] = {}
+        self.authors: Dict[str, Set[int]] = {}
+        self.sides: Dict[str, Set[int]] = {}
+        self.name_tokens: Dict[str, Set[int]] = {}
+        sort_values: Dict[str, list] = {key: [] for key in SORT_KEYS}
+        # one pass; iterating a Catalogue decodes each row without keeping it, so the index never holds the models
+        for row, mod in enumerate(mods):
+            self.by_modid[mod.modid] = row
+            self.by_assetid[mod.assetid] = row
+            self.authors.setdefault(mod.author.casefold(), set()).add(row)
+            self.sides.setdefault(mod.side.casefold(), set()).add(row)
+            for tag in mod.tags:
+                self.tags.setdefault(tag.casefold(), set()).add(row)
+            for token in tokenize(mod.name):
+                self.name_tokens.setdefault(token, set()).add(row)
+            for key, values in sort_values.items():
+                values.append(self._sort_value(mod, key))
+        self.vocabulary = sorted(self.name_tokens)
+        self.orders: Dict[str, array] = {}
+        self.ranks: Dict[str, array] = {}
+        for key in SORT_KEYS:
+            order = sorted(range(len(mods)), key=sort_values.pop(key).__getitem__)
+            rank = array("I", bytes(4 * len(mods)))
+            for position, row in enumerate(order):
+                rank[row] = position
+            self.orders[key] = array("I", order)
+            self.ranks[key] = rank
+
+    def __len__(self) -> int:
+        return len(self.mods)
+
+    def get(self, modid: int):
+        row = self.by_modid.get(modid)
+        return self.mods[row] if row is not None else None
+
+    def get_by_assetid(self, assetid: int):
+        row = self.by_assetid.get(assetid)
+        return self.mods[row] if row is not None else None
+
+    def match_name(self, text: str, fuzzy: bool = False) -> Set[int]:
+        """ Rows whose name has a token starting with every token of text. With fuzzy, a query token that
+        prefixes nothing falls back to the closest tokens in the vocabulary. """
+        matched = None
+        for token in tokenize(text):
+            rows = set()
+            candidates = self._tokens_with_prefix(token)
+            if not candidates and fuzzy:
+                candidates = get_close_matches(token, self.vocabulary, n=FUZZY_MATCHES_PER_TOKEN, cutoff=FUZZY_CUTOFF)
+            for candidate in candidates:
+                rows |= self.name_tokens[candidate]
+            matched = rows if matched is None else matched & rows
+            if not matched:
+                return set()
+        return matched if matched is not None else set(range(len(self.mods)))
+
+    def query(self, text: str = None, tags: Iterable[str] = None, author: str = None, side: str = None,
+              sort: str = "downloads", descending: bool = True, fuzzy: bool = False) -> Sequence[int]:
+        """ Return the row ids matching every given filter, ordered by sort. """
+        if sort not in self.orders:
+            raise ValueError(f"Unknown sort key {sort}, expected one of {', '.join(SORT_KEYS)}")
+        filters = []
+        for tag in tags or ():
+            filters.append(self.tags.get(tag.casefold(), set()))
+        if author:
+            filters.append(self.authors.get(author.casefold(), set()))
+        if side:
+            filters.append(self.sides.get(side.casefold(), set()))
+        if text:
+            filters.append(self.match_name(text, fuzzy=fuzzy))
+
+        if not filters:
+            order = self.orders[sort]
+            return order[::-1] if descending else order
+        filters.sort(key=len) # intersect from the smallest set so the work is bounded by the rarest filter
+        rows = set(filters[0])
+        for other in filters[1:]:
+            rows &= other
+        return sorted(rows, key=self.ranks[sort].__getitem__, reverse=descending)
+
+    def _tokens_with_prefix(self, prefix: str) -> List[str]:
+        start = bisect_left(self.vocabulary, prefix)
+        end = bisect_left(self.vocabulary, prefix + "\uffff")
+        return self.vocabulary[start:end]
+
+    @staticmethod
+    def _sort_value(mod, key: str):
+        if key in ("name", "author"):
+            return getattr(mod, key).casefold()
+        if key == "lastreleased":
+            return mod.lastreleased or ""
+        return getattr(mod, key) or 0
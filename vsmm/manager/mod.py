@@ -1,16 +1,30 @@
 from collections import OrderedDict
+from contextlib import contextmanager
 import json
 from os import getcwd
+import re
+import threading
 
-from api.client import APIClient
+from api.manifest import verify_archive
+from instrumentation import metrics
+from .catalogue import Catalogue, CatalogueFormatError, CatalogueWriter, write_catalogue
 from .file import FileManager
-from datetime import datetime
-from typing import Any, Dict, List, Optional
+from .index import ModIndex
+from .modinfo_cache import ModInfoCache
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional
 from config.configuration import Configuration
 from os.path import exists, isfile
 import pathlib
 from pydantic import BaseModel
 
+if TYPE_CHECKING: # the http stack is only imported by whoever builds the APIClient
+    from api.client import APIClient
+
+JSON_CACHE_FILENAME = "mod_cache.json"
+CATALOGUE_FILENAME = "mod_cache.bin" # the unversioned name of older releases, still read
+# every update writes a new generation rather than replacing the file, as Windows cannot replace a mapped file
+CATALOGUE_PATTERN = re.compile(r"^mod_cache\.(\d+)\.bin$")
 
 
 
@@ -38,31 +52,142 @@ class ModMetadata(BaseModel):
     author: str
     logo: Optional[str]
     downloads: Optional[int]
+    follows: Optional[int]
+    trendingpoints: Optional[int]
     lastreleased: Optional[str]
     tags: List[str]
     side: str
 
+PERSISTED_FIELDS = tuple(ModMetadata.__fields__) # everything the cache files store per mod
+
 class ModCache(BaseModel):
     mods: List[ModMetadata]
     last_updated: datetime
 
 class ModManager:
     
-    def __init__(self, cfg: Configuration, api: APIClient, file: FileManager):
+    def __init__(self, cfg: Configuration, api: "APIClient", file: FileManager, load_cache: bool = True):
         self.cfg = cfg
         self.api = api
         self.file = file
 
         self.mod_cache = ModCache(mods=[], last_updated=datetime.now())
-        self.load_cache_from_disk()
+        self._mod_index: ModIndex = None
+        self._catalogue: Catalogue = None
+        self._retired_catalogues: List[Catalogue] = [] # replaced by an update, possibly still read by the GUI
+        self._releasing_catalogues: List[Catalogue] = [] # released, but a worker query still reads them
+        self._catalogue_readers: Dict[int, int] = {} # id(catalogue) -> reading_index() blocks using it
+        self._catalogue_lock = threading.RLock() # the index is built and catalogues swapped from worker threads
+        self.mod_info_cache = ModInfoCache(
+            self.file,
+            pathlib.Path(getcwd(), self.cfg.app.downloads_location, "modinfo"),
+            ttl=self.cfg.app.modinfo_cache.ttl,
+            max_entries=self.cfg.app.modinfo_cache.size,
+            model=ModInfo,
+        )
+        if load_cache: # callers that never browse the catalogue (e.g. a headless deploy) can skip loading it
+            self.load_cache_from_disk()
+
+    @property
+    def mod_index(self) -> ModIndex:
+        """ Search indexes over the current mod_cache, rebuilt whenever the cache is replaced. """
+        with self._catalogue_lock: # concurrent first queries build it once
+            mod_index = self._mod_index
+            if mod_index is None or mod_index.mods is not self.mod_cache.mods:
+                mod_index = self._mod_index = ModIndex(self.mod_cache.mods)
+            return mod_index
+
+    @contextmanager
+    def reading_index(self) -> Iterator[ModIndex]:
+        """ The current mod_index for a worker thread. Its catalogue stays mapped until the block ends, even if a
+        cache update replaces it and release_retired_catalogues() is called meanwhile. """
+        with self._catalogue_lock:
+            mod_index = self.mod_index
+            key = id(mod_index.mods)
+            self._catalogue_readers[key] = self._catalogue_readers.get(key, 0) + 1
+        try:
+            yield mod_index
+        finally:
+            with self._catalogue_lock:
+                self._catalogue_readers[key] -= 1
+                if not self._catalogue_readers[key]:
+                    del self._catalogue_readers[key]
+                    self._close_released_catalogues()
+
+    def search_mods(self, text: str = None, **filters) -> List[ModMetadata]:
+        """ Convenience wrapper around ModIndex.query that returns the matching ModMetadata. """
+        mods = self.mod_cache.mods
+        return [mods[row] for row in self.mod_index.query(text, **filters)]
 
-    def update_cache(self):
-        """ Contacts the VS mod db API to update the local cache of available mods."""
-        mods_metadata = [
-            ModMetadata(**metadata) for metadata in self.api.get_mods()
-        ]
-        self.mod_cache = ModCache(mods=mods_metadata, last_updated=datetime.now())
-        self.save_cache_to_disk()
+    def cache_is_stale(self) -> bool:
+        max_age = timedelta(seconds=self.cfg.app.mod_cache.max_age)
+        return not self.mod_cache.mods or datetime.now() - self.mod_cache.last_updated >= max_age
+
+    def update_cache(self, force: bool = False, full: bool = False) -> bool:
+        """ Contacts the VS mod db API to update the local cache of available mods.
+        Skipped while the cache is younger than app.mod_cache.max_age unless force is set. Existing entries are
+        kept as-is unless one of their PERSISTED_FIELDS changed; full=True rebuilds every entry instead.
+        The catalogue is streamed: each mod is parsed and merged as it arrives, so the whole response is never held
+        in memory. Only the binary format keeps memory bounded: each mod goes straight into the new catalogue's
+        compact columns, the catalogue is written to a new generation file, and the cache switches to it in one
+        assignment. A failed write leaves the current catalogue in use. The json format holds every
+        ModMetadata in memory by design; only its file is written incrementally. """
+        if not force and not self.cache_is_stale():
+            return False
+        previous = self.mod_cache.mods
+        known = {} if full else self._rows_by_modid(previous)
+        writer = CatalogueWriter() if self.cfg.app.mod_cache.format == "binary" else None
+        mods_metadata = []
+        added = changed = 0
+        with metrics.span("mod_cache.merge"):
+            for metadata in self.api.iter_mods():
+                row = known.pop(metadata["modid"], None)
+                cached = None if row is None else self._cached_row(previous, row)
+                if cached is not None and self._unchanged(cached, metadata):
+                    mod = cached
+                else:
+                    if cached is None:
+                        added += 1
+                    else:
+                        changed += 1
+                        if cached.lastreleased != metadata.get("lastreleased"):
+                            self.mod_info_cache.invalidate(cached.modid) # a new release makes the detailed info stale
+                    mod = ModMetadata(**metadata)
+                if writer is not None:
+                    writer.add(mod) # interned into compact columns, the model itself is dropped right away
+                else:
+                    mods_metadata.append(mod)
+            removed = len(known)
+            for row in known.values():
+                self.mod_info_cache.invalidate(self._cached_row(previous, row).modid)
+        metrics.count("mod_cache_parsed_total", added + changed)
+        last_updated = datetime.now()
+        if writer is None:
+            # every entry is already a validated ModMetadata, so skip re-validating (and copying) them
+            self.mod_cache = ModCache.construct(mods=mods_metadata, last_updated=last_updated)
+            self.save_cache_to_disk()
+        else:
+            with metrics.span("mod_cache.save", format="binary"):
+                path = self._next_catalogue_path()
+                writer.write(path, last_updated)
+            del writer
+            self._load_catalogue(path) # readers keep the old mapping until the new one is swapped in
+        print(f"Mod cache updated: {added} added, {changed} changed, {removed} removed")
+        return True
+
+    @staticmethod
+    def _unchanged(cached: ModMetadata, metadata: Dict[str, Any]) -> bool:
+        return all(getattr(cached, field) == metadata.get(field) for field in PERSISTED_FIELDS)
+
+    @staticmethod
+    def _rows_by_modid(mods) -> Dict[int, int]:
+        if isinstance(mods, Catalogue):
+            return {modid: row for row, modid in enumerate(mods.column("modid"))}
+        return {mod.modid: row for row, mod in enumerate(mods)}
+
+    @staticmethod
+    def _cached_row(mods, row: int) -> ModMetadata:
+        return mods.peek(row) if isinstance(mods, Catalogue) else mods[row]
 
     def clear_active_mods(self):
         # get path to VS mods folder from config
@@ -92,38 +217,142 @@ class ModManager:
         if mod_version not in release_links.keys(): return False # unknown version
         archive_name = release_links[mod_version].split('/')[-1]
         archive_path = pathlib.Path(getcwd(), self.cfg.app.downloads_location, archive_name)
-        if self.file.exists_locally(archive_path): 
+        if self.file.exists_locally(archive_path) and verify_archive(archive_path):
             return archive_path 
         else: 
             return None
 
-    def get_mod_info(self, mod_id: int) -> ModInfo:
-        """ Retreive the detailed metadata for a mod. """
-        mod_info = ModInfo(**self.api.get_mod_metadata(mod_id))
-        return mod_info
+    def get_mod_info(self, mod_id: int, refresh: bool = False) -> ModInfo:
+        """ Retreive the detailed metadata for a mod, from the ModInfo cache unless it is stale or refresh is set. """
+        if not refresh:
+            mod_info = self.mod_info_cache.get(mod_id)
+            if mod_info is not None:
+                metrics.count("modinfo_cache_total", result="hit")
+                return mod_info
+        metrics.count("modinfo_cache_total", result="refresh" if refresh else "miss")
+        with metrics.span("mod.get_mod_info"):
+            document = self.api.get_mod_metadata(mod_id)
+            with metrics.span("modinfo.parse"):
+                return self.mod_info_cache.put(mod_id, document)
 
     def load_cache_from_disk(self):
         """ Loads the mod definitions metadata from the local mod cache."""
-        cache_filename = "mod_cache.json"
-        mod_cache_path = pathlib.Path(getcwd(), self.cfg.app.downloads_location, cache_filename)
-        if not exists(mod_cache_path) and not isfile(mod_cache_path):
-            # if the mod_cache.json is missing, dont panic, just fetch the latest
-            self.update_cache()
-        else:
-            #todo: fix to load mods as objects then populate cache
-            self.mod_cache = ModCache(
-                **json.loads(
-                    self.file.read(
-                        pathlib.Path(self.cfg.app.downloads_location, cache_filename)
-                    )
-                )
-            )
+        with metrics.span("mod_cache.load", format=self.cfg.app.mod_cache.format):
+            self._load_cache_from_disk()
+
+    def _load_cache_from_disk(self):
+        if self.cfg.app.mod_cache.format == "binary":
+            if self._load_catalogue():
+                return
+            if exists(self._cache_path(JSON_CACHE_FILENAME)):
+                # migrate an existing json cache instead of fetching the whole catalogue again
+                self._load_json_cache()
+                self.save_cache_to_disk()
+                print("Migrated mod_cache.json to the binary catalogue")
+                return
+        elif exists(self._cache_path(JSON_CACHE_FILENAME)):
+            self._load_json_cache()
+            return
+        # if the mod cache is missing, dont panic, just fetch the latest
+        self.update_cache(force=True)
+
+    def _load_json_cache(self):
+        self.mod_cache = ModCache(**json.loads(self.file.read(self._cache_path(JSON_CACHE_FILENAME))))
+        print("Cache loaded successfully!")
+
+    def _load_catalogue(self, path: pathlib.Path = None) -> bool:
+        """ Map path, by default the newest readable catalogue file, and switch the cache to it. """
+        for path in [path] if path else self._catalogue_files():
+            try:
+                catalogue = Catalogue(path, ModMetadata)
+            except (CatalogueFormatError, OSError) as exc:
+                print(f"Ignoring unreadable mod catalogue {path.name}: {exc}")
+                continue
+            with self._catalogue_lock:
+                previous, self._catalogue = self._catalogue, catalogue
+                self.mod_cache = ModCache.construct(mods=catalogue, last_updated=catalogue.last_updated)
+                if previous is not None:
+                    self._retired_catalogues.append(previous)
             print("Cache loaded successfully!")
+            self._delete_stale_catalogues()
+            return True
+        return False
+
+    def _catalogue_files(self) -> List[pathlib.Path]:
+        """ The catalogue generations in the downloads folder, newest first. """
+        folder = self._cache_path(CATALOGUE_FILENAME).parent
+        generations = []
+        if folder.is_dir():
+            for path in folder.iterdir():
+                match = CATALOGUE_PATTERN.match(path.name)
+                if match:
+                    generations.append((int(match.group(1)), path))
+        if (folder / CATALOGUE_FILENAME).is_file():
+            generations.append((0, folder / CATALOGUE_FILENAME))
+        return [path for _, path in sorted(generations, reverse=True)]
+
+    def _next_catalogue_path(self) -> pathlib.Path:
+        files = self._catalogue_files()
+        match = CATALOGUE_PATTERN.match(files[0].name) if files else None
+        return self._cache_path(f"mod_cache.{int(match.group(1)) + 1 if match else 1}.bin")
+
+    def _delete_stale_catalogues(self):
+        """ Delete catalogue files older than the newest that this process no longer maps. A file another process
+        still maps cannot be deleted on Windows; it is left for a later run. """
+        with self._catalogue_lock:
+            mapped = [self._catalogue, *self._retired_catalogues, *self._releasing_catalogues]
+        mapped = {catalogue.path for catalogue in mapped if catalogue is not None}
+        for path in self._catalogue_files()[1:]:
+            if path not in mapped:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def _retire_catalogue(self):
+        """ Set the previous catalogue aside once the cache no longer reads from it. Views built on it (a table
+        page, an in-flight query) may still index into it, so it stays mapped until release_retired_catalogues(). """
+        with self._catalogue_lock:
+            if self._catalogue is not None and self._catalogue is not self.mod_cache.mods:
+                self._retired_catalogues.append(self._catalogue)
+                self._catalogue = None
+
+    def release_retired_catalogues(self):
+        """ Unmap the catalogues replaced by cache updates. Call once the caller's own views (e.g. a table page)
+        no longer index into them; catalogues a reading_index() block still uses are unmapped when it ends. Rows
+        already materialized from them stay usable. """
+        with self._catalogue_lock:
+            self._releasing_catalogues.extend(self._retired_catalogues)
+            self._retired_catalogues = []
+            self._close_released_catalogues()
+
+    def _close_released_catalogues(self):
+        with self._catalogue_lock:
+            still_read, unread = [], []
+            for catalogue in self._releasing_catalogues:
+                (still_read if id(catalogue) in self._catalogue_readers else unread).append(catalogue)
+            if not unread:
+                return
+            self._releasing_catalogues = still_read
+            for catalogue in unread:
+                catalogue.close()
+        self._delete_stale_catalogues()
 
     def save_cache_to_disk(self):
-        """ Write the mod definitions to disk as json so we dont have to contact the server as often."""
-        cache_filename = "mod_cache.json"
-        self.file.write(
-            pathlib.Path(getcwd(), self.cfg.app.downloads_location, cache_filename),
-            self.mod_cache.json()
-        )
+        """ Write the mod definitions to disk so we dont have to contact the server as often."""
+        with metrics.span("mod_cache.save", format=self.cfg.app.mod_cache.format):
+            if self.cfg.app.mod_cache.format == "binary":
+                self._retire_catalogue()
+                write_catalogue(self._next_catalogue_path(), self.mod_cache.mods, self.mod_cache.last_updated)
+                return
+            self.file.write_atomic(self._cache_path(JSON_CACHE_FILENAME), self._json_cache_chunks())
+
+    def _json_cache_chunks(self) -> Iterator[str]:
+        """ mod_cache.json one mod at a time, rather than one string of the whole catalogue. """
+        yield '{"mods": ['
+        for position, mod in enumerate(self.mod_cache.mods):
+            yield (", " if position else "") + mod.json()
+        yield f'], "last_updated": {json.dumps(self.mod_cache.last_updated.isoformat())}}}'
+
+    def _cache_path(self, filename: str) -> pathlib.Path:
+        return pathlib.Path(getcwd(), self.cfg.app.downloads_location, filename)
@@ -0,0 +1,89 @@
+"""
+Two tier (memory LRU + on-disk) cache of the detailed ModInfo documents served by /api/mod/{id}.
+"""
+from collections import OrderedDict
+import json
+import pathlib
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from .file import FileManager
+
+
+class ModInfoCache:
+    """ Entries older than ttl seconds are refetched; a ttl of 0 keeps them until invalidated. """
+
+    def __init__(self, file: FileManager, cache_dir: pathlib.Path, ttl: float, max_entries: int, model: Callable):
+        self.file = file
+        self.cache_dir = pathlib.Path(cache_dir)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.model = model # the pydantic model the cached documents are parsed into
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict() # modid -> (fetched_at, model instance)
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, modid: int):
+        """ Return the cached entry for modid, or None if it is missing or older than the ttl. """
+        with self._lock:
+            entry = self._entries.get(modid)
+            if entry is not None and self._is_fresh(entry[0]):
+                self._entries.move_to_end(modid)
+                self.hits += 1
+                return entry[1]
+            entry = self._load_from_disk(modid)
+            if entry is not None and self._is_fresh(entry[0]):
+                self._remember(modid, entry)
+                self.disk_hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, modid: int, document: Dict):
+        """ Store the raw api document for modid in both tiers and return it parsed. """
+        fetched_at = time.time()
+        value = self.model(**document)
+        with self._lock:
+            self._remember(modid, (fetched_at, value))
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self.file.write(self._disk_path(modid), json.dumps({"fetched_at": fetched_at, "document": document}))
+        return value
+
+    def invalidate(self, modid: int):
+        with self._lock:
+            self._entries.pop(modid, None)
+            self.file.delete(self._disk_path(modid))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for path in self.cache_dir.glob("*.json"):
+                self.file.delete(path)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def _is_fresh(self, fetched_at: float) -> bool:
+        return self.ttl <= 0 or time.time() - fetched_at < self.ttl
+
+    def _remember(self, modid: int, entry: tuple):
+        self._entries[modid] = entry
+        self._entries.move_to_end(modid)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load_from_disk(self, modid: int) -> Optional[tuple]:
+        contents = self.file.read(self._disk_path(modid))
+        if contents is None:
+            return None
+        try:
+            stored = json.loads(contents)
+            return stored["fetched_at"], self.model(**stored["document"])
+        except (ValueError, KeyError, TypeError):
+            return None # unreadable entries are refetched
+
+    def _disk_path(self, modid: int) -> pathlib.Path:
+        return self.cache_dir / f"{modid}.json"
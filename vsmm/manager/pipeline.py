@@ -0,0 +1,98 @@
+"""
+Two stage (fetch -> install) deploy pipeline. Each stage has its own bounded worker pool, and a mod is installed
+as soon as its archive is available instead of waiting for every download to finish.
+"""
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+import time
+from typing import Callable, Dict, List, Optional
+
+
+@dataclass
+class DeployJob:
+    name: str # archive name in the mods folder
+    modid: int
+    version: str
+    source: Optional[Path] = None # local archive, None if it still has to be fetched
+
+
+@dataclass
+class DeployProgress:
+    total: int
+    downloaded: int = 0
+    installed: int = 0
+    failed: int = 0
+    bytes_downloaded: int = 0
+    bytes_installed: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    failures: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def done(self) -> int:
+        return self.installed + self.failed
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def eta(self) -> Optional[float]:
+        """ Seconds left, extrapolated from the average time per finished mod. """
+        if self.done == 0:
+            return None
+        return self.elapsed / self.done * (self.total - self.done)
+
+
+class DeployPipeline:
+    """ fetch(job) returns the local archive for a job; install(job, path) places it and returns how it was placed.
+    done_signal is emitted for each installed job, e.g. "mod_staged" when install only stages the archive.
+    Signals are emitted from the thread calling run(), never from the worker threads. """
+
+    def __init__(self, fetch: Callable, install: Callable, emit: Callable, download_workers: int, install_workers: int,
+                 done_signal: str = "mod_deployed"):
+        self.fetch = fetch
+        self.install = install
+        self.emit = emit
+        self.download_workers = download_workers
+        self.install_workers = install_workers
+        self.done_signal = done_signal
+
+    def run(self, jobs: List[DeployJob]) -> DeployProgress:
+        progress = DeployProgress(total=len(jobs))
+        if not jobs:
+            return progress
+        with ThreadPoolExecutor(self.download_workers, thread_name_prefix="vsmm-fetch") as fetchers, \
+                ThreadPoolExecutor(self.install_workers, thread_name_prefix="vsmm-install") as installers:
+            pending: Dict[Future, tuple] = {}
+            for job in jobs:
+                if job.source is not None:
+                    pending[installers.submit(self.install, job, job.source)] = ("install", job, job.source)
+                else:
+                    pending[fetchers.submit(self.fetch, job)] = ("fetch", job, None)
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage, job, path = pending.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        self._failed(progress, job, stage, error)
+                    elif stage == "fetch":
+                        path = future.result()
+                        size = path.stat().st_size
+                        progress.downloaded += 1
+                        progress.bytes_downloaded += size
+                        self.emit("mod_downloaded", name=job.name, modid=job.modid, version=job.version, path=path, bytes=size)
+                        pending[installers.submit(self.install, job, path)] = ("install", job, path)
+                    else:
+                        size = path.stat().st_size
+                        progress.installed += 1
+                        progress.bytes_installed += size
+                        self.emit(self.done_signal, name=job.name, modid=job.modid, version=job.version, method=future.result(), bytes=size)
+                    self.emit("deploy_progress", progress=progress)
+        return progress
+
+    def _failed(self, progress: DeployProgress, job: DeployJob, stage: str, error: BaseException):
+        progress.failed += 1
+        progress.failures[job.name] = f"{stage}: {type(error).__name__}: {error}"
+        self.emit("mod_failed", name=job.name, modid=job.modid, version=job.version, stage=stage, error=error)
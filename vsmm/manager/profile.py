@@ -3,20 +3,30 @@ Responsible for:
     Deploying a profile to the game (moving mods)
     Filehandling operations (downloading, deleting mod archives) 
 """
-import json
-import os
-from os import getcwd, listdir
+from concurrent.futures import ThreadPoolExecutor
+from os import getcwd
 from pathlib import Path
+from .archive_index import ArchiveIndex, ArchiveInfo
+from .deploy import DeployPlan, plan_deployment
 from .file import FileManager
 from .mod import ModManager
-from api.client import APIClient
-from pydantic import BaseModel
+from .pipeline import DeployJob, DeployPipeline
+from .profile_store import ProfileStore
+from .scanner import Drift, FolderSnapshot
+from .store import ArchiveStore
+from .updates import UpdateChecker, UpdateReport
+from api.manifest import verify_archive
+from instrumentation import metrics
+from signalling.observer import Observable
+from pydantic import BaseModel, validator
 from datetime import datetime
-from typing import List
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
 from config.configuration import Configuration
-from os.path import pathsep
 
+if TYPE_CHECKING:
+    from api.client import APIClient
 
+DEPLOY_SIGNALS = ["mod_downloaded", "mod_staged", "mod_deployed", "mod_failed", "deploy_progress"]
 
 
 
@@ -27,6 +37,12 @@ class ProfileModEntry(BaseModel):
     version: str
     archive_path: Path
     archive_name: str
+    archive_hash: Optional[str] = None # sha256 of the archive in the ArchiveStore
+
+    @validator("archive_name")
+    def _file_name_only(cls, archive_name: str) -> str:
+        # older profiles stored the whole path here
+        return Path(archive_name).name
 
 
 class Profile(BaseModel):
@@ -37,29 +53,61 @@ class Profile(BaseModel):
     active: bool = False
 
 
-class ProfileManager:
+class ProfileManager(Observable):
 
-    def __init__(self, cfg: Configuration, api: APIClient, mod: ModManager, file: FileManager):
+    def __init__(self, cfg: Configuration, api: "APIClient", mod: ModManager, file: FileManager):
+        super().__init__(DEPLOY_SIGNALS)
         self.cfg = cfg
         self.api = api
         self.mod = mod
         self.file = file
 
-        self.profiles: List[Profile] = []
+        self.store = ArchiveStore(self.file, Path(getcwd(), self.cfg.app.downloads_location, "store"))
+        self.mods_snapshot = FolderSnapshot(
+            self.file,
+            self.mods_folder(),
+            Path(getcwd(), self.cfg.app.downloads_location, "mods_snapshot.json"),
+            watch=self.cfg.app.mods_folder.watch,
+        )
+        self.archives = ArchiveIndex(self.file, Path(getcwd(), self.cfg.app.downloads_location, "archive_index.json"))
+        self.updates = UpdateChecker(
+            self.mod,
+            self.api,
+            workers=self.cfg.app.updates.workers,
+            include_prereleases=self.cfg.app.updates.prereleases,
+            store=self.store,
+        )
+        self.profile_store = ProfileStore(
+            self.file,
+            Path(getcwd(), self.cfg.app.profiles_location),
+            model=Profile,
+            flush_delay=self.cfg.app.profiles.flush_delay,
+        )
         self.load_profiles_from_disk()
+        with self.store.batch():
+            for profile in self.profiles:
+                self._update_store_refs(profile)
+
+    @property
+    def profiles(self) -> List[Profile]:
+        return list(self.profile_store)
+
+    def transaction(self):
+        """ Batch several profile edits into one write per profile: `with profile_manager.transaction(): ...` """
+        return self.profile_store.transaction()
+
+    def flush(self) -> int:
+        """ Write pending profile changes to disk now. """
+        return self.profile_store.flush()
 
     def create_profile(self, name: str, desc: str, mods: List[int]) -> bool:
-        profile_path = f"{self.config.app.profiles_location}{pathsep}{name}.json"
-        if self.file.exists_locally(profile_path):
+        if name in self.profile_store:
             return False #profile already exists
-        new_profile = Profile(name, desc, [], datetime.now())
-        self.file.write(profile_path, new_profile.json())
+        self.profile_store.add(Profile(name=name, desc=desc, mods=[], last_update=datetime.now()))
         return True
 
     def get_profile(self, profile_name: str) -> Profile:
-        for profile in self.profiles:
-            if profile.name == profile_name: return profile
-        return None
+        return self.profile_store.get(profile_name)
 
     def get_active_profile(self) -> Profile:
         for profile in self.profiles:
@@ -67,48 +115,229 @@ class ProfileManager:
         return None
 
     def delete_profile(self, profile_name: str) -> bool:
-        profile_path = Path(getcwd(), self.config.app.profiles_location, f"{profile_name}.json")
-        if not self.file.exists_locally(profile_path):
+        if not self.profile_store.remove(profile_name):
             return False
-        self.file.delete(profile_path)
+        self.store.drop_profile(profile_name)
         return True
 
-    def deploy_profile(self, profile_name: str) -> bool:
-        currently_deployed_profile = self.get_active_profile()
-        if currently_deployed_profile is not None:
-            self.undeploy_profile(currently_deployed_profile.name)
+    def mods_folder(self) -> Path:
+        return Path(getcwd(), self.cfg.game.folder_path, "mods")
+
+    def plan_deploy(self, profile_name: str) -> DeployPlan:
+        """ Work out which archives in the mods folder to keep, remove and add to deploy a profile. """
+        wanted = self.archive_sources(profile_name)
+        self.mods_snapshot.refresh()
+        plan = plan_deployment(profile_name, self.mods_folder(), wanted, self.managed_archives(), present=self.mods_snapshot.entries)
+        for name in [name for name in plan.keep if self.mods_snapshot.is_modified(name)]:
+            plan.keep.remove(name) # changed by hand since it was deployed, put the profile's copy back
+            plan.remove.append(name)
+            plan.add[name] = wanted[name]
+        return plan
+
+    def drift(self, profile_name: str = None) -> Drift:
+        """ How the mods folder differs from what a profile (the active one by default) deployed. """
+        profile = self.get_profile(profile_name) if profile_name else self.get_active_profile()
+        if profile is None:
+            return Drift(profile_name=profile_name, unmanaged=sorted(self.mods_snapshot.entries))
+        drift = self.mods_snapshot.drift(profile.name, [self._archive_name(mod) for mod in profile.mods], self.managed_archives())
+        self.mods_snapshot.save()
+        return drift
+
+    def archive_sources(self, profile_name: str) -> Dict[str, Optional[Path]]:
+        """ Archive name -> the local copy a deploy of the profile would place (its blob when it is in the store),
+        or None where it would have to be downloaded first. """
+        return {self._archive_name(mod): self._archive_source(mod) for mod in self.get_profile(profile_name).mods}
+
+    def managed_archives(self) -> Set[str]:
+        """ Archive names of every profile, i.e. the files vsmm may remove from a mods folder. """
+        return {self._archive_name(mod) for profile in self.profiles for mod in profile.mods}
+
+    def deploy_profile(self, profile_name: str, dry_run: bool = False) -> bool:
+        """ Deploy a profile by applying only the difference between it and the mods folder. Every archive to add
+        is fetched and staged in the ArchiveStore before the folder is touched, so a failed download leaves the
+        folder as it was. With dry_run the plan is printed and nothing is touched. """
         deploying_profile = self.get_profile(profile_name)
-        for mod in deploying_profile.mods:
-            mod_archive_path = self.mod.mod_archive_local_path(mod.id, mod.version)
-            if mod_archive_path is None:
-                mod_archive_path = self.mod.download_mod_version(mod.id, mod.version)
-                #todo: signal that mod is downloaded.
-            self.file.copy(
-                mod_archive_path, 
-                Path(self.cfg.game.folder_path, "mods")
-            )
-            #todo: signal mod is deployed.
-        deploying_profile.active = True
-        self.save(deploying_profile)
-        print(f"Deployed profile {profile_name} with {len(deploying_profile.mods)} mods")
+        with metrics.span("deploy.plan"):
+            plan = self.plan_deploy(profile_name)
+        if dry_run:
+            print(plan.describe())
+            return True
+        entries = {self._archive_name(mod): mod for mod in deploying_profile.mods}
+        staged: Dict[str, Path] = {} # archive name -> blob to place in the mods folder
+
+        def stage(job: DeployJob, archive_path: Path) -> str:
+            mod = entries[job.name]
+            with metrics.span("deploy.stage"):
+                if not self.store.has(mod.archive_hash):
+                    with metrics.span("store.ingest"):
+                        mod.archive_hash = self.store.ingest(archive_path)
+                staged[job.name] = self.store.blob_path(mod.archive_hash)
+            return "staged"
+
+        pipeline = DeployPipeline(
+            fetch=self._fetch_archive,
+            install=stage,
+            emit=self.emit_signal,
+            download_workers=self.cfg.app.deploy.download_workers,
+            install_workers=self.cfg.app.deploy.install_workers,
+            done_signal="mod_staged",
+        )
+        with metrics.span("deploy.pipeline"), self.store.batch():
+            progress = pipeline.run([
+                DeployJob(name=name, modid=entries[name].id, version=entries[name].version, source=source)
+                for name, source in plan.add.items()
+            ])
+            self._backfill_hashes(deploying_profile)
+            self._update_store_refs(deploying_profile)
+        if progress.failed:
+            self.save(deploying_profile)
+            print(f"Deploying profile {profile_name} failed for {progress.failed} mods, the mods folder was left unchanged: {progress.failures}")
+            return False
+
+        with metrics.span("deploy.remove"):
+            for archive_name in plan.remove:
+                self.file.delete(plan.mods_folder / archive_name)
+                self.mods_snapshot.forget(archive_name)
+        metrics.count("deploy_files_total", len(plan.remove), action="removed")
+        metrics.count("deploy_files_total", len(plan.keep), action="kept")
+        plan.mods_folder.mkdir(parents=True, exist_ok=True)
+
+        def install(name: str) -> str:
+            with metrics.span("deploy.install"):
+                method = self.file.link_or_copy(staged[name], plan.mods_folder / name)
+                self.mods_snapshot.record_deployed(name)
+            metrics.count("deploy_files_total", action=method)
+            return method
+
+        # linking is cheap, only the copy fallback makes the workers worth it
+        with ThreadPoolExecutor(self.cfg.app.deploy.install_workers, thread_name_prefix="vsmm-install") as pool:
+            futures = {name: pool.submit(install, name) for name in staged}
+        failures = {}
+        for name, future in futures.items():
+            mod = entries[name]
+            if future.exception() is not None:
+                failures[name] = f"install: {type(future.exception()).__name__}: {future.exception()}"
+                self.emit_signal("mod_failed", name=name, modid=mod.id, version=mod.version, stage="install", error=future.exception())
+            else:
+                self.emit_signal("mod_deployed", name=name, modid=mod.id, version=mod.version, method=future.result(),
+                                 bytes=staged[name].stat().st_size)
+        for name in plan.keep:
+            if name not in self.mods_snapshot.deployed:
+                self.mods_snapshot.record_deployed(name) # deployed before snapshots existed
+        self.mods_snapshot.save()
+        if failures:
+            self.save(deploying_profile)
+            print(f"Deploying profile {profile_name} failed for {len(failures)} mods: {failures}")
+            return False
+        with self.transaction(): # switching the active profile is a single write
+            currently_deployed_profile = self.get_active_profile()
+            if currently_deployed_profile is not None and currently_deployed_profile is not deploying_profile:
+                currently_deployed_profile.active = False
+                self.save(currently_deployed_profile)
+            deploying_profile.active = True
+            self.save(deploying_profile)
+        print(f"Deployed profile {profile_name}: {len(plan.keep)} kept, {len(plan.remove)} removed, {len(plan.add)} added in {progress.elapsed:.1f}s")
         return True
+
+    def stage_archives(self, profile_name: str) -> Tuple[Dict[str, Path], Dict[str, str]]:
+        """ Make sure every archive of a profile is in the ArchiveStore, downloading each missing one once.
+        Returns archive name -> blob path, and archive name -> error for the ones that could not be staged. """
+        profile = self.get_profile(profile_name)
+        blobs: Dict[str, Path] = {}
+        failures: Dict[str, str] = {}
+
+        def stage(mod: ProfileModEntry) -> Path:
+            if not self.store.has(mod.archive_hash):
+                source = self._archive_source(mod) or self._fetch_archive(DeployJob(self._archive_name(mod), mod.id, mod.version))
+                mod.archive_hash = self.store.ingest(source)
+            return self.store.blob_path(mod.archive_hash)
+
+        with self.store.batch(), ThreadPoolExecutor(self.cfg.app.deploy.download_workers, thread_name_prefix="vsmm-stage") as pool:
+            futures = {self._archive_name(mod): pool.submit(stage, mod) for mod in profile.mods}
+            for name, future in futures.items():
+                try:
+                    blobs[name] = future.result()
+                except Exception as exc:
+                    failures[name] = f"{type(exc).__name__}: {exc}"
+            self._update_store_refs(profile)
+        self.save(profile)
+        return blobs, failures
+
+    def _fetch_archive(self, job: DeployJob) -> Path:
+        """ Pipeline fetch stage: find the archive in the downloads folder or download it. """
+        with metrics.span("deploy.fetch"):
+            archive_path = self.mod.mod_archive_local_path(job.modid, job.version)
+            if not archive_path:
+                archive_path = self.mod.download_mod_version(job.modid, job.version)
+            return Path(archive_path)
     
     def undeploy_profile(self, profile_name: str) -> bool:
+        """ Remove a profile's archives from the mods folder. Archives that are already gone (removed by hand) are
+        skipped, files that are not the profile's are left alone. """
         undeploy_profile = self.get_profile(profile_name)
         if not undeploy_profile.active: return True
-        for mod in undeploy_profile.mods:
-            deployed_archive_path = Path(getcwd(), self.cfg.game.folder_path, "mods", mod.archive_name)
-            if self.file.delete(deployed_archive_path): 
-                continue 
-            else: return False #failed to remove for some reason (todo: raise exc here)
+        missing = []
+        with metrics.span("deploy.undeploy"):
+            self.mods_snapshot.refresh()
+            for mod in undeploy_profile.mods:
+                archive_name = self._archive_name(mod)
+                if archive_name not in self.mods_snapshot.entries:
+                    missing.append(archive_name)
+                    continue
+                self.file.delete(self.mods_folder() / archive_name)
+                self.mods_snapshot.forget(archive_name)
+            self.mods_snapshot.save()
+        metrics.count("deploy_files_total", len(undeploy_profile.mods) - len(missing), action="removed")
+        if missing:
+            print(f"Already missing from the mods folder: {', '.join(missing)}")
+        undeploy_profile.active = False
         self.save(undeploy_profile)
         return True
 
-    def check_for_updates(profile_id=None):
-        # get active profile
-        # updateable = mod_manager.check_for_updates(profile.mods)
-        # return updateable
-        pass
+    def inspect_archives(self, folder: Path = None) -> Dict[str, ArchiveInfo]:
+        """ What each archive in a folder (the game mods folder by default) contains, keyed by file name. Only
+        archives added or changed since the last call are opened. """
+        return self.archives.scan(folder or self.mods_folder())
+
+    def _archive_name(self, mod: ProfileModEntry) -> str:
+        return Path(mod.archive_path).name
+
+    def _archive_source(self, mod: ProfileModEntry) -> Optional[Path]:
+        """ The local copy of a profile entry's archive to deploy from, or None if it has to be downloaded. """
+        if self.store.has(mod.archive_hash):
+            return self.store.blob_path(mod.archive_hash)
+        return Path(mod.archive_path) if verify_archive(mod.archive_path) else None
+
+    def _backfill_hashes(self, profile: Profile) -> bool:
+        """ Move archives of entries created before the ArchiveStore existed into it. """
+        changed = False
+        for mod in profile.mods:
+            if not self.store.has(mod.archive_hash) and verify_archive(mod.archive_path):
+                mod.archive_hash = self.store.ingest(mod.archive_path)
+                changed = True
+        return changed
+
+    def _update_store_refs(self, profile: Profile):
+        self.store.set_profile_refs(profile.name, [mod.archive_hash for mod in profile.mods])
+
+    def collect_garbage(self, dry_run: bool = False) -> Dict[str, int]:
+        """ Remove archives from the store that no profile references any more. """
+        with self.transaction(), self.store.batch():
+            for profile in self.profiles:
+                if not dry_run and self._backfill_hashes(profile):
+                    self.save(profile)
+                self._update_store_refs(profile)
+        return self.store.gc(dry_run=dry_run)
+
+    def check_for_updates(self, profile_names: List[str] = None, prefetch: bool = False) -> UpdateReport:
+        """ Check the given profiles (all of them by default) for newer mod releases. Each mod is looked up once,
+        however many profiles use it. With prefetch the new archives are downloaded in the background. """
+        profiles = self.profiles if profile_names is None else [self.get_profile(name) for name in profile_names]
+        return self.updates.check(
+            [profile for profile in profiles if profile is not None],
+            prefetch=prefetch,
+            save_dir=Path(getcwd(), self.cfg.app.downloads_location),
+        )
 
     def add_mod_to_profile(self, profile_name: str, mod_id: int, mod_version: str):
         """ Downloads a mod archive and adds an entry to this profile with the path so it can be applied to the game. """
@@ -117,13 +346,20 @@ class ProfileManager:
         if not archive_path:
             archive_path = self.mod.download_mod_version(mod_id, mod_version)
         mod_info = self.mod.get_mod_info(mod_id)
+        contents = self.archives.lookup(archive_path)
+        if not contents.ok:
+            print(f"Warning: could not read the modinfo.json of {archive_path}: {contents.error}")
+        elif contents.version and contents.version != mod_version:
+            print(f"Warning: {archive_path} contains {contents.modid} {contents.version}, not {mod_version}")
+        self.archives.save()
         new_mod_entry = ProfileModEntry(
             id=mod_id,
             name=mod_info.name,
             tags=mod_info.tags,
             version=mod_version,
             archive_path=archive_path,
-            archive_name=str(archive_path).split(os.pathsep)[-1]
+            archive_name=Path(archive_path).name,
+            archive_hash=self.store.ingest(archive_path),
         )
         # todo: check mod already in profile, raise err if true
         for mod in profile.mods:
@@ -133,6 +369,7 @@ class ProfileManager:
                 print("Mod already exists in profile!")
                 return
         profile.mods.append(new_mod_entry)
+        self._update_store_refs(profile)
         self.save(profile)
 
     def remove_mod_from_profile(self, profile_name: str, mod_id: int, mod_version: str):
@@ -142,32 +379,21 @@ class ProfileManager:
             if mod_id == mod.id and mod_version == mod.version:
                 print("Mod removed from profile")
                 selected_profile.mods.pop(index)
+                self._update_store_refs(selected_profile)
                 self.save(selected_profile)
 
     def load_profiles_from_disk(self):
         """ Load the profiles from disk. """
-        profile_folder = Path(getcwd(), self.cfg.app.profiles_location)
-        json_files = [ f for f in listdir(profile_folder) if f.endswith("json") ]
-        if len(json_files) == 0:
+        if self.profile_store.load() == 0:
             # create a default empty profile if none exists in the directory
-            default_profile = Profile(name="Default", desc="The default profile", mods=[], last_update=datetime.now(), active=True)
-            self.profiles.append(default_profile)
-            self.save(default_profile)
-            return
-        for json_file in json_files:
-            json_file_path = Path(getcwd(), self.cfg.app.profiles_location, json_file)
-            file_contents = self.file.read(json_file_path).decode('ascii')
-            print(file_contents)
-            profile = Profile(**json.loads(file_contents))
-            self.profiles.append(profile)
-
-    def save(self, profile: Profile) -> Path:
-        """ Write a profile to disk in the profile directory using its name as the filename. """
-        json_file_path =Path(getcwd(), self.cfg.app.profiles_location, f"{profile.name}.json")
-        self.file.write(json_file_path, profile.json())
+            self.profile_store.add(Profile(name="Default", desc="The default profile", mods=[], last_update=datetime.now(), active=True))
+
+    def save(self, profile: Profile):
+        """ Queue a profile to be written to the profile directory, using its name as the filename. """
+        self.profile_store.mark_dirty(profile)
 
     def save_all(self):
         """ Save all profiles to disk. """
-        for profile in self.profiles:
-            json_file_path =Path(getcwd(), self.cfg.app.profiles_location, f"{profile}.json")
-            self.file.write(json_file_path, profile.json())
+        with self.transaction():
+            for profile in self.profiles:
+                self.save(profile)
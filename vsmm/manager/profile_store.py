@@ -0,0 +1,200 @@
+"""
+Profile repository: every profile indexed by name in memory, persisted one JSON file per profile.
+
+Mutations only mark a profile dirty. Dirty profiles are written together by flush(), which runs when the
+outermost transaction() ends, otherwise flush_delay seconds after the first unwritten change, and at interpreter
+exit. Each file is replaced atomically, so a crash mid-write leaves the previous version intact.
+"""
+import atexit
+from contextlib import contextmanager
+from pathlib import Path
+import threading
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Set
+import weakref
+
+from .file import FileManager
+
+if TYPE_CHECKING:
+    from .profile import Profile
+
+_open_stores: "weakref.WeakSet[ProfileStore]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_open_stores():
+    """ One exit hook for every store still alive, rather than one per instance keeping each store alive. """
+    for store in list(_open_stores):
+        store.flush()
+
+
+class ProfileStore:
+
+    def __init__(self, file: FileManager, folder: Path, model, flush_delay: float = 0.0):
+        self.file = file
+        self.folder = Path(folder)
+        self.model = model
+        self.flush_delay = flush_delay
+        self.writes = 0
+        self.load_errors: Dict[str, str] = {} # file name -> why it was skipped
+        self._profiles: Dict[str, "Profile"] = {}
+        self._dirty: Set[str] = set()
+        self._deleted: Dict[str, "Profile"] = {} # name -> the removed profile, kept so a rollback can restore it
+        self._depth = 0
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.RLock() # guards the profiles and the dirty/deleted sets
+        self._write_lock = threading.Lock() # keeps flushes in order, so an older snapshot never lands last
+        _open_stores.add(self)
+
+    def load(self) -> int:
+        """ Read every profile in the folder in one pass. Unreadable files are skipped and listed in load_errors. """
+        self.folder.mkdir(parents=True, exist_ok=True)
+        profiles: Dict[str, "Profile"] = {}
+        self.load_errors = {}
+        for path in sorted(self.folder.glob("*.json")):
+            try:
+                profile = self.model.parse_raw(path.read_bytes())
+            except (OSError, ValueError) as exc:
+                self.load_errors[path.name] = str(exc)
+                continue
+            profiles[profile.name] = profile
+        with self._lock:
+            self._profiles = profiles
+            self._dirty.clear()
+            self._deleted.clear()
+        if self.load_errors:
+            print(f"Skipped {len(self.load_errors)} unreadable profiles: {', '.join(self.load_errors)}")
+        return len(profiles)
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._profiles
+
+    def __iter__(self) -> Iterator["Profile"]:
+        return iter(list(self._profiles.values()))
+
+    def get(self, name: str) -> Optional["Profile"]:
+        return self._profiles.get(name)
+
+    def names(self) -> List[str]:
+        return list(self._profiles)
+
+    def add(self, profile: "Profile"):
+        with self._lock:
+            self._profiles[profile.name] = profile
+            self._deleted.pop(profile.name, None)
+        self.mark_dirty(profile)
+
+    def remove(self, name: str) -> bool:
+        with self._lock:
+            profile = self._profiles.pop(name, None)
+            if profile is None:
+                return False
+            self._dirty.discard(name)
+            self._deleted[name] = profile
+        self._changed()
+        return True
+
+    def mark_dirty(self, profile: "Profile"):
+        """ Record that a profile changed. It is written by the next flush, not immediately. """
+        with self._lock:
+            self._profiles.setdefault(profile.name, profile)
+            self._dirty.add(profile.name)
+        self._changed()
+
+    @property
+    def pending(self) -> int:
+        return len(self._dirty) + len(self._deleted)
+
+    @contextmanager
+    def transaction(self):
+        """ Group mutations into one write per touched profile. Nested transactions join the outermost one. If
+        it raises, the touched profiles are reloaded from disk instead of written. """
+        with self._lock:
+            self._depth += 1
+            flush_first = self._depth == 1 and self.pending
+        if flush_first:
+            self.flush() # a rollback must only undo this transaction's changes
+        try:
+            yield self
+        except BaseException:
+            with self._lock:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._rollback()
+            raise
+        with self._lock:
+            self._depth -= 1
+            outermost = self._depth == 0
+        if outermost:
+            self.flush()
+
+    def flush(self) -> int:
+        """ Write every dirty profile and delete removed ones. Returns how many files were touched.
+        The profiles are serialized under the lock, the files are written after releasing it. Never call this
+        while holding _lock: the locks are always taken in the order _write_lock, then _lock. """
+        with self._write_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                deleted = dict(self._deleted)
+                documents = {name: self._profiles[name].json() for name in self._dirty if name in self._profiles}
+                self._dirty.clear()
+                self._deleted.clear()
+            touched = 0
+            try:
+                for name in list(deleted):
+                    touched += self.file.delete(self._path(name))
+                    del deleted[name]
+                for name, document in list(documents.items()):
+                    self.file.write_atomic(self._path(name), document)
+                    touched += 1
+                    del documents[name]
+            finally:
+                with self._lock: # whatever was not written is retried by the next flush
+                    self.writes += touched
+                    self._dirty.update(name for name in documents if name in self._profiles)
+                    for name, profile in deleted.items():
+                        if name not in self._profiles:
+                            self._deleted.setdefault(name, profile)
+            return touched
+
+    def _flush_later(self):
+        """ The flush_delay timer. A transaction in progress flushes when it ends, and may be mid-edit now. """
+        with self._lock:
+            self._timer = None
+            if self._depth:
+                return
+        self.flush()
+
+    def _changed(self):
+        with self._lock:
+            if self._depth:
+                return # the transaction flushes when it ends
+            flush_now = self.flush_delay <= 0
+            if not flush_now and self._timer is None:
+                self._timer = threading.Timer(self.flush_delay, self._flush_later)
+                self._timer.daemon = True
+                self._timer.start()
+        if flush_now:
+            self.flush()
+
+    def _rollback(self):
+        """ Restore the touched profiles from disk in place, so objects callers still hold see the old state. """
+        for name in self._dirty | set(self._deleted):
+            try:
+                saved = self.model.parse_raw(self._path(name).read_bytes())
+            except (OSError, ValueError):
+                self._profiles.pop(name, None) # never written, so it never existed
+                continue
+            profile = self._profiles.get(name) or self._deleted.get(name)
+            for field in saved.__fields__:
+                setattr(profile, field, getattr(saved, field))
+            self._profiles[name] = profile
+        self._dirty.clear()
+        self._deleted.clear()
+
+    def _path(self, name: str) -> Path:
+        return self.folder / f"{name}.json"
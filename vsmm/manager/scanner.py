@@ -0,0 +1,305 @@
+"""
+Stat snapshot of the game's mods folder, for seeing what is really deployed without re-listing it every time.
+
+The snapshot keeps (size, mtime, inode) per archive and is persisted between runs; an archive counts as changed
+when its size or mtime moved. refresh() only re-lists the
+folder when its own mtime moved; otherwise it just re-stats the known archives. On Linux an inotify watch (via
+ctypes, no extra dependency) narrows that further to the names the kernel reported as changed.
+"""
+import ctypes
+import ctypes.util
+from dataclasses import dataclass, field
+import errno
+import json
+import os
+from pathlib import Path
+from stat import S_ISREG
+import struct
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from .file import FileManager
+
+SNAPSHOT_VERSION = 1
+RACY_WINDOW_NS = 2_000_000_000 # directory mtimes this close to a listing may hide a same-tick change
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct("iIII") # wd, mask, cookie, len
+
+
+@dataclass(frozen=True)
+class FileStat:
+    """ Equality (the modified check) compares size and mtime only: os.scandir() on Windows reports inode and dev
+    as 0, while os.stat() reports the real values. """
+    size: int
+    mtime_ns: int
+    inode: int = field(compare=False)
+    dev: int = field(compare=False)
+
+    @classmethod
+    def of(cls, stat: os.stat_result) -> "FileStat":
+        return cls(stat.st_size, stat.st_mtime_ns, stat.st_ino, stat.st_dev)
+
+    def same_file(self, other: "FileStat") -> bool:
+        """ Whether both are the same file (e.g. hardlinks). False when either side does not know its inode. """
+        return bool(self.inode and other.inode) and (self.inode, self.dev) == (other.inode, other.dev)
+
+
+@dataclass
+class SnapshotChanges:
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    listed: bool = False # whether the folder had to be listed
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+
+@dataclass
+class Drift:
+    profile_name: str
+    extra: List[str] = field(default_factory=list) # archives of other profiles left in the folder
+    unmanaged: List[str] = field(default_factory=list) # files no profile knows about
+    missing: List[str] = field(default_factory=list) # archives of the profile that are not there
+    modified: List[str] = field(default_factory=list) # archives changed since vsmm deployed them
+
+    @property
+    def clean(self) -> bool:
+        return not (self.extra or self.missing or self.modified)
+
+
+class InotifyWatcher:
+    """ Non-blocking inotify watch on one directory. poll() returns the names changed since the last poll, or
+    None when events were lost (queue overflow, the folder itself moved) and the caller must re-list. """
+
+    def __init__(self, folder: Path):
+        self.folder = Path(folder)
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._wd = self._libc.inotify_add_watch(self._fd, os.fsencode(self.folder), WATCH_MASK)
+        if self._wd < 0:
+            error = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(error, f"inotify_add_watch failed for {self.folder}")
+        self.healthy = True
+
+    @staticmethod
+    def available() -> bool:
+        return sys.platform.startswith("linux") and ctypes.util.find_library("c") is not None
+
+    def poll(self) -> Optional[Set[str]]:
+        names: Set[str] = set()
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            except OSError as exc:
+                if exc.errno == errno.EINTR:
+                    continue
+                raise
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if mask & (IN_Q_OVERFLOW | IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                    self.healthy = False
+                elif name:
+                    names.add(os.fsdecode(name))
+        if not self.healthy:
+            return None
+        return names
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class FolderSnapshot:
+
+    def __init__(self, file: FileManager, folder: Path, state_path: Path, watch: bool = False):
+        self.file = file
+        self.folder = Path(folder)
+        self.state_path = Path(state_path)
+        self.watch = watch
+        self.entries: Dict[str, FileStat] = {}
+        self.deployed: Dict[str, FileStat] = {} # what vsmm placed, to tell hand edits apart
+        self._dir_mtime_ns: Optional[int] = None
+        self._listed_at_ns = 0
+        self._watcher: Optional[InotifyWatcher] = None
+        self._watch_synced = False
+        self._dirty = False
+        self._lock = threading.RLock() # deploy installs record files from worker threads
+        self.load()
+
+    def load(self):
+        contents = self.file.read(self.state_path)
+        if contents is None:
+            return
+        try:
+            state = json.loads(contents)
+            if state.get("version") != SNAPSHOT_VERSION or state.get("folder") != str(self.folder):
+                return
+            self.entries = {name: FileStat(*values) for name, values in state["entries"].items()}
+            self.deployed = {name: FileStat(*values) for name, values in state["deployed"].items()}
+            self._dir_mtime_ns = state["dir_mtime_ns"]
+            self._listed_at_ns = state["listed_at_ns"]
+        except (ValueError, KeyError, TypeError):
+            self.entries, self.deployed, self._dir_mtime_ns = {}, {}, None
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            contents = json.dumps({
+                "version": SNAPSHOT_VERSION,
+                "folder": str(self.folder),
+                "dir_mtime_ns": self._dir_mtime_ns,
+                "listed_at_ns": self._listed_at_ns,
+                "entries": {name: [s.size, s.mtime_ns, s.inode, s.dev] for name, s in self.entries.items()},
+                "deployed": {name: [s.size, s.mtime_ns, s.inode, s.dev] for name, s in self.deployed.items()},
+            })
+            self._dirty = False
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        self.file.write_atomic(self.state_path, contents)
+
+    def refresh(self) -> SnapshotChanges:
+        """ Bring the snapshot up to date as cheaply as possible. """
+        with self._lock:
+            watcher = self._ensure_watcher()
+            if watcher is not None and self._watch_synced:
+                names = watcher.poll()
+                if names is not None:
+                    return self._restat(names)
+                self._close_watcher() # events were lost, start a fresh watch and re-list
+                watcher = self._ensure_watcher()
+            try:
+                dir_mtime_ns = os.stat(self.folder).st_mtime_ns
+            except FileNotFoundError:
+                return self._replace({}, None)
+            # the watch only covers changes made after it started, so sync the snapshot once without it
+            self._watch_synced = watcher is not None
+            if dir_mtime_ns == self._dir_mtime_ns and dir_mtime_ns < self._listed_at_ns - RACY_WINDOW_NS:
+                return self._restat(list(self.entries)) # nothing was added, removed or renamed
+            return self._list(dir_mtime_ns)
+
+    def record_deployed(self, name: str):
+        """ Remember the stat of an archive vsmm just placed in the folder. """
+        stat = FileStat.of(os.stat(self.folder / name))
+        with self._lock:
+            self.entries[name] = self.deployed[name] = stat
+            self._dirty = True
+
+    def forget(self, name: str):
+        """ vsmm removed an archive from the folder. """
+        with self._lock:
+            self.entries.pop(name, None)
+            self.deployed.pop(name, None)
+            self._dirty = True
+
+    def is_modified(self, name: str) -> bool:
+        current, deployed = self.entries.get(name), self.deployed.get(name)
+        return current is not None and deployed is not None and current != deployed
+
+    def drift(self, profile_name: str, expected: Iterable[str], managed: Iterable[str]) -> Drift:
+        """ Compare the folder with the archive names a profile deployed. managed are the archive names of every
+        profile, to tell leftovers of another profile apart from files vsmm never touched. """
+        self.refresh()
+        expected, managed = set(expected), set(managed)
+        present = set(self.entries)
+        return Drift(
+            profile_name=profile_name,
+            extra=sorted(name for name in present - expected if name in managed),
+            unmanaged=sorted(name for name in present - expected if name not in managed),
+            missing=sorted(expected - present),
+            modified=sorted(name for name in expected & present if self.is_modified(name)),
+        )
+
+    def close(self):
+        with self._lock:
+            self._close_watcher()
+        self.save()
+
+    def _ensure_watcher(self) -> Optional[InotifyWatcher]:
+        if self._watcher is None and self.watch and InotifyWatcher.available() and self.folder.is_dir():
+            try:
+                self._watcher = InotifyWatcher(self.folder)
+            except OSError:
+                self.watch = False # out of watches, or not supported here: fall back to stat checks
+        return self._watcher
+
+    def _close_watcher(self):
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+            self._watch_synced = False
+
+    def _list(self, dir_mtime_ns: int) -> SnapshotChanges:
+        listed_at_ns = time.time_ns()
+        entries = {}
+        with os.scandir(self.folder) as scan:
+            for entry in scan:
+                if entry.is_file():
+                    entries[entry.name] = FileStat.of(entry.stat())
+        self._listed_at_ns = listed_at_ns
+        changes = self._replace(entries, dir_mtime_ns)
+        changes.listed = True
+        return changes
+
+    def _replace(self, entries: Dict[str, FileStat], dir_mtime_ns: Optional[int]) -> SnapshotChanges:
+        old = self.entries
+        changes = SnapshotChanges(
+            added=sorted(set(entries) - set(old)),
+            removed=sorted(set(old) - set(entries)),
+            changed=sorted(name for name in set(entries) & set(old) if entries[name] != old[name]),
+        )
+        for name in changes.removed:
+            self.deployed.pop(name, None)
+        self.entries = entries
+        if changes or dir_mtime_ns != self._dir_mtime_ns:
+            self._dirty = True
+        self._dir_mtime_ns = dir_mtime_ns
+        return changes
+
+    def _restat(self, names: Iterable[str]) -> SnapshotChanges:
+        changes = SnapshotChanges()
+        for name in names:
+            try:
+                stat = os.stat(self.folder / name)
+            except FileNotFoundError:
+                stat = None
+            if stat is None or not S_ISREG(stat.st_mode):
+                if self.entries.pop(name, None) is not None:
+                    self.deployed.pop(name, None)
+                    changes.removed.append(name)
+                continue
+            current = FileStat.of(stat)
+            previous = self.entries.get(name)
+            if previous != current:
+                self.entries[name] = current
+                (changes.added if previous is None else changes.changed).append(name)
+        if changes:
+            self._dirty = True
+        return changes
@@ -0,0 +1,161 @@
+"""
+Content-addressed store for downloaded mod archives.
+
+Every archive is kept once, as blobs/<sha256[:2]>/<sha256>, and the named file in the downloads folder becomes a
+link to that blob. The index records which profiles reference each blob so unreferenced ones can be collected.
+"""
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from api.manifest import hash_file, manifest_path, read_manifest, verify_archive
+from .file import FileManager
+
+INDEX_FILENAME = "index.json"
+BLOB_NAME = re.compile(r"^[0-9a-f]{64}$")
+
+
+class ArchiveStore:
+
+    def __init__(self, file: FileManager, root: Path):
+        self.file = file
+        self.root = Path(root)
+        self.blobs: Dict[str, Dict] = {} # sha256 -> {"size": int, "names": [paths linked to the blob]}
+        self.refs: Dict[str, List[str]] = {} # sha256 -> profile names using the blob
+        self._lock = threading.RLock() # deploy pipelines ingest from several worker threads
+        self._batch_depth = 0
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        contents = self.file.read(self.root / INDEX_FILENAME)
+        if contents is None:
+            return
+        try:
+            index = json.loads(contents)
+            self.blobs = dict(index["blobs"])
+            self.refs = dict(index["refs"])
+        except (ValueError, KeyError, TypeError):
+            self._rebuild()
+
+    def _rebuild(self):
+        """ The index is unreadable (e.g. cut short by a crash of an older release): recover the blobs from the
+        blob directory. The profile references are restored by the ProfileManager, which sets them on startup;
+        the download names linked to each blob are forgotten until the archive is ingested again. """
+        print(f"Warning: {self.root / INDEX_FILENAME} is damaged, rebuilding it from the stored archives")
+        self.blobs, self.refs = {}, {}
+        for blob in (self.root / "blobs").glob("*/*"):
+            if BLOB_NAME.match(blob.name) and blob.is_file():
+                self.blobs[blob.name] = {"size": blob.stat().st_size, "names": []}
+        self._dirty = True
+        self.save()
+
+    def save(self):
+        with self._lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            self.file.write_atomic(self.root / INDEX_FILENAME, json.dumps({"blobs": self.blobs, "refs": self.refs}))
+            self._dirty = False
+
+    @contextmanager
+    def batch(self):
+        """ Write the index once for all ingests and reference changes inside the block, instead of after each. """
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if self._batch_depth == 0 and self._dirty:
+                    self.save()
+
+    def _changed(self):
+        with self._lock:
+            self._dirty = True
+            if self._batch_depth == 0:
+                self.save()
+
+    def blob_path(self, sha256: str) -> Path:
+        return self.root / "blobs" / sha256[:2] / sha256
+
+    def has(self, sha256: Optional[str]) -> bool:
+        return bool(sha256) and self.file.exists_locally(self.blob_path(sha256))
+
+    def ingest(self, archive_path: Path) -> str:
+        """ Move an archive into the store (if its content is not there already) and leave a link to the blob at
+        its original path. Returns the content hash. """
+        archive_path = Path(archive_path)
+        manifest = read_manifest(archive_path)
+        sha256 = manifest.sha256 if manifest and verify_archive(archive_path) else hash_file(archive_path).hexdigest()
+        blob = self.blob_path(sha256)
+        with self._lock:
+            if not self.file.exists_locally(blob):
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(archive_path, blob)
+            if not (archive_path.exists() and os.path.samefile(archive_path, blob)):
+                self.file.link_or_copy(blob, archive_path)
+            entry = self.blobs.setdefault(sha256, {"size": blob.stat().st_size, "names": []})
+            if str(archive_path) not in entry["names"]:
+                entry["names"].append(str(archive_path))
+            self._changed()
+        return sha256
+
+    def set_profile_refs(self, profile_name: str, hashes: Iterable[str]):
+        """ Replace the set of blobs a profile references. """
+        hashes = set(filter(None, hashes))
+        changed = False
+        with self._lock:
+            for sha256 in list(self.refs):
+                users = self.refs[sha256]
+                if profile_name in users and sha256 not in hashes:
+                    users.remove(profile_name)
+                    changed = True
+                if not users:
+                    del self.refs[sha256]
+            for sha256 in hashes:
+                users = self.refs.setdefault(sha256, [])
+                if profile_name not in users:
+                    users.append(profile_name)
+                    changed = True
+            if changed:
+                self._changed()
+
+    def drop_profile(self, profile_name: str):
+        self.set_profile_refs(profile_name, [])
+
+    def unreferenced(self) -> List[str]:
+        with self._lock:
+            return [sha256 for sha256 in self.blobs if not self.refs.get(sha256)]
+
+    def gc(self, dry_run: bool = False) -> Dict[str, int]:
+        """ Delete blobs no profile references, together with the download links (or copies, where links were not
+        possible) and manifests pointing at them. """
+        with self._lock:
+            collected = self.unreferenced()
+            freed = sum(self.blobs[sha256]["size"] for sha256 in collected)
+            if dry_run:
+                return {"blobs": len(collected), "bytes": freed}
+            for sha256 in collected:
+                blob = self.blob_path(sha256)
+                for name in self.blobs[sha256]["names"]:
+                    linked = Path(name)
+                    if self._holds_blob(linked, sha256, blob):
+                        self.file.delete(linked)
+                        self.file.delete(manifest_path(linked))
+                self.file.delete(blob)
+                del self.blobs[sha256]
+            self.save()
+        return {"blobs": len(collected), "bytes": freed}
+
+    def _holds_blob(self, path: Path, sha256: str, blob: Path) -> bool:
+        """ Whether path is still the blob's download: a link to it, or a copy with the same content (a name that
+        was replaced by another file since is left alone). """
+        if not path.is_file():
+            return False
+        if blob.exists() and os.path.samefile(path, blob):
+            return True
+        return path.stat().st_size == self.blobs[sha256]["size"] and hash_file(path).hexdigest() == sha256
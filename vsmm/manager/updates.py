@@ -0,0 +1,150 @@
+"""
+Update checks across profiles.
+
+Every mod is checked once no matter how many profiles use it: the unique modids are fetched concurrently (each fetch
+is a conditional request, so unchanged mods cost a 304) and the result is fanned back out to every profile entry.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+import pathlib
+import re
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from api.client import APIClient, BulkDownloadResult
+    from .mod import ModInfo, ModManager
+    from .profile import Profile
+    from .store import ArchiveStore
+
+SEMVER_PATTERN = re.compile(
+    r"^\s*v?(?P<core>\d+(?:\.\d+)*)(?:-(?P<pre>[0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?\s*$"
+)
+
+
+def version_key(version: str) -> Tuple:
+    """ Sort key giving semantic version precedence: 1.2.0 < 1.10.0, 1.0.0-rc.1 < 1.0.0, 1.0.0-alpha < 1.0.0-beta,
+    build metadata is ignored. Missing minor/patch numbers count as 0. Versions that are not semver at all sort
+    below every valid version. """
+    match = SEMVER_PATTERN.match(version or "")
+    if match is None:
+        return (0, (), (0, version or ""))
+    core = tuple(int(part) for part in match.group("core").split("."))
+    core = core + (0,) * (3 - len(core))
+    pre = match.group("pre")
+    if pre is None:
+        return (1, core, (1,)) # a release outranks all of its pre-releases
+    # numeric identifiers compare numerically and rank below alphanumeric ones
+    identifiers = tuple((0, int(part), "") if part.isdigit() else (1, 0, part) for part in pre.split("."))
+    return (1, core, (0, identifiers))
+
+
+def is_prerelease(version: str) -> bool:
+    match = SEMVER_PATTERN.match(version or "")
+    return match is not None and match.group("pre") is not None
+
+
+@dataclass
+class ModUpdate:
+    modid: int
+    name: str
+    installed: str
+    latest: str
+    mainfile: str # asset stub of the latest release archive
+
+
+@dataclass
+class UpdateReport:
+    checked: int # unique mods looked up
+    profiles: Dict[str, List[ModUpdate]] = field(default_factory=dict)
+    errors: Dict[int, str] = field(default_factory=dict) # modid -> why it could not be checked
+    prefetch: Optional[Future] = None # resolves to the BulkDownloadResults of the background downloads
+
+    @property
+    def has_updates(self) -> bool:
+        return any(self.profiles.values())
+
+    def release_stubs(self) -> Dict[Tuple[int, str], str]:
+        """ (modid, version) -> asset stub of the archive, for every distinct release some profile could update to. """
+        return {(update.modid, update.latest): update.mainfile for updates in self.profiles.values() for update in updates}
+
+
+class UpdateChecker:
+
+    def __init__(self, mod_manager: "ModManager", api: "APIClient", workers: int, include_prereleases: bool = False,
+                 store: "ArchiveStore" = None):
+        self.mod_manager = mod_manager
+        self.api = api
+        self.store = store # prefetched archives are ingested here when set
+        self.workers = workers
+        self.include_prereleases = include_prereleases
+        self._prefetcher: Optional[ThreadPoolExecutor] = None
+
+    def check(self, profiles: Iterable["Profile"], prefetch: bool = False, save_dir: pathlib.Path = None) -> UpdateReport:
+        """ Compare every entry of the given profiles against the newest release on the mod db. With prefetch the
+        new archives are downloaded to save_dir in the background; wait on report.prefetch for the results. """
+        profiles = list(profiles)
+        modids = sorted({mod.id for profile in profiles for mod in profile.mods})
+        latest, errors = self.latest_releases(modids)
+        report = UpdateReport(checked=len(modids), errors=errors)
+        for profile in profiles:
+            updates = report.profiles[profile.name] = []
+            for mod in profile.mods:
+                release = latest.get(mod.id)
+                if release is None or version_key(release["modversion"]) <= version_key(mod.version):
+                    continue
+                updates.append(ModUpdate(modid=mod.id, name=mod.name, installed=mod.version,
+                                         latest=release["modversion"], mainfile=release["mainfile"]))
+        if prefetch and report.has_updates:
+            report.prefetch = self._prefetch(report.release_stubs(), save_dir)
+        return report
+
+    def latest_releases(self, modids: List[int]) -> Tuple[Dict[int, Dict[str, Any]], Dict[int, str]]:
+        """ Fetch each mod's metadata concurrently and pick its newest release. """
+        latest: Dict[int, Dict[str, Any]] = {}
+        errors: Dict[int, str] = {}
+        if not modids:
+            return latest, errors
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(modids)), thread_name_prefix="vsmm-updates") as pool:
+            futures = {modid: pool.submit(self.mod_manager.get_mod_info, modid, True) for modid in modids}
+            for modid, future in futures.items():
+                try:
+                    release = self.newest_release(future.result())
+                except Exception as exc: # one unreachable mod must not sink the whole check
+                    errors[modid] = f"{type(exc).__name__}: {exc}"
+                    continue
+                if release is not None:
+                    latest[modid] = release
+        return latest, errors
+
+    def newest_release(self, mod_info: "ModInfo") -> Optional[Dict[str, Any]]:
+        releases = [
+            release for release in (mod_info.releases or [])
+            if release.get("modversion") and (self.include_prereleases or not is_prerelease(release["modversion"]))
+        ]
+        if not releases:
+            return None
+        return max(releases, key=lambda release: version_key(release["modversion"]))
+
+    def _prefetch(self, stubs: Dict[Tuple[int, str], str], save_dir: pathlib.Path) -> Future:
+        if self._prefetcher is None:
+            self._prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vsmm-prefetch")
+        return self._prefetcher.submit(self._download, stubs, save_dir)
+
+    def _download(self, stubs: Dict[Tuple[int, str], str], save_dir: pathlib.Path) -> List["BulkDownloadResult"]:
+        """ Download straight from the release stubs the check already found (no second metadata lookup per mod),
+        then move each archive into the store so a later deploy links it instead of downloading it again. """
+        results = []
+        with self.store.batch() if self.store is not None else nullcontext():
+            for result in self.api.bulk_download_mods(list(stubs), save_dir, stubs=stubs):
+                if result.ok and self.store is not None:
+                    try:
+                        self.store.ingest(result.path)
+                    except OSError as exc:
+                        result.error = f"{type(exc).__name__}: {exc}"
+                results.append(result)
+        return results
+
+    def shutdown(self, wait: bool = True):
+        if self._prefetcher is not None:
+            self._prefetcher.shutdown(wait=wait)
@@ -0,0 +1,102 @@
+"""
+Paged view over the mod catalogue for the mods browser table.
+
+Only the rows of the visible page are turned into table values. Filtering and sorting run against the ModIndex
+(precomputed sort orders and inverted indexes) and only ever produce a list of row ids.
+"""
+from dataclasses import dataclass, field, replace
+from typing import List, Optional, Sequence
+
+from manager.mod import ModManager, ModMetadata
+
+TABLE_HEADINGS = ["Mod Name", "Author", "Version", "Tags", "Last Updated"]
+SORT_COLUMNS = {0: "name", 1: "author", 4: "lastreleased"} # table column -> ModIndex sort key
+DEFAULT_SORT = "downloads"
+
+
+@dataclass(frozen=True)
+class TableQuery:
+    text: Optional[str] = None
+    author: Optional[str] = None
+    tags: List[str] = field(default_factory=list)
+    sort: str = DEFAULT_SORT
+    descending: bool = True
+
+
+class ModTableModel:
+
+    def __init__(self, mod_manager: ModManager, page_size: int):
+        self.mod_manager = mod_manager
+        self.page_size = page_size
+        self.query = TableQuery()
+        self.page = 0
+        self.rows: Sequence[int] = range(len(mod_manager.mod_cache.mods)) # catalogue order until the first query lands
+        self._mods = mod_manager.mod_cache.mods
+
+    @property
+    def page_count(self) -> int:
+        return max(1, -(-len(self.rows) // self.page_size))
+
+    def page_label(self) -> str:
+        return f"Page {self.page + 1} of {self.page_count} ({len(self.rows)} mods)"
+
+    def with_filters(self, text: str = None, author: str = None, tags: str = None) -> TableQuery:
+        """ The current query with new filter values. tags is a comma separated string. """
+        tag_list = [tag.strip() for tag in (tags or "").split(",") if tag.strip()]
+        return replace(self.query, text=text or None, author=author or None, tags=tag_list)
+
+    def with_sort_column(self, column: int) -> Optional[TableQuery]:
+        """ The current query sorted by a table column, toggling direction if it is already sorted by it. """
+        sort = SORT_COLUMNS.get(column)
+        if sort is None:
+            return None
+        descending = not self.query.descending if sort == self.query.sort else sort == "lastreleased"
+        return replace(self.query, sort=sort, descending=descending)
+
+    def run_query(self, query: TableQuery):
+        """ Worker side: resolve a query to row ids. Returns the query, the rows and the catalogue they index. """
+        with self.mod_manager.reading_index() as index: # a cache update cannot unmap the catalogue mid-query
+            mods = index.mods # the rows index what the index was built from, even if the cache was swapped meanwhile
+            rows = index.query(query.text, tags=query.tags, author=query.author, sort=query.sort,
+                               descending=query.descending, fuzzy=True)
+        return query, rows, mods
+
+    def apply(self, query: TableQuery, rows: Sequence[int], mods: Sequence[ModMetadata]) -> bool:
+        """ GUI side: adopt a finished query result and go back to the first page. Results computed against a
+        catalogue that has since been replaced are dropped. """
+        if mods is not self.mod_manager.mod_cache.mods:
+            return False
+        self.query = query
+        self.rows = rows
+        self._mods = mods
+        self.page = 0
+        return True
+
+    def reload(self):
+        """ GUI side: let go of the previous catalogue after a cache update. Its row ids mean nothing in the new
+        one, so the table shows catalogue order until the query is run again. """
+        self._mods = self.mod_manager.mod_cache.mods
+        self.rows = range(len(self._mods))
+        self.set_page(self.page)
+
+    def set_page(self, page: int) -> bool:
+        page = min(max(page, 0), self.page_count - 1)
+        changed = page != self.page
+        self.page = page
+        return changed
+
+    def page_rows(self) -> Sequence[int]:
+        start = self.page * self.page_size
+        return self.rows[start:start + self.page_size]
+
+    def page_values(self) -> List[List[str]]:
+        return [self._table_row(self._mods[row]) for row in self.page_rows()]
+
+    def mod_at(self, table_row: int) -> ModMetadata:
+        return self._mods[self.page_rows()[table_row]]
+
+    def page_mod_ids(self) -> List[int]:
+        return [self._mods[row].modid for row in self.page_rows()]
+
+    def _table_row(self, mod: ModMetadata) -> List[str]:
+        return [mod.name, mod.author, "1", ", ".join(mod.tags), mod.lastreleased]
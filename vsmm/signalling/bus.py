@@ -0,0 +1,224 @@
+"""
+Thread-safe event bus behind Observable.
+
+Each subscription names the executor its callback runs on:
+    InlineExecutor      on the emitting thread (the original Observable behaviour)
+    ThreadedExecutor    on background worker threads, so slow subscribers never stall the emitter
+    QueuedExecutor      queued until the owning thread (e.g. the GUI loop) calls drain()
+
+High frequency signals can be coalesced (only the latest undelivered event is kept) and/or throttled to at most
+one delivery per min_interval seconds. Bound methods are held weakly so subscribing does not keep objects alive.
+"""
+from collections import deque
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+import weakref
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_newest")
+
+
+class Event:
+    __slots__ = ("signal", "source", "data")
+
+    def __init__(self, signal: str, source, data: Dict):
+        self.signal = signal
+        self.source = source
+        self.data = data
+
+    def __getattr__(self, name):
+        # emit_signal keyword arguments read like attributes, as they did on the original Event
+        if name == "data":
+            raise AttributeError(name)
+        try:
+            return self.data[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+class InlineExecutor:
+
+    def submit(self, fn: Callable):
+        fn()
+
+    def shutdown(self):
+        pass
+
+
+class ThreadedExecutor:
+    """ Runs callbacks on worker threads fed by a bounded queue. When the queue is full the overflow policy
+    decides whether the emitter blocks or an event is dropped. """
+
+    def __init__(self, workers: int = 1, max_queue: int = 1024, overflow: str = "block", name: str = "vsmm-events"):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow}, expected one of {', '.join(OVERFLOW_POLICIES)}")
+        self.overflow = overflow
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._threads = [threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True) for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, fn: Callable):
+        if self.overflow == "block":
+            self._queue.put(fn)
+            return
+        try:
+            self._queue.put_nowait(fn)
+        except queue.Full:
+            self.dropped += 1
+            if self.overflow == "drop_oldest":
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+                self._queue.put_nowait(fn)
+
+    def _work(self):
+        while True:
+            fn = self._queue.get()
+            if fn is None:
+                return
+            try:
+                fn()
+            except Exception as exc: # a failing subscriber must not kill the worker
+                print(f"Event subscriber failed: {exc!r}")
+
+    def shutdown(self):
+        for _ in self._threads:
+            self._queue.put(None)
+
+
+class QueuedExecutor:
+    """ Holds callbacks until drain() is called by the thread that owns them. wakeup, if given, is called
+    whenever the queue goes from empty to non-empty, e.g. to post a window event to a sleeping GUI loop. """
+
+    def __init__(self, max_queue: int = 1024, wakeup: Callable = None):
+        self.wakeup = wakeup
+        self.dropped = 0
+        self._queue = deque(maxlen=max_queue) # a full deque drops its oldest entry
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable):
+        with self._lock:
+            was_empty = not self._queue
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append(fn)
+        if was_empty and self.wakeup is not None:
+            self.wakeup()
+
+    def drain(self, max_items: int = None) -> int:
+        """ Run queued callbacks on the calling thread. Returns how many ran. """
+        ran = 0
+        while max_items is None or ran < max_items:
+            with self._lock:
+                if not self._queue:
+                    break
+                fn = self._queue.popleft()
+            fn()
+            ran += 1
+        return ran
+
+    def shutdown(self):
+        with self._lock:
+            self._queue.clear()
+
+
+class Subscription:
+    __slots__ = ("signal", "executor", "coalesce", "min_interval", "_callback", "_pending", "_scheduled",
+                 "_last_delivery", "_lock")
+
+    def __init__(self, signal: str, callback: Callable, executor, coalesce: bool, min_interval: float, weak: bool):
+        self.signal = signal
+        self.executor = executor
+        self.coalesce = coalesce or min_interval > 0 # throttled events are always coalesced
+        self.min_interval = min_interval
+        if weak and hasattr(callback, "__self__"):
+            self._callback = weakref.WeakMethod(callback)
+        elif weak:
+            self._callback = weakref.ref(callback)
+        else:
+            self._callback = lambda: callback
+        self._pending: Optional[Event] = None
+        self._scheduled = False
+        self._last_delivery = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self._callback() is not None
+
+    def offer(self, event: Event):
+        if not self.coalesce:
+            self.executor.submit(lambda: self._deliver(event))
+            return
+        with self._lock:
+            self._pending = event # a newer event replaces one that has not been delivered yet
+            if self._scheduled:
+                return
+            self._scheduled = True
+            delay = self._last_delivery + self.min_interval - time.monotonic()
+        if delay > 0:
+            timer = threading.Timer(delay, self.executor.submit, args=(self._deliver_pending,))
+            timer.daemon = True
+            timer.start()
+        else:
+            self.executor.submit(self._deliver_pending)
+
+    def _deliver_pending(self):
+        with self._lock:
+            event, self._pending = self._pending, None
+            self._scheduled = False
+            self._last_delivery = time.monotonic()
+        if event is not None:
+            self._deliver(event)
+
+    def _deliver(self, event: Event):
+        callback = self._callback()
+        if callback is not None:
+            callback(event)
+
+
+class EventBus:
+
+    def __init__(self, default_executor=None):
+        self.default_executor = default_executor or InlineExecutor()
+        self._subscriptions: Dict[str, List[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, signal: str, callback: Callable, executor=None, coalesce: bool = False,
+                  min_interval: float = 0.0, weak: bool = None) -> Subscription:
+        """ weak defaults to True for bound methods (the subscriber's lifetime is its own) and False for plain
+        functions and lambdas, which usually have no other reference. """
+        if weak is None:
+            weak = hasattr(callback, "__self__")
+        subscription = Subscription(signal, callback, executor or self.default_executor, coalesce, min_interval, weak)
+        with self._lock:
+            # copy on write so emit can iterate without holding the lock
+            self._subscriptions[signal] = self._subscriptions.get(signal, []) + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.signal, [])
+            self._subscriptions[subscription.signal] = [s for s in subscriptions if s is not subscription]
+
+    def has_subscribers(self, signal: str) -> bool:
+        return bool(self._subscriptions.get(signal))
+
+    def emit(self, signal: str, source=None, **data):
+        subscriptions = self._subscriptions.get(signal)
+        if not subscriptions:
+            return # nobody is listening, dont even build the event
+        event = Event(signal, source, data)
+        dead = False
+        for subscription in subscriptions:
+            if subscription.alive:
+                subscription.offer(event)
+            else:
+                dead = True
+        if dead:
+            with self._lock:
+                self._subscriptions[signal] = [s for s in self._subscriptions.get(signal, []) if s.alive]
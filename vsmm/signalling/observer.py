@@ -1,29 +1,32 @@
 """
 Observe pattern objects for use in communicating between UI/backend
 
-Loosely based on Godots' signal design pattern.
+Loosely based on Godots' signal design pattern. Delivery is handled by an EventBus, so subscribers can choose
+to run inline, on worker threads, or queued for the GUI thread.
 """
 
 
-from typing import List
+from typing import Callable, List
 
+from .bus import Event, EventBus, Subscription
 
-class Event:
-    pass
 
 class Observable:
 
-    def __init__(self, signals: List[str]):
+    def __init__(self, signals: List[str], bus: EventBus = None):
         self.signals = signals
-        self.callbacks = {s: [] for s in self.signals}
+        self.bus = bus or EventBus()
 
-    def subscribe(self, signal: str, callback: function):
-        self.callbacks[signal].append(callback)
+    def subscribe(self, signal: str, callback: Callable, **options) -> Subscription:
+        """ options are passed to EventBus.subscribe: executor, coalesce, min_interval, weak. """
+        if signal not in self.signals:
+            raise KeyError(signal)
+        return self.bus.subscribe(signal, callback, **options)
+
+    def unsubscribe(self, subscription: Subscription):
+        self.bus.unsubscribe(subscription)
 
     def emit_signal(self, signal: str, **attrs):
-        e = Event()
-        e.source = self
-        for k, v in attrs.items():
-            setattr(e, k, v)
-        for fn in self.callbacks[signal]:
-            fn(e)
\ No newline at end of file
+        if signal not in self.signals:
+            raise KeyError(signal)
+        self.bus.emit(signal, source=self, **attrs)
@@ -1,5 +1,16 @@
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import hashlib
 from io import StringIO
 from html.parser import HTMLParser
+import json
+import os
+from pathlib import Path
+import threading
+from typing import Dict, Iterable, Tuple
+
+TRUNCATION_MARKER = "\n\n[...]"
+
 
 class TextStripper(HTMLParser):
     def __init__(self):
@@ -12,3 +23,92 @@ class TextStripper(HTMLParser):
         self.text.write(d)
     def get_data(self):
         return self.text.getvalue()
+    def strip(self, html_text: str) -> str:
+        """ Reuse this parser for another document and return its text. """
+        self.reset()
+        self.text = StringIO()
+        self.feed(html_text)
+        self.close()
+        return self.get_data()
+
+
+class DescriptionRenderer:
+    """ Memoizes the plain text of mod descriptions, keyed by assetid plus a hash of the html, so revisiting a
+    mod (or a changed description) never re-parses more than once. Parsers are reused per thread. """
+
+    def __init__(self, max_entries: int, max_chars: int, cache_path: Path = None, workers: int = 1):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self.cache_path = Path(cache_path) if cache_path else None
+        self._rendered: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._parsers = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vsmm-render")
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    @staticmethod
+    def cache_key(assetid: int, html_text: str) -> str:
+        return f"{assetid}:{hashlib.sha1(html_text.encode('utf-8')).hexdigest()}"
+
+    def render(self, assetid: int, html_text: str) -> str:
+        if not html_text:
+            return ""
+        key = self.cache_key(assetid, html_text)
+        with self._lock:
+            text = self._rendered.get(key)
+            if text is not None:
+                self._rendered.move_to_end(key)
+                self.hits += 1
+                return text
+            self.misses += 1
+        text = self._cap(self._parser().strip(html_text))
+        with self._lock:
+            self._rendered[key] = text
+            while len(self._rendered) > self.max_entries:
+                self._rendered.popitem(last=False)
+        return text
+
+    def prerender(self, documents: Iterable[Tuple[int, str]]) -> Future:
+        """ Render (assetid, html) pairs in the background, e.g. for a whole profile or search result. The
+        iterable is consumed on the worker thread, so it may lazily load the documents. """
+        return self._executor.submit(lambda: [self.render(assetid, html_text) for assetid, html_text in documents])
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._rendered)}
+
+    def load(self):
+        if self.cache_path is None or not self.cache_path.is_file():
+            return
+        try:
+            stored = json.loads(self.cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return # a damaged cache is just re-rendered
+        with self._lock:
+            for key, text in list(stored.items())[-self.max_entries:]:
+                self._rendered[key] = text
+
+    def save(self):
+        if self.cache_path is None:
+            return
+        with self._lock:
+            contents = json.dumps(self._rendered)
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_name(self.cache_path.name + ".tmp")
+        tmp_path.write_text(contents, encoding="utf-8")
+        os.replace(tmp_path, self.cache_path)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _parser(self) -> TextStripper:
+        parser = getattr(self._parsers, "parser", None)
+        if parser is None:
+            parser = self._parsers.parser = TextStripper()
+        return parser
+
+    def _cap(self, text: str) -> str:
+        if len(text) <= self.max_chars:
+            return text
+        return text[:self.max_chars] + TRUNCATION_MARKER